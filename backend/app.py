@@ -1,40 +1,114 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
 import logging
 import numpy as np
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from utils import (
-    get_coordinate_data, 
-    triangulate_coords, 
-    generate_triangle_lists, 
-    calculate_all_affine_matrices, 
-    find_triangle_containing_point
-)
+from mapping_model import ModelCache, TRANSFORM_MODES, mapping_file_hash, warmup_models
+from geojson_mapping import map_feature_collection
+from image_warp import (IMAGE_EXTENSIONS, encode_png, find_mapping_image, get_image, image_cache_bytes,
+                        warp_image)
+from tile_server import MAX_ZOOM, TileCache, empty_tile_png
+from tracking_stream import TrackingStream
+from request_coalescer import PointCoalescer
+from request_profiler import RequestProfiler
+from memory_tracing import start_tracing, take_snapshot
+from coord_transform import CRS_CHOICES, MAPPING_CRS, to_mapping_crs
+from map_index import MapIndex
+from mapping_bundle import bundle_hash
+from compile_jobs import CompileJobs, JobQueueFull
+from viewport_index import VIEWPORT_LIMIT, viewport_query
+from landmark_index import nearest_landmarks
+from smooth_warp import APPROX_MAX_K
+
+try:
+    from flask_sock import Sock
+except ImportError:  # 未安装flask-sock时不提供WebSocket跟踪流
+    Sock = None
 
 # 创建Flask应用
 app = Flask(__name__)
-CORS(app)  # 启用CORS，允许前端跨域请求
+CORS(app, expose_headers=['X-Map-Bounds'])  # 启用CORS，允许前端跨域请求
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 确保存储目录存在
-STORAGE_DIR = os.path.join(os.path.dirname(__file__), 'saved-data')
+# 确保存储目录存在（可通过环境变量 MAP_STORAGE_DIR 指定其他目录）
+STORAGE_DIR = os.environ.get('MAP_STORAGE_DIR') or os.path.join(os.path.dirname(__file__), 'saved-data')
 if not os.path.exists(STORAGE_DIR):
     os.makedirs(STORAGE_DIR, exist_ok=True)
 
+# 手绘地图图像存储目录，图像与映射文件同名
+IMAGE_DIR = os.path.join(STORAGE_DIR, 'images')
+
+# 瓦片磁盘缓存目录，以及浏览器缓存瓦片的时间（秒）
+TILE_CACHE_DIR = os.path.join(STORAGE_DIR, 'tile-cache')
+TILE_MAX_AGE = int(os.environ.get('MAP_TILE_MAX_AGE', '3600'))
+
+# 按内容哈希访问的二进制映射包内容不会变化，浏览器可以永久缓存（一年）
+BUNDLE_MAX_AGE = 365 * 24 * 3600
+
+# 批量映射单次请求的最大坐标数
+MAX_BATCH_POINTS = int(os.environ.get('MAP_MAX_BATCH_POINTS', '100000'))
+
+# 单点映射请求合并窗口（毫秒），0表示不合并；以及单个批次的最大点数
+COALESCE_WINDOW_MS = float(os.environ.get('MAP_COALESCE_MS', '0'))
+COALESCE_MAX_POINTS = int(os.environ.get('MAP_COALESCE_MAX_POINTS', '256'))
+
+# 映射模型内存预算（MB），超出时淘汰最近最少使用的模型；0表示不限制
+MODEL_MEMORY_MB = float(os.environ.get('MAP_MODEL_MEMORY_MB', '0'))
+
+# 编译后的映射模型缓存
+model_cache = ModelCache(int(MODEL_MEMORY_MB * 1024 * 1024) if MODEL_MEMORY_MB > 0 else None)
+
+# 异步编译：MAP_ASYNC_COMPILE=1时模型未就绪的坐标映射请求提交编译任务并立即返回"编译中"，
+# 保存映射文件后也在后台编译；进程池大小和排队任务数上限可配置
+ASYNC_COMPILE = os.environ.get('MAP_ASYNC_COMPILE') == '1'
+COMPILE_WORKERS = int(os.environ.get('MAP_COMPILE_WORKERS', '2'))
+COMPILE_QUEUE = int(os.environ.get('MAP_COMPILE_QUEUE', '16'))
+
+# 编译任务队列（进程池在第一次提交任务时启动）
+compile_jobs = CompileJobs(model_cache, COMPILE_WORKERS, COMPILE_QUEUE)
+
+# tracemalloc内存分配跟踪（MAP_TRACEMALLOC=1时启用）
+if os.environ.get('MAP_TRACEMALLOC') == '1':
+    start_tracing(int(os.environ.get('MAP_TRACEMALLOC_FRAMES', '1')))
+
+# 手绘地图瓦片缓存
+tile_cache = TileCache(TILE_CACHE_DIR)
+
+# 并发单点请求合并器（未启用时为None）
+coalescer = PointCoalescer(COALESCE_WINDOW_MS, COALESCE_MAX_POINTS) if COALESCE_WINDOW_MS > 0 else None
+
+# 请求性能分析（MAP_PROFILE=1时启用，未启用时不注册任何请求钩子）
+PROFILE_DIR = os.environ.get('MAP_PROFILE_DIR') or os.path.join(STORAGE_DIR, 'profiles')
+profiler = None
+if os.environ.get('MAP_PROFILE') == '1':
+    profiler = RequestProfiler(PROFILE_DIR)
+    profiler.install(app)
+
+# 启动预热状态，ready在预热完成前为False
+warmup_state = {
+    'enabled': False,
+    'ready': True,
+    'started_at': None,
+    'finished_at': None,
+    'files': {}
+}
+
 def process_mapping_data(json_file_path):
     """
-    处理坐标映射数据，实时计算仿射变换矩阵
+    获取坐标映射数据对应的编译模型（优先使用缓存）
     
     Args:
         json_file_path (str): JSON文件路径
         
     Returns:
-        tuple: (triangulation, affine_matrices, coords_triangles, xy_triangles) 或 None
+        MappingModel: 编译后的映射模型 或 None
     """
     try:
         # 检查数据文件是否存在
@@ -42,28 +116,145 @@ def process_mapping_data(json_file_path):
             logger.warning(f"坐标映射数据文件不存在: {json_file_path}")
             return None
         
-        # 获取坐标数据
-        coords, xy = get_coordinate_data(json_file_path)
-        logger.info(f"加载了 {len(coords)} 个坐标点")
-        
-        # 进行三角剖分
-        triangulation = triangulate_coords(coords)
-        logger.info(f"生成了 {len(triangulation.simplices)} 个三角形")
-        
-        # 生成三角形列表
-        coords_triangles, xy_triangles = generate_triangle_lists(coords, xy, triangulation)
-        
-        # 实时计算仿射变换矩阵
-        logger.info("实时计算仿射变换矩阵...")
-        affine_matrices = calculate_all_affine_matrices(coords_triangles, xy_triangles)
-        
-        logger.info(f"成功计算了 {len(affine_matrices)} 个仿射变换矩阵")
-        return triangulation, affine_matrices, coords_triangles, xy_triangles
+        return model_cache.get(json_file_path)
         
     except Exception as e:
         logger.error(f"处理映射数据失败: {str(e)}")
         return None
 
+# 所有映射文件的范围索引，请求未指定jsonFile时自动选择地图
+map_index = MapIndex(STORAGE_DIR, process_mapping_data, model_cache.peek)
+
+def release_tiles(content_hash, json_file_path):
+    """
+    文件不再使用某个映射内容时清理该内容的瓦片（仍有其他文件使用同一内容时保留）
+    """
+    if content_hash is None:
+        return
+    others = [f for f in model_cache.content_files(content_hash) if f != os.path.basename(json_file_path)]
+    if others:
+        logger.info(f"映射内容仍被 {', '.join(others)} 使用，保留瓦片缓存")
+    else:
+        tile_cache.invalidate(content_hash)
+
+def compiling_response(json_file_path):
+    """
+    异步编译启用且模型尚未就绪时，提交（或复用）编译任务并返回"编译中"响应；
+    文件上次编译失败且之后未修改时直接返回失败原因，不再重复提交；
+    模型已就绪、文件不存在或未启用异步编译时返回None，由调用方按原流程处理
+    """
+    if not ASYNC_COMPILE or not os.path.exists(json_file_path) or model_cache.peek(json_file_path) is not None:
+        return None
+    failed = compile_jobs.failure(json_file_path)
+    if failed is not None:
+        response = jsonify({
+            'success': False,
+            'compiling': False,
+            'error': f'映射模型编译失败，请检查映射文件：{failed.error}',
+            'job': failed.to_dict()
+        })
+        response.status_code = 500
+        return response
+    try:
+        job = compile_jobs.submit(json_file_path)
+    except JobQueueFull as e:
+        response = jsonify({'success': False, 'compiling': True, 'message': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    response = jsonify({
+        'success': False,
+        'compiling': True,
+        'message': '映射模型正在编译，请稍后重试',
+        'job': job.to_dict()
+    })
+    response.status_code = 202
+    response.headers['Retry-After'] = '1'
+    return response
+
+def parse_transform_options(data):
+    """
+    解析请求中的变换模式参数
+    
+    Args:
+        data (dict): 请求数据，可包含mode ('affine'/'tps') 和 approxK（薄板样条近似邻域数）
+        
+    Returns:
+        tuple: (mode 或 None, approx_k 或 None)
+        
+    Raises:
+        ValueError: 参数不合法
+    """
+    mode = data.get('mode')
+    if mode is not None and mode not in TRANSFORM_MODES:
+        raise ValueError(f"不支持的变换模式: {mode}，可选: {', '.join(TRANSFORM_MODES)}")
+    
+    approx_k = data.get('approxK')
+    if approx_k is not None:
+        if not isinstance(approx_k, int) or not 3 <= approx_k <= APPROX_MAX_K:
+            raise ValueError(f'approxK 需要为3到{APPROX_MAX_K}之间的整数')
+    
+    return mode, approx_k
+
+def select_model_variant(model, data):
+    """请求中simplified为true且编译时做了控制点抽稀时，使用简化模型"""
+    if data.get('simplified') and model.simplified is not None:
+        return model.simplified
+    return model
+
+def parse_input_crs(data):
+    """
+    解析请求中的输入坐标系参数 inputCrs（默认为映射文件使用的GCJ-02）
+    
+    Raises:
+        ValueError: 不支持的坐标系
+    """
+    crs = data.get('inputCrs') or MAPPING_CRS
+    if crs not in CRS_CHOICES:
+        raise ValueError(f"不支持的坐标系: {crs}，可选: {', '.join(CRS_CHOICES)}")
+    return crs
+
+def start_warmup(max_workers=None, on_compiled=None, background=True):
+    """
+    启动映射模型预热：使用进程池并行编译存储目录中的所有映射文件
+    
+    Args:
+        max_workers (int): 进程池大小，默认为CPU核数
+        on_compiled (callable): 每个文件编译完成时的回调 (filename, seconds, error)
+        background (bool): 是否在后台线程中执行
+        
+    Returns:
+        threading.Thread 或 dict: 后台线程，或同步执行时的预热报告
+    """
+    warmup_state.update({
+        'enabled': True,
+        'ready': False,
+        'started_at': datetime.now().isoformat(),
+        'finished_at': None,
+        'files': {}
+    })
+    
+    def run():
+        start = time.perf_counter()
+        try:
+            report = warmup_models(STORAGE_DIR, model_cache, max_workers, on_compiled)
+            warmup_state['files'] = report
+            logger.info(f"映射模型预热完成: {len(report)} 个文件, "
+                        f"耗时 {time.perf_counter() - start:.2f} 秒")
+        except Exception as e:
+            logger.error(f"映射模型预热失败: {str(e)}")
+        finally:
+            warmup_state['finished_at'] = datetime.now().isoformat()
+            warmup_state['ready'] = True
+        return warmup_state['files']
+    
+    if not background:
+        return run()
+    
+    thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+    thread.start()
+    return thread
+
 def apply_affine_transformation(point, affine_matrix):
     """
     应用仿射变换到指定点
@@ -139,10 +330,7 @@ def coordinate_mapping():
         coordinates = data['coordinates']
         json_filename = data.get('jsonFile', '')
         
-        if not json_filename:
-            return jsonify({'error': '请选择坐标映射JSON文件'}), 400
-        
-        logger.info(f"接收到坐标: {coordinates}, 使用文件: {json_filename}")
+        logger.info(f"接收到坐标: {coordinates}, 使用文件: {json_filename or '自动选择'}")
         
         # 提取经纬度
         if len(coordinates) != 2:
@@ -150,25 +338,73 @@ def coordinate_mapping():
         
         lng, lat = coordinates
         
+        try:
+            mode, approx_k = parse_transform_options(data)
+            input_crs = parse_input_crs(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 转换到映射文件使用的GCJ-02坐标系
+        lng, lat = to_mapping_crs([[lng, lat]], input_crs)[0].tolist()
+        
+        # 未指定映射文件时，选择覆盖该点的优先级最高的地图
+        candidates = None
+        if not json_filename:
+            candidates = map_index.covering([lng, lat])
+            if not candidates:
+                return jsonify({
+                    'success': False,
+                    'original_coordinates': coordinates,
+                    'mapped_coordinates': [-1, -1],
+                    'message': '坐标不在任何映射文件的范围内',
+                    'candidates': [],
+                    'inputCrs': input_crs
+                })
+            json_filename = candidates[0]
+        
         # 构建文件路径
         json_file_path = os.path.join(STORAGE_DIR, json_filename)
         
-        # 处理映射数据
-        mapping_result = process_mapping_data(json_file_path)
+        # 获取编译后的映射模型（异步编译时模型未就绪则立即返回）
+        pending = compiling_response(json_file_path)
+        if pending is not None:
+            return pending
+        model = process_mapping_data(json_file_path)
         
-        if mapping_result is None:
+        if model is None:
             return jsonify({
                 'success': False,
                 'error': '映射数据处理失败，请检查选择的JSON文件',
                 'mapped_coordinates': [-1, -1]
             }), 500
         
-        triangulation, affine_matrices, coords_triangles, xy_triangles = mapping_result
-        
-        # 查找包含该点的三角形
-        triangle_index = find_triangle_containing_point(lng, lat, triangulation)
+        # 查找包含该点的三角形并进行变换
+        full_model = model
+        model = select_model_variant(model, data)
+        mode = mode or model.default_mode
+        if coalescer is not None:
+            # 与同一时间窗口内的其他单点请求合并为一次批量计算
+            mapped_point, triangle_index = coalescer.map_point(model, [lng, lat], mode, approx_k)
+            mapped = mapped_point[None, :]
+        else:
+            mapped, triangle_indices = model.map_points([[lng, lat]], mode, approx_k)
+            triangle_index = int(triangle_indices[0])
         
-        if triangle_index == -1:
+        if mode == 'tps':
+            # 平滑变换在映射范围外也能给出结果
+            mapped_coords = [float(mapped[0, 0]), float(mapped[0, 1])]
+            logger.info(f"平滑变换映射结果: {mapped_coords}")
+            response = {
+                'success': True,
+                'original_coordinates': coordinates,
+                'mapped_coordinates': mapped_coords,
+                'triangle_index': triangle_index,
+                'inside_hull': triangle_index != -1,
+                'mode': mode,
+                'message': '坐标映射成功',
+                'jsonFile': json_filename
+            }
+        elif triangle_index == -1:
             # 没有找到对应的三角形
             logger.warning(f"坐标 {coordinates} 不在任何三角形内")
             response = {
@@ -176,12 +412,12 @@ def coordinate_mapping():
                 'original_coordinates': coordinates,
                 'mapped_coordinates': [-1, -1],
                 'message': '坐标超出映射范围',
+                'mode': mode,
                 'jsonFile': json_filename
             }
         else:
-            # 找到对应的三角形，进行仿射变换
-            affine_matrix = affine_matrices[triangle_index]
-            mapped_coords = apply_affine_transformation(coordinates, affine_matrix)
+            # 找到对应的三角形，返回仿射变换结果
+            mapped_coords = [float(mapped[0, 0]), float(mapped[0, 1])]
             
             logger.info(f"坐标 {coordinates} 在第 {triangle_index + 1} 个三角形内")
             logger.info(f"映射结果: {mapped_coords}")
@@ -191,10 +427,19 @@ def coordinate_mapping():
                 'original_coordinates': coordinates,
                 'mapped_coordinates': mapped_coords,
                 'triangle_index': int(triangle_index),
+                'mode': mode,
                 'message': '坐标映射成功',
                 'jsonFile': json_filename
             }
         
+        response['inputCrs'] = input_crs
+        response['simplified'] = model is not full_model
+        if candidates is not None:
+            response['autoSelected'] = True
+            response['candidates'] = candidates
+        if input_crs != MAPPING_CRS:
+            response['gcj02_coordinates'] = [lng, lat]
+        
         return jsonify(response)
         
     except Exception as e:
@@ -205,6 +450,538 @@ def coordinate_mapping():
             'mapped_coordinates': [-1, -1]
         }), 500
 
+@app.route('/api/coordinate/batch', methods=['POST'])
+def coordinate_mapping_batch():
+    """
+    批量坐标映射API接口
+    接收坐标列表和JSON文件名，一次性返回所有映射后的坐标；
+    未指定JSON文件名时按坐标自动选择地图
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'coordinates' not in data:
+            return jsonify({'error': '缺少坐标数据'}), 400
+        
+        json_filename = data.get('jsonFile', '')
+        
+        try:
+            points = np.asarray(data['coordinates'], dtype=np.float64)
+        except (TypeError, ValueError):
+            points = None
+        if points is None or points.ndim != 2 or points.shape[1] != 2:
+            return jsonify({'error': '坐标格式错误，需要[[lng, lat], ...]格式'}), 400
+        
+        if len(points) > MAX_BATCH_POINTS:
+            return jsonify({'error': f'单次最多映射 {MAX_BATCH_POINTS} 个坐标'}), 400
+        
+        try:
+            mode, approx_k = parse_transform_options(data)
+            input_crs = parse_input_crs(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 整个数组一次性转换到GCJ-02，再批量映射
+        points = to_mapping_crs(points, input_crs)
+        
+        if not json_filename:
+            # 未指定映射文件：每个点路由到覆盖它的地图（按索引中的凸包判断，不编译模型），
+            # 所选地图的模型未就绪时与指定文件时一样提交编译任务并立即返回
+            routed = map_index.route(points)
+            for filename in routed[0]:
+                pending = compiling_response(os.path.join(STORAGE_DIR, filename))
+                if pending is not None:
+                    return pending
+            mapped, triangle_indices, files, partitions = map_index.map_points(points, mode, approx_k, routed)
+            inside_count = sum(p['count'] for p in partitions.values())
+            logger.info(f"批量映射 {len(points)} 个坐标, 自动选择 {len(partitions)} 个地图")
+            return jsonify({
+                'success': True,
+                'mapped_coordinates': mapped.tolist(),
+                'triangle_indices': triangle_indices.tolist(),
+                'files': files,
+                'partitions': partitions,
+                'inside_count': inside_count,
+                'total_count': int(len(points)),
+                'mode': mode,
+                'inputCrs': input_crs,
+                'autoSelected': True
+            })
+        
+        pending = compiling_response(os.path.join(STORAGE_DIR, json_filename))
+        if pending is not None:
+            return pending
+        full_model = process_mapping_data(os.path.join(STORAGE_DIR, json_filename))
+        if full_model is None:
+            return jsonify({
+                'success': False,
+                'error': '映射数据处理失败，请检查选择的JSON文件'
+            }), 500
+        
+        model = select_model_variant(full_model, data)
+        mode = mode or model.default_mode
+        mapped, triangle_indices = model.map_points(points, mode, approx_k)
+        inside_count = int(np.count_nonzero(triangle_indices >= 0))
+        logger.info(f"批量映射 {len(points)} 个坐标, {inside_count} 个在映射范围内, 使用文件: {json_filename}")
+        
+        return jsonify({
+            'success': True,
+            'mapped_coordinates': mapped.tolist(),
+            'triangle_indices': triangle_indices.tolist(),
+            'inside_count': inside_count,
+            'total_count': int(len(points)),
+            'mode': mode,
+            'inputCrs': input_crs,
+            'simplified': model is not full_model,
+            'jsonFile': json_filename
+        })
+        
+    except Exception as e:
+        logger.error(f"批量坐标映射错误: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': '服务器内部错误'
+        }), 500
+
+@app.route('/api/map-index', methods=['GET'])
+def map_index_info():
+    """
+    映射文件范围索引：自动选择地图时使用的各地图范围和优先级（按选择顺序排列）
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'maps': [entry.to_dict() for entry in map_index.entries()]
+        })
+    except Exception as e:
+        logger.error(f"获取映射文件范围索引失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取映射文件范围索引失败：{str(e)}'
+        }), 500
+
+@app.route('/api/coordinate/trajectory', methods=['POST'])
+def coordinate_mapping_trajectory():
+    """
+    轨迹映射API接口
+    按顺序映射一条轨迹（例如GPS记录），每个点先检查上一个点所在的三角形及其相邻三角形；
+    分段上传长轨迹时可以把上一段返回的last_triangle作为hint传入
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'coordinates' not in data:
+            return jsonify({'error': '缺少坐标数据'}), 400
+        
+        json_filename = data.get('jsonFile', '')
+        if not json_filename:
+            return jsonify({'error': '请选择坐标映射JSON文件'}), 400
+        
+        try:
+            points = np.asarray(data['coordinates'], dtype=np.float64)
+        except (TypeError, ValueError):
+            points = None
+        if points is None or points.ndim != 2 or points.shape[1] != 2:
+            return jsonify({'error': '坐标格式错误，需要[[lng, lat], ...]格式'}), 400
+        
+        if len(points) > MAX_BATCH_POINTS:
+            return jsonify({'error': f'单次最多映射 {MAX_BATCH_POINTS} 个坐标'}), 400
+        
+        hint = data.get('hint', -1)
+        if not isinstance(hint, int):
+            return jsonify({'error': 'hint 需要为整数（上一段轨迹的last_triangle）'}), 400
+        
+        try:
+            mode, approx_k = parse_transform_options(data)
+            input_crs = parse_input_crs(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 整个数组一次性转换到GCJ-02，再批量映射
+        points = to_mapping_crs(points, input_crs)
+        pending = compiling_response(os.path.join(STORAGE_DIR, json_filename))
+        if pending is not None:
+            return pending
+        full_model = process_mapping_data(os.path.join(STORAGE_DIR, json_filename))
+        if full_model is None:
+            return jsonify({
+                'success': False,
+                'error': '映射数据处理失败，请检查选择的JSON文件'
+            }), 500
+        
+        model = select_model_variant(full_model, data)
+        mode = mode or model.default_mode
+        triangle_indices, walk_stats = model.locate_trajectory(points, hint)
+        if mode == 'tps':
+            mapped = model.smooth_warp().evaluate(points, k=approx_k)
+        else:
+            mapped = model.transform_located(points, triangle_indices)
+        inside = np.flatnonzero(triangle_indices >= 0)
+        
+        return jsonify({
+            'success': True,
+            'mapped_coordinates': mapped.tolist(),
+            'triangle_indices': triangle_indices.tolist(),
+            'last_triangle': int(triangle_indices[inside[-1]]) if len(inside) else hint,
+            'walked_points': walk_stats['walked_points'],
+            'adjacent_points': walk_stats['adjacent_points'],
+            'inside_count': int(len(inside)),
+            'total_count': int(len(points)),
+            'mode': mode,
+            'inputCrs': input_crs,
+            'simplified': model is not full_model,
+            'jsonFile': json_filename
+        })
+        
+    except Exception as e:
+        logger.error(f"轨迹映射错误: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': '服务器内部错误'
+        }), 500
+
+def get_stream_model(json_filename):
+    """跟踪流使用的模型获取函数"""
+    return process_mapping_data(os.path.join(STORAGE_DIR, json_filename))
+
+if Sock is not None:
+    sock = Sock(app)
+    
+    @sock.route('/api/stream')
+    def tracking_stream(ws):
+        """
+        实时位置跟踪WebSocket接口
+        客户端订阅一次映射文件后持续推送位置，服务器逐条返回映射结果
+        """
+        stream = TrackingStream(get_stream_model)
+        logger.info("跟踪流已连接")
+        try:
+            while True:
+                text = ws.receive()
+                if text is None:
+                    break
+                ws.send(stream.handle_text(text))
+        finally:
+            logger.info(f"跟踪流已断开: {stream.stats()}")
+else:
+    logger.warning("未安装flask-sock，实时位置跟踪流 /api/stream 不可用")
+
+@app.route('/api/geojson', methods=['POST'])
+def geojson_mapping():
+    """
+    GeoJSON要素映射API接口
+    将整个FeatureCollection映射到手绘地图坐标，线段在三角网边处插入顶点以保持真实形状
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'geojson' not in data:
+            return jsonify({'error': '缺少GeoJSON数据'}), 400
+        
+        json_filename = data.get('jsonFile', '')
+        if not json_filename:
+            return jsonify({'error': '请选择坐标映射JSON文件'}), 400
+        
+        try:
+            mode, _ = parse_transform_options(data)
+            input_crs = parse_input_crs(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        pending = compiling_response(os.path.join(STORAGE_DIR, json_filename))
+        if pending is not None:
+            return pending
+        model = process_mapping_data(os.path.join(STORAGE_DIR, json_filename))
+        if model is None:
+            return jsonify({
+                'success': False,
+                'error': '映射数据处理失败，请检查选择的JSON文件'
+            }), 500
+        
+        mode = mode or model.default_mode
+        try:
+            mapped, stats = map_feature_collection(
+                model, data['geojson'], mode,
+                densify=bool(data.get('densify', True)),
+                max_vertices=MAX_BATCH_POINTS,
+                input_crs=input_crs
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'error': f'GeoJSON格式错误: {str(e)}'}), 400
+        
+        logger.info(f"GeoJSON映射 {stats['features']} 个要素, {stats['input_vertices']} 个顶点, "
+                    f"插入 {stats['inserted_vertices']} 个顶点, 使用文件: {json_filename}")
+        
+        return jsonify({
+            'success': True,
+            'geojson': mapped,
+            'stats': stats,
+            'mode': mode,
+            'inputCrs': input_crs,
+            'jsonFile': json_filename
+        })
+        
+    except Exception as e:
+        logger.error(f"GeoJSON映射错误: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': '服务器内部错误'
+        }), 500
+
+@app.route('/api/upload-image', methods=['POST'])
+def upload_image():
+    """
+    上传映射文件对应的手绘地图图像
+    表单字段: image (图像文件), jsonFile (映射文件名)
+    """
+    try:
+        image = request.files.get('image')
+        json_filename = request.form.get('jsonFile', '')
+        
+        if image is None or not json_filename:
+            return jsonify({
+                'success': False,
+                'message': '图像和映射文件名不能为空'
+            }), 400
+        
+        ext = os.path.splitext(image.filename or '')[1].lower()
+        if ext not in IMAGE_EXTENSIONS:
+            return jsonify({
+                'success': False,
+                'message': f"不支持的图像格式，可选: {', '.join(IMAGE_EXTENSIONS)}"
+            }), 400
+        
+        # 每个映射文件只保留一张图像
+        stem = os.path.splitext(os.path.basename(json_filename))[0]
+        for old_ext in IMAGE_EXTENSIONS:
+            old_path = os.path.join(IMAGE_DIR, stem + old_ext)
+            if os.path.exists(old_path):
+                os.unlink(old_path)
+        
+        os.makedirs(IMAGE_DIR, exist_ok=True)
+        image_path = os.path.join(IMAGE_DIR, stem + ext)
+        image.save(image_path)
+        
+        # 图像变化后旧图像的瓦片不再使用
+        json_file_path = os.path.join(STORAGE_DIR, json_filename)
+        if os.path.exists(json_file_path):
+            release_tiles(mapping_file_hash(json_file_path), json_file_path)
+        logger.info(f"成功保存手绘地图图像: {stem + ext}")
+        
+        return jsonify({
+            'success': True,
+            'message': '图像上传成功',
+            'filename': stem + ext,
+            'jsonFile': json_filename
+        })
+        
+    except Exception as e:
+        logger.error(f"上传图像失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'上传图像失败：{str(e)}'
+        }), 500
+
+@app.route('/api/warped-image/<filename>', methods=['GET'])
+def warped_image(filename):
+    """
+    获取变形到经纬度空间的手绘地图PNG图像（用于腾讯地图叠加图层）
+    查询参数: width (输出宽度，默认1024), bounds (min_lng,min_lat,max_lng,max_lat，默认为控制点范围)
+    图像的经纬度范围在响应头 X-Map-Bounds 中返回
+    """
+    try:
+        model = process_mapping_data(os.path.join(STORAGE_DIR, filename))
+        image_path = find_mapping_image(IMAGE_DIR, filename)
+        if model is None or image_path is None:
+            return jsonify({
+                'success': False,
+                'message': '映射文件或对应的手绘地图图像不存在'
+            }), 404
+        
+        try:
+            width = int(request.args.get('width', 1024))
+            bounds = request.args.get('bounds')
+            bounds = [float(v) for v in bounds.split(',')] if bounds else None
+            if width <= 0 or (bounds is not None and len(bounds) != 4):
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': '参数格式错误，width为正整数，bounds为min_lng,min_lat,max_lng,max_lat'
+            }), 400
+        
+        start = time.perf_counter()
+        try:
+            rgba, bounds = warp_image(model, get_image(image_path), bounds, width)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        logger.info(f"生成变形图像 {filename}: {rgba.shape[1]}x{rgba.shape[0]}, "
+                    f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+        
+        response = Response(encode_png(rgba), mimetype='image/png')
+        response.headers['X-Map-Bounds'] = ','.join(repr(v) for v in bounds)
+        return response
+        
+    except Exception as e:
+        logger.error(f"生成变形图像失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'生成变形图像失败：{str(e)}'
+        }), 500
+
+@app.route('/tiles/<mapping>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def map_tile(mapping, z, x, y):
+    """
+    手绘地图XYZ瓦片（Web墨卡托，256像素）
+    首次请求时通过三角网渲染并写入磁盘缓存，之后直接返回缓存文件
+    """
+    try:
+        if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            return jsonify({'success': False, 'message': '瓦片坐标超出范围'}), 404
+        
+        model = process_mapping_data(os.path.join(STORAGE_DIR, mapping))
+        image_path = find_mapping_image(IMAGE_DIR, mapping)
+        if model is None or image_path is None:
+            return jsonify({
+                'success': False,
+                'message': '映射文件或对应的手绘地图图像不存在'
+            }), 404
+        
+        path, hit = tile_cache.get_tile(model, image_path, z, x, y)
+        if path is None:
+            response = Response(empty_tile_png(), mimetype='image/png')
+        else:
+            response = send_file(path, mimetype='image/png', max_age=TILE_MAX_AGE)
+        response.headers['X-Tile-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+        
+    except Exception as e:
+        logger.error(f"获取瓦片失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取瓦片失败：{str(e)}'
+        }), 500
+
+def bundle_response(data):
+    """二进制映射包响应"""
+    response = Response(data, mimetype='application/octet-stream')
+    response.headers['X-Bundle-Hash'] = bundle_hash(data)
+    return response
+
+@app.route('/api/bundle/<filename>', methods=['GET'])
+def mapping_bundle(filename):
+    """
+    获取映射文件当前的二进制映射包（浏览器本地映射用），simplified=1时使用抽稀后的简化模型
+    响应以内容哈希为ETag，需要重新验证；响应头 X-Bundle-Url 为可永久缓存的按哈希访问地址
+    """
+    try:
+        model = process_mapping_data(os.path.join(STORAGE_DIR, filename))
+        if model is None:
+            return jsonify({
+                'success': False,
+                'message': '映射文件不存在或处理失败'
+            }), 404
+        
+        model = select_model_variant(model, {'simplified': request.args.get('simplified') == '1'})
+        data = model.bundle()
+        response = bundle_response(data)
+        response.headers['X-Bundle-Url'] = f"/api/bundle/{filename}/{response.headers['X-Bundle-Hash']}.bin"
+        response.set_etag(response.headers['X-Bundle-Hash'])
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        logger.error(f"生成二进制映射包失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'生成二进制映射包失败：{str(e)}'
+        }), 500
+
+@app.route('/api/bundle/<filename>/<digest>.bin', methods=['GET'])
+def mapping_bundle_by_hash(filename, digest):
+    """
+    按内容哈希获取二进制映射包，内容不会变化，可以永久缓存；
+    映射文件已更新、哈希不再对应任何模型时返回404
+    """
+    try:
+        model = process_mapping_data(os.path.join(STORAGE_DIR, filename))
+        for variant in (model, model and model.simplified):
+            if variant is not None and bundle_hash(variant.bundle()) == digest:
+                response = bundle_response(variant.bundle())
+                response.cache_control.public = True
+                response.cache_control.max_age = BUNDLE_MAX_AGE
+                response.cache_control.immutable = True
+                return response
+        return jsonify({
+            'success': False,
+            'message': '映射包不存在或映射文件已更新'
+        }), 404
+        
+    except Exception as e:
+        logger.error(f"获取二进制映射包失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取二进制映射包失败：{str(e)}'
+        }), 500
+
+@app.route('/api/compile-jobs', methods=['POST'])
+def submit_compile_job():
+    """
+    提交映射文件编译任务，立即返回任务编号（同一文件已在编译时返回该任务）
+    """
+    try:
+        data = request.get_json()
+        if not data or not data.get('jsonFile'):
+            return jsonify({
+                'success': False,
+                'message': '请提供JSON文件名'
+            }), 400
+        
+        json_filename = data['jsonFile']
+        json_file_path = os.path.join(STORAGE_DIR, json_filename)
+        if os.path.basename(json_filename) != json_filename or not os.path.exists(json_file_path):
+            return jsonify({
+                'success': False,
+                'message': '映射文件不存在'
+            }), 404
+        
+        try:
+            job = compile_jobs.submit(json_file_path)
+        except JobQueueFull as e:
+            return jsonify({'success': False, 'message': str(e)}), 503
+        return jsonify({'success': True, 'job': job.to_dict()}), 202
+        
+    except Exception as e:
+        logger.error(f"提交编译任务失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'提交编译任务失败：{str(e)}'
+        }), 500
+
+@app.route('/api/compile-jobs', methods=['GET'])
+def list_compile_jobs():
+    """
+    列出编译任务（最新的在前）和任务统计
+    """
+    return jsonify({
+        'success': True,
+        'jobs': [job.to_dict() for job in compile_jobs.jobs()],
+        'stats': compile_jobs.stats()
+    })
+
+@app.route('/api/compile-jobs/<job_id>', methods=['GET'])
+def get_compile_job(job_id):
+    """
+    查询编译任务的状态、当前阶段和进度
+    """
+    job = compile_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '编译任务不存在'
+        }), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
@@ -212,11 +989,67 @@ def health_check():
         'status': 'healthy',
         'message': '服务正常运行',
         'storage_dir': STORAGE_DIR,
-        'storage_dir_exists': os.path.exists(STORAGE_DIR)
+        'storage_dir_exists': os.path.exists(STORAGE_DIR),
+        'ready': warmup_state['ready']
+    }
+    
+    if warmup_state['enabled']:
+        status['warmup'] = {
+            'started_at': warmup_state['started_at'],
+            'finished_at': warmup_state['finished_at'],
+            'files': warmup_state['files']
+        }
+    
+    if coalescer is not None:
+        status['coalescer'] = coalescer.stats()
+    
+    status['compile_jobs'] = compile_jobs.stats()
+    status['model_cache'] = model_cache.stats()
+    
+    memory = model_cache.memory_report()
+    status['memory'] = {
+        'models': len(memory['models']),
+        'models_bytes': memory['total_bytes'],
+        'budget_bytes': memory['budget_bytes'],
+        'image_cache_bytes': image_cache_bytes()
     }
     
     return jsonify(status)
 
+@app.route('/api/memory', methods=['GET'])
+def memory_info():
+    """
+    内存占用接口：每个已编译模型的内存明细、总量和预算；
+    snapshot=1 且开启了tracemalloc时附带内存分配快照（与上一次快照比较）
+    """
+    try:
+        report = model_cache.memory_report()
+        response = {
+            'success': True,
+            'models': report['models'],
+            'models_bytes': report['total_bytes'],
+            'budget_bytes': report['budget_bytes'],
+            'evictions': report['evictions'],
+            'image_cache_bytes': image_cache_bytes()
+        }
+        response['total_bytes'] = response['models_bytes'] + response['image_cache_bytes']
+        
+        if request.args.get('snapshot') == '1':
+            snapshot = take_snapshot(int(request.args.get('limit', 20)))
+            if snapshot is None:
+                response['tracemalloc'] = {'enabled': False, 'message': '请设置环境变量 MAP_TRACEMALLOC=1'}
+            else:
+                response['tracemalloc'] = dict(snapshot, enabled=True)
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        logger.error(f"获取内存信息失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取内存信息失败：{str(e)}'
+        }), 500
+
 @app.route('/api/mapping-info', methods=['POST'])
 def mapping_info():
     """
@@ -234,41 +1067,32 @@ def mapping_info():
         json_filename = data['jsonFile']
         json_file_path = os.path.join(STORAGE_DIR, json_filename)
         
-        # 处理映射数据
-        mapping_result = process_mapping_data(json_file_path)
+        # 获取编译后的映射模型（异步编译时模型未就绪则立即返回）
+        pending = compiling_response(json_file_path)
+        if pending is not None:
+            return pending
+        model = process_mapping_data(json_file_path)
         
-        if mapping_result is None:
+        if model is None:
             return jsonify({
                 'success': False,
                 'message': '映射数据处理失败'
             })
         
-        triangulation, affine_matrices, coords_triangles, xy_triangles = mapping_result
-        
-        # 确保返回的数据是JSON可序列化的
-        coords_sample = []
-        xy_sample = []
-        
-        if coords_triangles:
-            # 转换前2个样本为Python原生类型
-            coords_sample = [
-                [[float(coord[0]), float(coord[1])] for coord in triangle]
-                for triangle in coords_triangles[:2]
-            ]
-        
-        if xy_triangles:
-            # 转换前2个样本为Python原生类型
-            xy_sample = [
-                [[float(coord[0]), float(coord[1])] for coord in triangle]
-                for triangle in xy_triangles[:2]
-            ]
+        # 转换前2个样本三角形为Python原生类型，确保JSON可序列化
+        coords_sample = model.coords_triangles(2).tolist()
+        xy_sample = model.xy_triangles(2).tolist()
         
         return jsonify({
             'success': True,
-            'triangles_count': int(len(triangulation.simplices)),
-            'matrices_count': int(len(affine_matrices)),
+            'triangles_count': model.triangles_count,
+            'matrices_count': model.triangles_count,
             'coords_triangles_sample': coords_sample,
             'xy_triangles_sample': xy_sample,
+            'simplify': model.simplify_report,
+            'quality': model.quality_report,
+            'precision': model.precision,
+            'compact': model.compact_report,
             'jsonFile': json_filename
         })
         
@@ -279,6 +1103,122 @@ def mapping_info():
             'message': f'获取映射信息失败：{str(e)}'
         }), 500
 
+@app.route('/api/viewport', methods=['POST'])
+def viewport():
+    """
+    视口查询接口
+    返回与可见范围相交的三角形和范围内的控制点（腾讯地图或手绘地图坐标空间），用于绘制三角网和控制点
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'jsonFile' not in data or 'bbox' not in data:
+            return jsonify({
+                'success': False,
+                'message': '请提供JSON文件名和bbox'
+            }), 400
+        
+        json_filename = data['jsonFile']
+        json_file_path = os.path.join(STORAGE_DIR, json_filename)
+        
+        pending = compiling_response(json_file_path)
+        if pending is not None:
+            return pending
+        model = process_mapping_data(json_file_path)
+        
+        if model is None:
+            return jsonify({
+                'success': False,
+                'message': '映射数据处理失败'
+            })
+        model = select_model_variant(model, data)
+        
+        try:
+            result = viewport_query(model, data['bbox'], data.get('space', 'tencent'),
+                                    data.get('limit', VIEWPORT_LIMIT), data.get('width'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        return jsonify({'success': True, 'jsonFile': json_filename, **result})
+        
+    except Exception as e:
+        logger.error(f"视口查询失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'视口查询失败：{str(e)}'
+        }), 500
+
+@app.route('/api/landmarks', methods=['POST'])
+def landmarks():
+    """
+    最近控制点查询接口
+    批量查询点（腾讯地图或手绘地图坐标）附近的控制点：k近邻或半径查询，
+    返回控制点编号（映射文件mappings中的位置）、距离和两个空间中的坐标
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'jsonFile' not in data or 'points' not in data:
+            return jsonify({
+                'success': False,
+                'message': '请提供JSON文件名和points'
+            }), 400
+        
+        json_filename = data['jsonFile']
+        json_file_path = os.path.join(STORAGE_DIR, json_filename)
+        space = data.get('space', 'tencent')
+        
+        try:
+            points = np.asarray(data['points'], dtype=np.float64)
+        except (TypeError, ValueError):
+            points = None
+        if points is None or points.ndim != 2 or points.shape[1] != 2:
+            return jsonify({'success': False, 'message': '坐标格式错误，需要[[x, y], ...]格式'}), 400
+        if len(points) > MAX_BATCH_POINTS:
+            return jsonify({'success': False, 'message': f'单次最多查询 {MAX_BATCH_POINTS} 个坐标'}), 400
+        
+        try:
+            input_crs = parse_input_crs(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        if space == 'tencent':
+            points = to_mapping_crs(points, input_crs)
+        
+        pending = compiling_response(json_file_path)
+        if pending is not None:
+            return pending
+        model = process_mapping_data(json_file_path)
+        
+        if model is None:
+            return jsonify({
+                'success': False,
+                'message': '映射数据处理失败'
+            })
+        
+        # 控制点编号对应映射文件中的位置，因此始终使用完整模型
+        try:
+            results = nearest_landmarks(model, points, space, data.get('k'), data.get('radius'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'space': space,
+            'k': data.get('k'),
+            'radius': data.get('radius'),
+            'total_count': int(len(points)),
+            'inputCrs': input_crs,
+            'jsonFile': json_filename
+        })
+        
+    except Exception as e:
+        logger.error(f"最近控制点查询失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'最近控制点查询失败：{str(e)}'
+        }), 500
+
 # 文件管理相关的API端点
 @app.route('/api/save-json', methods=['POST'])
 def save_json():
@@ -300,17 +1240,39 @@ def save_json():
         # 生成文件路径
         file_path = os.path.join(STORAGE_DIR, filename)
         
+        old_hash = mapping_file_hash(file_path) if os.path.exists(file_path) else None
+        
         # 写入文件
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(json_data, f, ensure_ascii=False, indent=2)
         
+        # 覆盖已有文件时移除旧的编译模型和旧内容的瓦片缓存（其他文件仍使用旧内容时保留）
+        content_hash = mapping_file_hash(file_path)
+        model_cache.invalidate(file_path)
+        if old_hash != content_hash:
+            release_tiles(old_hash, file_path)
+        same_content = [f for f in model_cache.content_files(content_hash) if f != filename] if content_hash else []
+        if same_content:
+            logger.info(f"{filename} 与 {', '.join(same_content)} 的映射内容相同，共用编译模型和瓦片缓存")
+        
+        # 异步编译时在后台编译新内容
+        job = None
+        if ASYNC_COMPILE and filename.endswith('.json'):
+            try:
+                job = compile_jobs.submit(file_path)
+            except JobQueueFull as e:
+                logger.warning(f"保存后未能提交编译任务: {str(e)}")
+        
         logger.info(f"成功保存文件: {filename}")
         
         return jsonify({
             'success': True,
             'message': '文件保存成功',
             'filepath': file_path,
-            'filename': filename
+            'filename': filename,
+            'contentHash': content_hash,
+            'sameContentAs': same_content,
+            'compileJob': job.to_dict() if job is not None else None
         })
         
     except Exception as e:
@@ -377,6 +1339,49 @@ def download_file(filename):
             'message': f'下载文件失败：{str(e)}'
         }), 500
 
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """
+    列出最近的请求性能分析结果
+    """
+    if profiler is None:
+        return jsonify({
+            'success': False,
+            'message': '请求性能分析未启用，请设置环境变量 MAP_PROFILE=1'
+        }), 404
+    
+    try:
+        limit = int(request.args.get('limit', 20))
+        return jsonify({
+            'success': True,
+            'profiles': profiler.list_profiles(limit)
+        })
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit 需要为整数'}), 400
+
+@app.route('/api/profiles/<name>', methods=['GET'])
+def get_profile(name):
+    """
+    获取性能分析结果：默认返回热点函数摘要，format=prof时下载cProfile文件
+    """
+    if profiler is None:
+        return jsonify({
+            'success': False,
+            'message': '请求性能分析未启用，请设置环境变量 MAP_PROFILE=1'
+        }), 404
+    
+    extension = '.prof' if request.args.get('format') == 'prof' else '.json'
+    if os.path.basename(name) != name or not os.path.exists(os.path.join(PROFILE_DIR, name + extension)):
+        return jsonify({
+            'success': False,
+            'message': '分析结果不存在'
+        }), 404
+    
+    if extension == '.prof':
+        return send_from_directory(PROFILE_DIR, name + extension, as_attachment=True)
+    with open(os.path.join(PROFILE_DIR, name + extension), 'r', encoding='utf-8') as f:
+        return jsonify({'success': True, 'profile': json.load(f)})
+
 @app.route('/api/delete/<filename>', methods=['DELETE'])
 def delete_file(filename):
     """
@@ -391,7 +1396,10 @@ def delete_file(filename):
                 'message': '文件不存在'
             }), 404
         
+        content_hash = mapping_file_hash(file_path)
         os.unlink(file_path)
+        model_cache.invalidate(file_path)
+        release_tiles(content_hash, file_path)
         logger.info(f"成功删除文件: {filename}")
         
         return jsonify({
@@ -409,14 +1417,27 @@ def delete_file(filename):
 if __name__ == '__main__':
     print("🚀 Flask服务器启动中...")
     print("📍 坐标映射API: http://localhost:5000/api/coordinate")
+    print("📍 批量坐标映射: http://localhost:5000/api/coordinate/batch")
+    print("🚶 轨迹映射: http://localhost:5000/api/coordinate/trajectory")
+    print("🧭 地图范围索引: http://localhost:5000/api/map-index")
+    print("🗺️  GeoJSON映射: http://localhost:5000/api/geojson")
+    print("📡 位置跟踪流: ws://localhost:5000/api/stream")
+    print("🖼️  变形图像: http://localhost:5000/api/warped-image/<filename>")
+    print("🧱 地图瓦片: http://localhost:5000/tiles/<filename>/<z>/<x>/<y>.png")
+    print("📦 二进制映射包: http://localhost:5000/api/bundle/<filename>")
+    print("⚙️  编译任务: http://localhost:5000/api/compile-jobs")
     print("🔍 健康检查: http://localhost:5000/api/health")
+    print("🧠 内存占用: http://localhost:5000/api/memory")
     print("📊 映射信息: http://localhost:5000/api/mapping-info")
+    print("🔲 视口查询: http://localhost:5000/api/viewport")
+    print("📌 最近控制点: http://localhost:5000/api/landmarks")
     print("📁 映射文件列表: http://localhost:5000/api/mapping-files")
     print("💾 文件管理API:")
     print("  - 保存JSON: http://localhost:5000/api/save-json")
     print("  - 获取文件列表: http://localhost:5000/api/saved-files")
     print("  - 下载文件: http://localhost:5000/api/download/<filename>")
     print("  - 删除文件: http://localhost:5000/api/delete/<filename>")
+    print("⏱️  性能分析结果 (MAP_PROFILE=1): http://localhost:5000/api/profiles")
     
     print("✅ 坐标映射服务已启动 (支持动态文件选择)")
     
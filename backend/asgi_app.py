@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ASGI异步服务
+在异步服务器（如uvicorn）中提供与Flask服务相同的全部路由：连接、请求体读取和响应发送都在事件循环中完成，
+保持连接的空闲客户端和上传/下载较慢的客户端不占用工作线程；路由处理分两个有上限的线程池通道执行：
+
+- cpu 通道：坐标映射、GeoJSON、映射信息、图像变形、瓦片和映射包（三角形查找和仿射变换，可能触发冷编译）
+- io 通道：健康检查、文件管理、编译任务等其他路由，以及流式响应（文件下载）逐块读取文件
+
+冷编译或大批量请求占满 cpu 通道时，健康检查和文件列表仍由 io 通道及时处理。
+每个通道进行中和排队的请求数达到 workers + queue 时直接返回503（Retry-After），不在服务端无限排队。
+使用线程池而不是进程池：模型缓存、瓦片缓存和请求合并器在进程内共享，numpy/scipy 的批量计算会释放GIL
+
+运行:
+    uvicorn asgi_app:application --host 0.0.0.0 --port 5000
+"""
+
+import io
+import os
+import sys
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app as flask_app, start_warmup, compile_jobs
+
+logger = logging.getLogger(__name__)
+
+# 通道配置（工作线程数、排队上限）和请求体大小上限
+CPU_WORKERS = int(os.environ.get('MAP_ASGI_CPU_WORKERS', str(os.cpu_count() or 4)))
+CPU_QUEUE = int(os.environ.get('MAP_ASGI_CPU_QUEUE', '64'))
+IO_WORKERS = int(os.environ.get('MAP_ASGI_IO_WORKERS', '16'))
+IO_QUEUE = int(os.environ.get('MAP_ASGI_IO_QUEUE', '256'))
+MAX_BODY_BYTES = int(float(os.environ.get('MAP_ASGI_MAX_BODY_MB', '64')) * 1024 * 1024)
+
+# 在 cpu 通道中处理的路由前缀，其他路由在 io 通道中处理
+CPU_ROUTES = ('/api/coordinate', '/api/geojson', '/api/mapping-info', '/api/viewport', '/api/landmarks',
+              '/api/upload-image', '/api/warped-image/', '/tiles/', '/api/bundle/')
+
+# 通道已满时建议客户端重试的间隔（秒）
+RETRY_AFTER_SECONDS = 1
+
+
+class ExecutorFull(Exception):
+    """通道中进行中和排队的请求数已达上限"""
+
+
+class ExecutorLane:
+    """
+    有上限的线程池通道（线程池在第一次提交时创建）
+    计数只在事件循环线程中修改：任务结束时通过 call_soon_threadsafe 回到事件循环释放名额，
+    客户端断开后仍在执行的任务在真正结束前继续占用名额
+
+    Args:
+        name (str): 通道名称
+        workers (int): 工作线程数
+        queue (int): 排队上限（不含正在执行的请求）
+    """
+
+    def __init__(self, name, workers, queue):
+        self.name = name
+        self.workers = workers
+        self.queue = queue
+        self._executor = None
+        self.in_flight = 0
+        self.peak = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'asgi-{self.name}')
+        return self._executor
+
+    def _release(self):
+        self.in_flight -= 1
+        self.completed += 1
+
+    async def run(self, func, *args):
+        """
+        在通道中执行函数（计入上限）
+
+        Raises:
+            ExecutorFull: 进行中和排队的请求数已达上限
+        """
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise ExecutorFull(f"{self.name} 通道繁忙（{self.capacity}）")
+        loop = asyncio.get_running_loop()
+        future = self._ensure_executor().submit(func, *args)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:  # 事件循环已关闭
+                pass
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    async def stream(self, func, *args):
+        """在通道中执行已接受请求的后续步骤（如读取下一块响应），不计入上限"""
+        return await asyncio.wrap_future(self._ensure_executor().submit(func, *args))
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'queue': self.queue,
+            'in_flight': self.in_flight,
+            'peak': self.peak,
+            'completed': self.completed,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def build_environ(scope, body):
+    """由ASGI HTTP请求构造WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = str(scope['client'][0]), str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _close_iterable(iterable):
+    close = getattr(iterable, 'close', None)
+    if close is not None:
+        close()
+
+
+def _call_wsgi(wsgi_app, environ):
+    """
+    在工作线程中调用WSGI应用并取出前两块响应（生成器形式的响应在取第一块时才调用start_response）
+    只有一块的响应（如jsonify）在此完整生成并关闭，更多块的响应（如文件下载）由调用方继续流式读取
+
+    Returns:
+        tuple: (状态码, 响应头, 已取出的块列表, 未读完的迭代器（已完整生成时为None）, 响应可迭代对象)
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    iterable = wsgi_app(environ, start_response)
+    iterator = iter(iterable)
+    chunks = [chunk for chunk in (next(iterator, None), next(iterator, None)) if chunk is not None]
+    if len(chunks) < 2:
+        _close_iterable(iterable)
+        return response['status'], response['headers'], chunks, None, iterable
+    return response['status'], response['headers'], chunks, iterator, iterable
+
+
+class AsyncServer:
+    """
+    ASGI应用：把HTTP请求交给WSGI应用（Flask）在有上限的线程池通道中处理
+
+    Args:
+        wsgi_app (callable): WSGI应用
+        cpu_workers / cpu_queue (int): cpu 通道的线程数和排队上限
+        io_workers / io_queue (int): io 通道的线程数和排队上限
+        max_body_bytes (int): 请求体大小上限，超出时返回413
+        warmup (bool): 启动时（lifespan startup）是否在后台预热映射模型
+    """
+
+    def __init__(self, wsgi_app, cpu_workers=CPU_WORKERS, cpu_queue=CPU_QUEUE, io_workers=IO_WORKERS,
+                 io_queue=IO_QUEUE, max_body_bytes=MAX_BODY_BYTES, warmup=False):
+        self.wsgi_app = wsgi_app
+        self.cpu = ExecutorLane('cpu', cpu_workers, cpu_queue)
+        self.io = ExecutorLane('io', io_workers, io_queue)
+        self.max_body_bytes = max_body_bytes
+        self.warmup = warmup
+
+    def lane_for(self, path):
+        """路由所在的通道"""
+        return self.cpu if path.startswith(CPU_ROUTES) else self.io
+
+    def stats(self):
+        return {'cpu': self.cpu.stats(), 'io': self.io.stats(), 'max_body_bytes': self.max_body_bytes}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            # WebSocket跟踪流需要使用Flask服务（flask-sock）
+            await send({'type': 'websocket.close', 'code': 1003})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.warmup:
+                    start_warmup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.cpu.shutdown()
+                self.io.shutdown()
+                compile_jobs.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        """读取请求体；客户端断开时返回None，超出上限时抛出ValueError"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise ValueError(f"请求体超出上限（{self.max_body_bytes} 字节）")
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def _send_json(self, send, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        *headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _http(self, scope, receive, send):
+        if scope['path'] == '/api/async-status':
+            await self._send_json(send, 200, {'success': True, **self.stats()})
+            return
+        try:
+            body = await self._read_body(receive)
+        except ValueError as e:
+            await self._send_json(send, 413, {'success': False, 'message': str(e)})
+            return
+        if body is None:
+            return
+
+        lane = self.lane_for(scope['path'])
+        try:
+            status, headers, chunks, iterator, iterable = await lane.run(
+                _call_wsgi, self.wsgi_app, build_environ(scope, body))
+        except ExecutorFull as e:
+            await self._send_json(send, 503, {'success': False, 'message': f"服务繁忙，请稍后重试：{str(e)}"},
+                                  headers=[(b'retry-after', str(RETRY_AFTER_SECONDS).encode())])
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        if iterator is None:
+            await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+            return
+        # 流式响应（如文件下载）：后续各块在 io 通道中读取，等待客户端接收时不占用线程
+        try:
+            await send({'type': 'http.response.body', 'body': chunks[0], 'more_body': True})
+            chunk = chunks[1]
+            while True:
+                following = await self.io.stream(next, iterator, None)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': following is not None})
+                if following is None:
+                    return
+                chunk = following
+        finally:
+            await self.io.stream(_close_iterable, iterable)
+
+
+def create_asgi_app(wsgi_app=flask_app, **options):
+    """创建ASGI应用，默认包装 app.py 中的Flask应用（options见AsyncServer）"""
+    return AsyncServer(wsgi_app, **options)
+
+
+application = create_asgi_app(warmup=os.environ.get('MAP_WARMUP', '1') != '0')
+
+
+def main():
+    """使用uvicorn启动异步服务"""
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ 缺少依赖: uvicorn")
+        print("   请运行: pip install uvicorn")
+        sys.exit(1)
+
+    print("🚀 启动ASGI异步服务...")
+    print(f"⚙️  cpu 通道: {CPU_WORKERS} 线程, 排队上限 {CPU_QUEUE}")
+    print(f"📂 io 通道: {IO_WORKERS} 线程, 排队上限 {IO_QUEUE}")
+    print("📊 通道状态: http://localhost:5000/api/async-status")
+    uvicorn.run(application, host='0.0.0.0', port=5000)
+
+
+if __name__ == '__main__':
+    main()
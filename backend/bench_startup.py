@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+冷启动基准脚本
+启动一个全新的Flask进程，测量模块导入耗时、首次成功响应 /api/health
+以及首次成功响应 /api/coordinate 的耗时
+
+用法:
+    python bench_startup.py [--runs 3] [--points 500]
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+
+import requests
+
+from synthetic_data import write_sample_mapping, sample_points_in_bounds
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import_time(module='app'):
+    """在全新的解释器中测量导入模块的耗时（毫秒）及已加载的重量级模块"""
+    code = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        "heavy = [m for m in ('matplotlib', 'scipy') if m in sys.modules]\n"
+        "print(json.dumps({'import_ms': elapsed, 'heavy_modules': heavy}))\n"
+    )
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=BACKEND_DIR,
+                                     stderr=subprocess.DEVNULL)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def free_port():
+    """获取一个本地空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server_process(storage_dir, port):
+    """在子进程中启动Flask服务（多线程模式），使用指定的存储目录"""
+    env = dict(os.environ, MAP_STORAGE_DIR=storage_dir)
+    code = (f"from app import app; "
+            f"app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)")
+    return subprocess.Popen([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_for_server(url, start, timeout):
+    """轮询直到url返回200，start为计时起点"""
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"服务在 {timeout} 秒内未响应: {url}")
+
+
+def measure_startup(n_points=500, timeout=30):
+    """
+    启动服务进程并测量首次响应耗时
+
+    Returns:
+        dict: health_ms / coordinate_ms 均为从进程启动开始计时的毫秒数
+    """
+    storage_dir = tempfile.mkdtemp()
+    write_sample_mapping(os.path.join(storage_dir, 'bench.json'), n_points=n_points)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    process = start_server_process(storage_dir, port)
+    try:
+        wait_for_server(f"{base_url}/api/health", start, timeout)
+        health_ms = (time.perf_counter() - start) * 1000
+
+        point = sample_points_in_bounds(1)[0].tolist()
+        response = requests.post(f"{base_url}/api/coordinate",
+                                 json={'coordinates': point, 'jsonFile': 'bench.json'},
+                                 timeout=timeout)
+        response.raise_for_status()
+        coordinate_ms = (time.perf_counter() - start) * 1000
+        return {'health_ms': health_ms, 'coordinate_ms': coordinate_ms}
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(storage_dir)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='Flask服务冷启动基准')
+    parser.add_argument('--runs', type=int, default=3, help='重复次数')
+    parser.add_argument('--points', type=int, default=500, help='合成映射文件的控制点数量')
+    args = parser.parse_args()
+
+    print("⏱️  冷启动基准测试")
+    print("=" * 50)
+
+    imports = [measure_import_time() for _ in range(args.runs)]
+    best = min(imports, key=lambda r: r['import_ms'])
+    print(f"📦 import app: {best['import_ms']:.1f} ms "
+          f"(已加载重量级模块: {best['heavy_modules'] or '无'})")
+
+    startups = [measure_startup(args.points) for _ in range(args.runs)]
+    for i, result in enumerate(startups):
+        print(f"🚀 第{i+1}次: 首次 /api/health {result['health_ms']:.1f} ms, "
+              f"首次 /api/coordinate {result['coordinate_ms']:.1f} ms")
+    print(f"🏁 最佳: /api/health {min(r['health_ms'] for r in startups):.1f} ms, "
+          f"/api/coordinate {min(r['coordinate_ms'] for r in startups):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+轨迹查找基准脚本
+在合成步行轨迹上比较实时跟踪（位置逐个到达）时两种三角形查找方式的每点耗时:
+逐点独立调用 find_simplex，以及以上一个点所在三角形为提示的轨迹查找；
+同时给出整条轨迹一次性查找（locate_trajectory 批量路径）的耗时作为参考
+
+用法:
+    python bench_trajectory.py [--points 2000] [--trace 20000] [--step 1.4]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from mapping_model import compile_mapping_model
+from synthetic_data import write_sample_mapping, walking_trace
+
+
+def best_of(func, runs=3):
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(n_points=2000, trace_length=20000, step_m=1.4, seed=0):
+    """
+    运行基准
+
+    Returns:
+        dict: 各方式每点耗时（微秒）、逐点行走的提示命中率、轨迹相邻率和加速比
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'bench.json')
+        write_sample_mapping(path, n_points=n_points, seed=seed)
+        model = compile_mapping_model(path)
+        trace = walking_trace(trace_length, seed=seed, step_m=step_m)
+        triangulation = model.triangulation
+
+        expected = triangulation.find_simplex(trace)
+        indices, walk_stats = model.locate_trajectory(trace)
+        assert np.array_equal(indices, expected), '轨迹查找结果与find_simplex不一致'
+
+        def streamed():
+            last, hits = -1, 0
+            for point in trace:
+                index, hit = model.locate_next(point, last)
+                hits += hit
+                if index >= 0:
+                    last = index
+            return hits
+
+        hint_hits = streamed()
+
+        independent = best_of(lambda: [triangulation.find_simplex(trace[i:i + 1]) for i in range(len(trace))])
+        hinted = best_of(streamed)
+        bulk = best_of(lambda: model.locate_trajectory(trace))
+
+        per_point = 1e6 / len(trace)
+        return {
+            'triangles': model.triangles_count,
+            'trace_points': len(trace),
+            'hint_hit_rate': hint_hits / len(trace),
+            'adjacent_rate': walk_stats['adjacent_points'] / len(trace),
+            'independent_us': independent * per_point,
+            'hinted_us': hinted * per_point,
+            'bulk_us': bulk * per_point,
+            'speedup': independent / hinted
+        }
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='轨迹三角形查找基准')
+    parser.add_argument('--points', type=int, default=2000, help='合成映射文件的控制点数量')
+    parser.add_argument('--trace', type=int, default=20000, help='轨迹点数')
+    parser.add_argument('--step', type=float, default=1.4, help='相邻轨迹点距离（米）')
+    args = parser.parse_args()
+
+    print("🚶 轨迹查找基准测试")
+    print("=" * 50)
+    result = run_benchmark(args.points, args.trace, args.step)
+    print(f"🔺 {result['triangles']} 个三角形, 轨迹 {result['trace_points']} 个点, "
+          f"逐点提示命中率 {result['hint_hit_rate']:.1%}, 相邻三角形比例 {result['adjacent_rate']:.1%}")
+    print(f"   逐点 find_simplex:    {result['independent_us']:.2f} us/点")
+    print(f"   逐点轨迹提示查找:     {result['hinted_us']:.2f} us/点 "
+          f"(加速 {result['speedup']:.1f}x)")
+    print(f"   整条轨迹一次性查找:   {result['bulk_us']:.2f} us/点")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步编译任务
+在进程池中编译映射文件，请求线程不再因三角剖分和矩阵求解而阻塞：
+提交映射文件后立即返回任务编号，客户端轮询任务状态获取当前阶段
+（load / triangulate / solve / index）和完成情况；编译完成的模型放入模型缓存。
+同一文件已有排队或进行中的任务时直接返回该任务；排队任务数超过上限时拒绝提交。
+编译失败的任务按文件（及其修改时间和大小）记录，文件未修改时请求直接返回失败原因，不再重复提交
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from mapping_model import COMPILE_STAGES, compile_mapping_model
+
+logger = logging.getLogger(__name__)
+
+# 保留的已结束任务数（更早的任务从列表中移除）
+FINISHED_JOBS_KEPT = 100
+
+# 工作进程中的阶段进度队列
+_progress_queue = None
+
+
+class JobQueueFull(Exception):
+    """排队和进行中的编译任务数已达上限"""
+
+
+def _init_worker(progress_queue):
+    """工作进程初始化：保存阶段进度队列"""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_compile(job_id, json_file_path):
+    """工作进程中执行的编译任务（需为模块级函数以便序列化）"""
+    def progress(stage):
+        _progress_queue.put((job_id, stage))
+
+    try:
+        return compile_mapping_model(json_file_path, progress=progress), None
+    except Exception as e:
+        return None, str(e)
+
+
+class CompileJob:
+    """
+    一个编译任务
+
+    Attributes:
+        id (str): 任务编号
+        json_file_path (str): 映射文件路径
+        status (str): queued / running / done / failed
+        stage (str): 当前编译阶段（COMPILE_STAGES之一），排队时为None
+        error (str): 失败原因
+    """
+
+    def __init__(self, json_file_path):
+        self.id = uuid.uuid4().hex
+        self.json_file_path = json_file_path
+        stats = os.stat(json_file_path)
+        self.file_version = (stats.st_mtime_ns, stats.st_size)
+        self.status = 'queued'
+        self.stage = None
+        self.error = None
+        self.triangles = None
+        self.compile_seconds = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    @property
+    def progress(self):
+        """完成比例：已完成的阶段数 / 总阶段数"""
+        if self.status == 'done':
+            return 1.0
+        if self.stage is None:
+            return 0.0
+        return COMPILE_STAGES.index(self.stage) / len(COMPILE_STAGES)
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'jsonFile': os.path.basename(self.json_file_path),
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'error': self.error,
+            'triangles': self.triangles,
+            'compile_seconds': self.compile_seconds,
+            'queued_seconds': (self.started_at or time.time()) - self.submitted_at,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at
+        }
+
+
+class CompileJobs:
+    """
+    编译任务队列（进程池在第一次提交时创建）
+
+    Args:
+        cache (ModelCache): 编译完成的模型放入的缓存
+        max_workers (int): 进程池大小
+        max_queue (int): 排队和进行中的任务数上限
+    """
+
+    def __init__(self, cache, max_workers=2, max_queue=16):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._progress_queue = None
+        self.submitted = 0
+        self.rejected = 0
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._progress_queue = multiprocessing.get_context().Queue()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                 initargs=(self._progress_queue,))
+            threading.Thread(target=self._receive_progress, args=(self._progress_queue,),
+                             name='compile-progress', daemon=True).start()
+            logger.info(f"编译任务进程池已启动: {self.max_workers} 个进程, 队列上限 {self.max_queue}")
+        return self._executor
+
+    def _receive_progress(self, progress_queue):
+        """接收工作进程发来的阶段进度"""
+        while True:
+            message = progress_queue.get()
+            if message is None:
+                return
+            job_id, stage = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and not job.finished:
+                    if job.status == 'queued':
+                        job.status = 'running'
+                        job.started_at = time.time()
+                    job.stage = stage
+
+    def submit(self, json_file_path):
+        """
+        提交编译任务
+
+        Args:
+            json_file_path (str): 映射文件路径
+
+        Returns:
+            CompileJob: 新任务，或同一文件已在排队/进行中的任务
+
+        Raises:
+            JobQueueFull: 排队和进行中的任务数已达上限
+        """
+        key = os.path.abspath(json_file_path)
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+            if len(self._active) >= self.max_queue:
+                self.rejected += 1
+                raise JobQueueFull(f"编译任务队列已满（{self.max_queue}）")
+            job = CompileJob(key)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self.submitted += 1
+            self._trim()
+            future = self._ensure_executor().submit(_run_compile, job.id, key)
+        future.add_done_callback(lambda f: self._finish(job, f))
+        logger.info(f"提交编译任务 {job.id}: {os.path.basename(key)}")
+        return job
+
+    def _finish(self, job, future):
+        """任务结束：模型放入缓存并更新状态"""
+        try:
+            model, error = future.result()
+        except Exception as e:
+            model, error = None, str(e)
+        if model is not None:
+            self.cache.put(model)
+        with self._lock:
+            job.finished_at = time.time()
+            job.started_at = job.started_at or job.finished_at
+            if model is not None:
+                job.status = 'done'
+                job.stage = COMPILE_STAGES[-1]
+                job.triangles = model.triangles_count
+                job.compile_seconds = model.compile_seconds
+            else:
+                job.status = 'failed'
+                job.error = error
+            # 记录最近一次结果：失败的文件在修改前不再重复编译
+            self._failures.pop(job.json_file_path, None)
+            if model is None:
+                self._failures[job.json_file_path] = job
+                while len(self._failures) > FINISHED_JOBS_KEPT:
+                    self._failures.popitem(last=False)
+            self._active.pop(job.json_file_path, None)
+        if model is not None:
+            logger.info(f"编译任务完成 {job.id}: {os.path.basename(job.json_file_path)}, "
+                        f"{job.triangles} 个三角形, 耗时 {job.compile_seconds * 1000:.1f} ms")
+        else:
+            logger.error(f"编译任务失败 {job.id}: {error}")
+
+    def _trim(self):
+        """只保留最近的 FINISHED_JOBS_KEPT 个已结束任务"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """按编号获取任务，不存在时返回None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, json_file_path):
+        """文件正在排队或编译中的任务，没有时返回None"""
+        with self._lock:
+            return self._active.get(os.path.abspath(json_file_path))
+
+    def failure(self, json_file_path):
+        """
+        文件最近一次编译失败且之后未修改时返回该失败任务，否则返回None
+
+        文件已修改（修改时间或大小变化）或已删除时清除失败记录，下次请求重新编译
+        """
+        key = os.path.abspath(json_file_path)
+        with self._lock:
+            job = self._failures.get(key)
+            if job is None:
+                return None
+            try:
+                stats = os.stat(key)
+            except OSError:
+                stats = None
+            if stats is None or (stats.st_mtime_ns, stats.st_size) != job.file_version:
+                del self._failures[key]
+                return None
+            return job
+
+    def jobs(self):
+        """所有保留的任务（最新的在前）"""
+        with self._lock:
+            return list(self._jobs.values())[::-1]
+
+    def stats(self):
+        """任务统计"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'active': len(self._active),
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'done': statuses.count('done'),
+                'failed': statuses.count('failed')
+            }
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._progress_queue.put(None)
+            self._executor = None
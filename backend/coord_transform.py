@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+坐标系转换（向量化）
+映射文件中的腾讯地图坐标为GCJ-02（国测局坐标）；GPS设备输出WGS-84，百度地图使用BD-09。
+所有转换都直接作用于整个numpy数组 (n, 2)（[经度, 纬度]），无逐点循环
+"""
+
+import numpy as np
+
+# 支持的输入坐标系
+CRS_CHOICES = ('gcj02', 'wgs84', 'bd09')
+
+# 映射文件使用的坐标系
+MAPPING_CRS = 'gcj02'
+
+# 克拉索夫斯基椭球参数
+_A = 6378245.0
+_EE = 0.00669342162296594323
+
+_X_PI = np.pi * 3000.0 / 180.0
+
+
+def _out_of_china(lng, lat):
+    """中国范围外的坐标不做偏移（与GCJ-02的定义一致）"""
+    return (lng < 72.004) | (lng > 137.8347) | (lat < 0.8293) | (lat > 55.8271)
+
+
+def _offset(lng, lat):
+    """WGS-84到GCJ-02的偏移量（度）"""
+    x, y = lng - 105.0, lat - 35.0
+    sqrt_abs_x = np.sqrt(np.abs(x))
+    periodic_x = (20.0 * np.sin(6.0 * x * np.pi) + 20.0 * np.sin(2.0 * x * np.pi)) * 2.0 / 3.0
+
+    dlat = -100.0 + 2.0 * x + 3.0 * y + 0.2 * y * y + 0.1 * x * y + 0.2 * sqrt_abs_x + periodic_x
+    dlat += (20.0 * np.sin(y * np.pi) + 40.0 * np.sin(y / 3.0 * np.pi)) * 2.0 / 3.0
+    dlat += (160.0 * np.sin(y / 12.0 * np.pi) + 320.0 * np.sin(y * np.pi / 30.0)) * 2.0 / 3.0
+
+    dlng = 300.0 + x + 2.0 * y + 0.1 * x * x + 0.1 * x * y + 0.1 * sqrt_abs_x + periodic_x
+    dlng += (20.0 * np.sin(x * np.pi) + 40.0 * np.sin(x / 3.0 * np.pi)) * 2.0 / 3.0
+    dlng += (150.0 * np.sin(x / 12.0 * np.pi) + 300.0 * np.sin(x / 30.0 * np.pi)) * 2.0 / 3.0
+
+    rad_lat = lat / 180.0 * np.pi
+    magic = 1.0 - _EE * np.sin(rad_lat) ** 2
+    sqrt_magic = np.sqrt(magic)
+    dlat = dlat * 180.0 / ((_A * (1.0 - _EE)) / (magic * sqrt_magic) * np.pi)
+    dlng = dlng * 180.0 / (_A / sqrt_magic * np.cos(rad_lat) * np.pi)
+
+    outside = _out_of_china(lng, lat)
+    return np.where(outside, 0.0, dlng), np.where(outside, 0.0, dlat)
+
+
+def wgs84_to_gcj02(points):
+    """WGS-84 -> GCJ-02"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    dlng, dlat = _offset(points[:, 0], points[:, 1])
+    return np.column_stack([points[:, 0] + dlng, points[:, 1] + dlat])
+
+
+def gcj02_to_wgs84(points, iterations=3):
+    """GCJ-02 -> WGS-84（不动点迭代求逆，3次迭代后误差远小于1毫米）"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    result = points.copy()
+    for _ in range(iterations):
+        dlng, dlat = _offset(result[:, 0], result[:, 1])
+        result = np.column_stack([points[:, 0] - dlng, points[:, 1] - dlat])
+    return result
+
+
+def bd09_to_gcj02(points):
+    """BD-09 -> GCJ-02"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    x, y = points[:, 0] - 0.0065, points[:, 1] - 0.006
+    z = np.sqrt(x * x + y * y) - 0.00002 * np.sin(y * _X_PI)
+    theta = np.arctan2(y, x) - 0.000003 * np.cos(x * _X_PI)
+    return np.column_stack([z * np.cos(theta), z * np.sin(theta)])
+
+
+def gcj02_to_bd09(points):
+    """GCJ-02 -> BD-09"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    x, y = points[:, 0], points[:, 1]
+    z = np.sqrt(x * x + y * y) + 0.00002 * np.sin(y * _X_PI)
+    theta = np.arctan2(y, x) + 0.000003 * np.cos(x * _X_PI)
+    return np.column_stack([z * np.cos(theta) + 0.0065, z * np.sin(theta) + 0.006])
+
+
+def to_mapping_crs(points, crs=None):
+    """
+    将输入坐标转换到映射文件使用的GCJ-02
+
+    Args:
+        points (array-like): [经度, 纬度] 坐标 (n, 2)
+        crs (str): 输入坐标系 'gcj02'（默认）/ 'wgs84' / 'bd09'
+
+    Returns:
+        numpy.ndarray: GCJ-02坐标 (n, 2)
+
+    Raises:
+        ValueError: 不支持的坐标系
+    """
+    crs = crs or MAPPING_CRS
+    if crs == 'gcj02':
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if crs == 'wgs84':
+        return wgs84_to_gcj02(points)
+    if crs == 'bd09':
+        return bd09_to_gcj02(points)
+    raise ValueError(f"不支持的坐标系: {crs}，可选: {', '.join(CRS_CHOICES)}")
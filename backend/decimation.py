@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+控制点抽稀
+对控制点过密的映射文件，在保证被删除控制点处的映射误差不超过容差的前提下贪心删除控制点：
+每轮在当前三角网中选出互不相邻的一组控制点（向量化的随机局部最小选择），一次性删除后重新三角剖分，
+检查所有已删除控制点处的误差（手绘坐标单位，即归一化的手绘地图坐标），超出容差的点恢复并锁定。
+凸包顶点始终保留，保证映射范围不变
+"""
+
+import time
+
+import numpy as np
+
+# 每轮选择互不相邻控制点的遍数（多遍后接近极大独立集）
+INDEPENDENT_SET_PASSES = 3
+
+
+def _interpolate(triangulation, values, points):
+    """用三角网对点做分段线性插值（等价于分段仿射变换），范围外为nan"""
+    simplices = triangulation.find_simplex(points)
+    T = triangulation.transform[simplices]
+    partial = np.einsum('nij,nj->ni', T[:, :2, :], points - T[:, 2, :])
+    barycentric = np.column_stack([partial, 1 - partial.sum(axis=1)])
+    result = np.einsum('ni,nij->nj', barycentric, values[triangulation.simplices[simplices]])
+    result[simplices < 0] = np.nan
+    return result
+
+
+def _spatial_order(points, cells=256):
+    """按网格蛇形顺序排列点，使相邻查询点在空间上相近（find_simplex从上一个点的三角形开始行走）"""
+    low = points.min(axis=0)
+    size = np.maximum(points.max(axis=0) - low, 1e-300)
+    cell = np.minimum(((points - low) / size * cells).astype(np.int64), cells - 1)
+    column = np.where(cell[:, 1] % 2 == 0, cell[:, 0], cells - 1 - cell[:, 0])
+    return np.lexsort((column, cell[:, 1]))
+
+
+def _independent_candidates(triangulation, free, rng):
+    """
+    在三角网中选出互不相邻的可删除顶点（Luby随机局部最小选择，重复多遍）
+
+    Args:
+        free (numpy.ndarray): 每个顶点是否允许删除 (k,)
+
+    Returns:
+        numpy.ndarray: 选中的顶点在三角网中的编号
+    """
+    indptr, neighbors = triangulation.vertex_neighbor_vertices
+    owner = np.repeat(np.arange(len(free)), np.diff(indptr))
+    available = free.copy()
+    selected = np.zeros(len(free), dtype=bool)
+
+    for _ in range(INDEPENDENT_SET_PASSES):
+        if not np.any(available):
+            break
+        priority = np.where(available, rng.random(len(free)), np.inf)
+        neighbor_min = np.full(len(free), np.inf)
+        np.minimum.at(neighbor_min, owner, priority[neighbors])
+        chosen = available & (priority < neighbor_min)
+        selected |= chosen
+        # 已选顶点及其邻居本轮不再参与选择
+        blocked = np.zeros(len(free), dtype=bool)
+        blocked[neighbors[chosen[owner]]] = True
+        available &= ~(chosen | blocked)
+
+    return np.flatnonzero(selected)
+
+
+def decimate_control_points(coords, xy, tolerance, seed=0):
+    """
+    贪心删除控制点，使所有被删除控制点处的映射误差不超过容差
+
+    Args:
+        coords (numpy.ndarray): 腾讯地图坐标 (n, 2)
+        xy (numpy.ndarray): 手绘地图坐标 (n, 2)
+        tolerance (float): 最大允许误差（手绘坐标单位）
+        seed (int): 随机种子（选择顺序）
+
+    Returns:
+        tuple: (保留的控制点掩码 (n,)，被删除控制点处的最大误差，统计信息dict)
+    """
+    from scipy.spatial import Delaunay
+
+    start = time.perf_counter()
+    coords = np.asarray(coords, dtype=np.float64)
+    xy = np.asarray(xy, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    kept = np.ones(len(coords), dtype=bool)
+    locked = np.zeros(len(coords), dtype=bool)
+    triangulation = Delaunay(coords)
+    locked[np.unique(triangulation.convex_hull)] = True
+    order = _spatial_order(coords)
+    rounds = triangulations = 0
+    max_error = 0.0
+
+    while True:
+        kept_index = np.flatnonzero(kept)
+        free = ~locked[kept_index]
+        if not np.any(free):
+            break
+        candidates = kept_index[_independent_candidates(triangulation, free, rng)]
+        kept[candidates] = False
+        rounds += 1
+
+        # 删除后检查所有已删除点的误差，超出容差的点恢复并锁定，直到全部满足
+        while True:
+            kept_index = np.flatnonzero(kept)
+            triangulation = Delaunay(coords[kept_index])
+            triangulations += 1
+            removed = order[~kept[order]]
+            errors = np.linalg.norm(_interpolate(triangulation, xy[kept_index], coords[removed]) - xy[removed],
+                                    axis=1)
+            violations = removed[~(errors <= tolerance)]
+            if len(violations) == 0:
+                max_error = float(errors.max()) if len(errors) else 0.0
+                break
+            kept[violations] = True
+            locked[violations] = True
+        # 本轮的候选点都已处理（删除或锁定）
+        locked[candidates] = True
+
+    stats = {
+        'rounds': rounds,
+        'triangulations': triangulations,
+        'seconds': time.perf_counter() - start
+    }
+    return kept, max_error, stats
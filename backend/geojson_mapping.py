@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GeoJSON要素映射
+将整个FeatureCollection从腾讯地图坐标映射到手绘地图坐标：
+在线段穿过三角网边的位置插入顶点（分段仿射在三角形内是线性的，
+因此插入后映射结果与逐点映射的真实形状一致），然后一次性批量变换所有顶点
+"""
+
+import numpy as np
+
+from coord_transform import to_mapping_crs
+
+# 线段穿越三角网时允许的最大步数，防止退化情况下无限循环
+MAX_WALK_STEPS = 100000
+
+# 凸包裁剪时每批处理的 线段数×凸包边数 上限
+HULL_CLIP_CHUNK = 1_000_000
+
+_EPS = 1e-12
+
+
+def _barycentric(triangulation, simplices, points):
+    """计算点在指定三角形中的重心坐标 (k, 3)"""
+    T = triangulation.transform[simplices]
+    partial = np.einsum('kij,kj->ki', T[:, :2, :], points - T[:, 2, :])
+    return np.column_stack([partial, 1 - partial.sum(axis=1)])
+
+
+def hull_intervals(triangulation, starts, ends, chunk=HULL_CLIP_CHUNK):
+    """
+    线段与三角网凸包的相交区间（Cyrus-Beck裁剪，按凸包边的半平面向量化计算）
+
+    Args:
+        triangulation (Delaunay): 三角剖分
+        starts (numpy.ndarray): 线段起点 (s, 2)
+        ends (numpy.ndarray): 线段终点 (s, 2)
+        chunk (int): 每批处理的 线段数×凸包边数 上限，控制内存
+
+    Returns:
+        tuple: (进入参数t_in (s,)，离开参数t_out (s,))，t_in >= t_out 表示线段不穿过凸包
+    """
+    points = triangulation.points
+    hull = triangulation.convex_hull
+    origin = points[hull[:, 0]]
+    edge = points[hull[:, 1]] - origin
+    # 凸包边的外法向：凸包顶点的重心在凸包内部，用它确定朝向
+    normal = np.column_stack([edge[:, 1], -edge[:, 0]])
+    center = points[np.unique(hull)].mean(axis=0)
+    normal[np.einsum('hj,hj->h', normal, center - origin) > 0] *= -1
+    offset = np.einsum('hj,hj->h', origin, normal)
+
+    t_in = np.zeros(len(starts), dtype=np.float64)
+    t_out = np.ones(len(starts), dtype=np.float64)
+    step = max(1, chunk // max(len(hull), 1))
+    for lo in range(0, len(starts), step):
+        a, d = starts[lo:lo + step], ends[lo:lo + step] - starts[lo:lo + step]
+        numerator = a @ normal.T - offset
+        denominator = d @ normal.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = -numerator / denominator
+        entering = denominator < -_EPS
+        leaving = denominator > _EPS
+        # 与边平行且在外侧：整条线段都在凸包外
+        parallel_out = ~entering & ~leaving & (numerator > 0)
+        t_in[lo:lo + step] = np.maximum(0.0, np.where(entering, t, -np.inf).max(axis=1))
+        t_out[lo:lo + step] = np.minimum(1.0, np.where(leaving, t, np.inf).min(axis=1))
+        t_out[lo:lo + step][parallel_out.any(axis=1)] = -1.0
+    return t_in, t_out
+
+
+def find_edge_crossings(triangulation, starts, ends):
+    """
+    查找每条线段与三角网边的所有交点（所有线段同步逐三角形行走，向量化计算）
+
+    从线段起点所在三角形出发，每一步计算线段离开当前三角形的边，
+    并通过 triangulation.neighbors 进入相邻三角形，直到到达终点所在三角形或离开凸包。
+    起点在凸包外而终点在凸包内的线段反向行走；两端都在凸包外的线段先按凸包裁剪，
+    从凸包内的中点分别向两端行走，得到穿过映射范围部分的交点（包括凸包边界上的进出点）。
+
+    Args:
+        triangulation (Delaunay): 三角剖分
+        starts (numpy.ndarray): 线段起点 (s, 2)
+        ends (numpy.ndarray): 线段终点 (s, 2)
+
+    Returns:
+        tuple: (线段索引 (c,)，交点参数t (c,)，交点所在三角形 (c,))，t在0-1之间
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    start_simplex = triangulation.find_simplex(starts)
+    end_simplex = triangulation.find_simplex(ends)
+
+    # 每条行走路径：从a走向b，行走参数u换算为原线段参数 t = t0 + scale * u
+    # 起点在外、终点在内的线段反向行走
+    reverse = (start_simplex < 0) & (end_simplex >= 0)
+    owner = np.arange(len(starts))
+    a = np.where(reverse[:, None], ends, starts)
+    b = np.where(reverse[:, None], starts, ends)
+    current = np.where(reverse, end_simplex, start_simplex)
+    target = np.where(reverse, start_simplex, end_simplex)
+    t0 = np.where(reverse, 1.0, 0.0)
+    scale = np.where(reverse, -1.0, 1.0)
+
+    # 两端都在凸包外的线段：裁剪出凸包内的区间，从区间中点分别向两端行走
+    outside = np.flatnonzero((start_simplex < 0) & (end_simplex < 0))
+    if len(outside) and len(triangulation.convex_hull):
+        t_in, t_out = hull_intervals(triangulation, starts[outside], ends[outside])
+        crossing = t_out - t_in > _EPS
+        outside, t_mid = outside[crossing], ((t_in + t_out) / 2)[crossing]
+        mid = starts[outside] + t_mid[:, None] * (ends[outside] - starts[outside])
+        mid_simplex = triangulation.find_simplex(mid)
+        found = mid_simplex >= 0
+        outside, t_mid, mid, mid_simplex = outside[found], t_mid[found], mid[found], mid_simplex[found]
+        count = len(outside)
+        owner = np.concatenate([owner, outside, outside])
+        a = np.concatenate([a, mid, mid])
+        b = np.concatenate([b, ends[outside], starts[outside]])
+        current = np.concatenate([current, mid_simplex, mid_simplex])
+        target = np.concatenate([target, np.full(2 * count, -1, dtype=target.dtype)])
+        t0 = np.concatenate([t0, t_mid, t_mid])
+        scale = np.concatenate([scale, 1.0 - t_mid, -t_mid])
+
+    active = np.flatnonzero((current >= 0) & (current != target))
+    # 上一个三角形，初始为-2：-1是凸包边的邻居值，不能用作“无”，否则第一步就屏蔽了凸包边
+    previous = np.full(len(a), -2, dtype=np.int64)
+    t_enter = np.zeros(len(a), dtype=np.float64)
+    neighbors = triangulation.neighbors
+
+    segment_ids, params, simplices = [], [], []
+    for _ in range(MAX_WALK_STEPS):
+        if len(active) == 0:
+            break
+        cur = current[active]
+        lam_a = _barycentric(triangulation, cur, a[active])
+        lam_b = _barycentric(triangulation, cur, b[active])
+        decreasing = lam_b < lam_a - _EPS
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_exit = np.where(decreasing, lam_a / (lam_a - lam_b), np.inf)
+        # 不从进入的边离开，且交点不能早于进入点
+        t_exit[neighbors[cur] == previous[active][:, None]] = np.inf
+        t_exit[t_exit < t_enter[active][:, None] - _EPS] = np.inf
+
+        edge = np.argmin(t_exit, axis=1)
+        t = t_exit[np.arange(len(active)), edge]
+        valid = np.isfinite(t) & (t < 1.0)
+        active, cur, edge, t = active[valid], cur[valid], edge[valid], t[valid]
+
+        segment_ids.append(active)
+        params.append(t)
+        simplices.append(cur)
+
+        nxt = neighbors[cur, edge]
+        previous[active] = cur
+        current[active] = nxt
+        t_enter[active] = t
+        # 离开凸包或到达终点所在三角形时结束
+        active = active[(nxt >= 0) & (nxt != target[active])]
+
+    if not segment_ids:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(0, dtype=np.float64), empty
+
+    walk_ids = np.concatenate(segment_ids)
+    params = np.concatenate(params)
+    simplices = np.concatenate(simplices)
+    return owner[walk_ids], t0[walk_ids] + scale[walk_ids] * params, simplices
+
+
+def _collect_paths(geometry, paths):
+    """
+    收集几何中的所有线/环的坐标，返回重建几何所需的结构描述
+    每条路径登记到paths列表，结构中以路径编号引用
+    """
+    if geometry is None:
+        return None
+    kind = geometry.get('type')
+    coordinates = geometry.get('coordinates')
+
+    def register(coords, is_ring, is_point=False):
+        # 先去掉高程等多余维度再展平，[经度, 纬度, 高程] 的位置不能直接reshape
+        paths.append((np.asarray(coords, dtype=np.float64)[..., :2].reshape(-1, 2), is_ring, is_point))
+        return len(paths) - 1
+
+    if kind == 'Point':
+        return (kind, register([coordinates], False, True))
+    if kind == 'MultiPoint':
+        return (kind, register(coordinates, False, True))
+    if kind == 'LineString':
+        return (kind, register(coordinates, False))
+    if kind == 'MultiLineString':
+        return (kind, [register(line, False) for line in coordinates])
+    if kind == 'Polygon':
+        return (kind, [register(ring, True) for ring in coordinates])
+    if kind == 'MultiPolygon':
+        return (kind, [[register(ring, True) for ring in polygon] for polygon in coordinates])
+    if kind == 'GeometryCollection':
+        return (kind, [_collect_paths(g, paths) for g in geometry.get('geometries', [])])
+    raise ValueError(f"不支持的几何类型: {kind}")
+
+
+def _split_runs(coords, inside):
+    """按连续的范围内顶点切分线段"""
+    runs, run = [], []
+    for point, ok in zip(coords, inside):
+        if ok:
+            run.append(point)
+        elif run:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+    return [r for r in runs if len(r) >= 2]
+
+
+def hull_boundary(model):
+    """
+    凸包边界描述，用于多边形裁剪时沿凸包边界连接离开点和重新进入点
+
+    Returns:
+        tuple: (凸包内部的参考点，凸包顶点相对参考点的极角（升序，即逆时针顺序），凸包顶点的手绘坐标列表)
+    """
+    vertices = np.unique(model.triangulation.convex_hull)
+    points = model.triangulation.points[vertices]
+    center = points.mean(axis=0)
+    angles = np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0])
+    order = np.argsort(angles)
+    return center, angles[order], model.xy[vertices[order]].tolist()
+
+
+def _angles(boundary, points):
+    """点相对凸包参考点的极角"""
+    center = boundary[0]
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0])
+
+
+def _sweep(angles):
+    """沿折线绕参考点转过的有向角度（逆时针为正）"""
+    return float(np.sum((np.diff(angles) + np.pi) % (2 * np.pi) - np.pi))
+
+
+def _boundary_path(boundary, excursion):
+    """
+    离开点与重新进入点之间沿凸包边界经过的凸包顶点（手绘坐标）
+
+    凸包外的一段环绕参考点转向哪一侧，边界路径就沿同一方向走，与按凸包裁剪多边形的结果一致
+
+    Args:
+        excursion (list): 离开点、凸包外的顶点和重新进入点的腾讯地图坐标
+    """
+    _, hull_angles, hull_xy = boundary
+    angles = _angles(boundary, excursion)
+    start, end = angles[0], angles[-1]
+    if _sweep(angles) >= 0:
+        offset = (hull_angles - start) % (2 * np.pi)
+        span = (end - start) % (2 * np.pi)
+    else:
+        offset = (start - hull_angles) % (2 * np.pi)
+        span = (start - end) % (2 * np.pi)
+    between = np.flatnonzero((offset > 1e-12) & (offset < span - 1e-12))
+    return [hull_xy[i] for i in between[np.argsort(offset[between])]]
+
+
+def _clip_ring(coords, inside, source, boundary):
+    """
+    按凸包裁剪环：范围外的部分替换为凸包边界上离开点与重新进入点之间的路径
+    （离开点和进入点是插入的凸包边界交点），完全在范围外但包围整个凸包的环变为凸包边界；
+    不足4个点的环返回None
+    """
+    count = len(coords) - 1 if len(coords) > 1 and source[0] == source[-1] else len(coords)
+    inside_index = [i for i in range(count) if inside[i]]
+    if not inside_index:
+        if count >= 3 and abs(_sweep(_angles(boundary, source[:count] + source[:1]))) > np.pi:
+            ring = list(boundary[2])
+            return ring + ring[:1]
+        return None
+
+    first = inside_index[0]
+    ring, excursion = [], []
+    for k in range(count + 1):
+        i = (first + k) % count
+        if not inside[i]:
+            excursion.append(source[i])
+            continue
+        if excursion:
+            ring.extend(_boundary_path(boundary, [last_inside] + excursion + [source[i]]))
+            excursion = []
+        if k < count:
+            ring.append(coords[i])
+        last_inside = source[i]
+    ring.append(ring[0])
+    return ring if len(ring) >= 4 else None
+
+
+def _rebuild(structure, mapped_paths, clip, boundary=None):
+    """
+    根据结构描述和映射后的路径坐标重建几何
+
+    mapped_paths 每项为 (映射坐标, 是否在范围内, 腾讯地图坐标)；clip为True时裁剪范围外的部分，
+    多边形的环沿 boundary（hull_boundary）给出的凸包边界闭合
+    """
+    if structure is None:
+        return None
+    kind, ref = structure
+
+    def path(index):
+        coords, inside, _ = mapped_paths[index]
+        return coords, (inside if clip else [True] * len(coords))
+
+    def ring(index):
+        coords, inside, source = mapped_paths[index]
+        return _clip_ring(coords, inside if clip else [True] * len(coords), source, boundary)
+
+    if kind in ('Point', 'MultiPoint'):
+        coords, inside = path(ref)
+        points = [p for p, ok in zip(coords, inside) if ok]
+        if kind == 'Point':
+            return {'type': 'Point', 'coordinates': points[0]} if points else None
+        return {'type': 'MultiPoint', 'coordinates': points} if points else None
+
+    if kind in ('LineString', 'MultiLineString'):
+        refs = [ref] if kind == 'LineString' else ref
+        lines = [run for index in refs for run in _split_runs(*path(index))]
+        if not lines:
+            return None
+        if kind == 'LineString' and len(lines) == 1:
+            return {'type': 'LineString', 'coordinates': lines[0]}
+        return {'type': 'MultiLineString', 'coordinates': lines}
+
+    if kind in ('Polygon', 'MultiPolygon'):
+        polygons = [ref] if kind == 'Polygon' else ref
+        result = []
+        for rings in polygons:
+            exterior = ring(rings[0])
+            if exterior is None:
+                continue
+            holes = [r for r in (ring(index) for index in rings[1:]) if r is not None]
+            result.append([exterior] + holes)
+        if not result:
+            return None
+        if kind == 'Polygon':
+            return {'type': 'Polygon', 'coordinates': result[0]}
+        return {'type': 'MultiPolygon', 'coordinates': result}
+
+    geometries = [g for g in (_rebuild(s, mapped_paths, clip, boundary) for s in ref) if g is not None]
+    return {'type': 'GeometryCollection', 'geometries': geometries}
+
+
+def map_feature_collection(model, feature_collection, mode='affine', densify=True, max_vertices=None,
+                           input_crs=None):
+    """
+    将GeoJSON FeatureCollection映射到手绘地图坐标
+
+    Args:
+        model (MappingModel): 编译后的映射模型
+        feature_collection (dict): GeoJSON FeatureCollection（坐标为[经度, 纬度]）
+        mode (str): 'affine' 分段仿射 或 'tps' 薄板样条
+        densify (bool): 是否在线段与三角网边的交点处插入顶点
+        max_vertices (int): 输入顶点数上限，超出时抛出ValueError
+        input_crs (str): 输入坐标系 'gcj02'（默认）/ 'wgs84' / 'bd09'，所有顶点一次性转换
+
+    Returns:
+        tuple: (映射后的FeatureCollection, 统计信息dict)
+               affine模式下凸包外的部分被裁剪，线被切分为多段（两端都在范围外、中间穿过范围的线段
+               保留范围内的部分，数量见 hull_crossing_segments），完全在范围外的几何为null
+    """
+    if feature_collection.get('type') != 'FeatureCollection':
+        raise ValueError('需要GeoJSON FeatureCollection')
+
+    features = feature_collection.get('features', [])
+    paths = []
+    structures = [_collect_paths(feature.get('geometry'), paths) for feature in features]
+
+    # 拼接所有路径的顶点，记录每条路径在全局数组中的范围
+    lengths = np.array([len(coords) for coords, _, _ in paths], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    vertices = np.concatenate([coords for coords, _, _ in paths]) if paths else np.zeros((0, 2))
+    if max_vertices is not None and len(vertices) > max_vertices:
+        raise ValueError(f"单次最多映射 {max_vertices} 个顶点")
+    vertices = to_mapping_crs(vertices, input_crs)
+    vertex_simplex = model.locate(vertices)
+
+    # 同一路径内相邻顶点构成线段（点要素不参与加密）
+    is_line = np.repeat([not is_point for _, _, is_point in paths], lengths).astype(bool)
+    segment_start = np.flatnonzero(is_line)
+    segment_start = segment_start[~np.isin(segment_start + 1, offsets)]
+
+    if densify and len(segment_start):
+        seg_ids, params, seg_simplices = find_edge_crossings(
+            model.triangulation, vertices[segment_start], vertices[segment_start + 1])
+    else:
+        seg_ids = seg_simplices = np.zeros(0, dtype=np.int64)
+        params = np.zeros(0, dtype=np.float64)
+
+    # 两端都在凸包外、中间穿过映射范围的线段（只保留凸包内的部分）
+    outside_segment = (vertex_simplex[segment_start] < 0) & (vertex_simplex[segment_start + 1] < 0)
+    hull_crossing = len(np.unique(seg_ids[outside_segment[seg_ids]]))
+
+    # 去掉与原顶点重合的交点（线段端点恰好落在三角网边上时）
+    keep = (params > 1e-9) & (params < 1 - 1e-9)
+    seg_ids, params, seg_simplices = seg_ids[keep], params[keep], seg_simplices[keep]
+
+    # 原顶点与插入顶点按 (所属顶点序号, t) 排序后合并
+    origin = segment_start[seg_ids]
+    inserted = vertices[origin] + params[:, None] * (vertices[origin + 1] - vertices[origin])
+    all_points = np.concatenate([vertices, inserted])
+    all_simplex = np.concatenate([vertex_simplex, seg_simplices])
+    order = np.lexsort((np.concatenate([np.zeros(len(vertices)), params]),
+                        np.concatenate([np.arange(len(vertices)), origin])))
+    all_points, all_simplex = all_points[order], all_simplex[order]
+    owner = np.concatenate([np.arange(len(vertices)), origin])[order]
+
+    if mode == 'tps':
+        mapped = model.smooth_warp().evaluate(all_points)
+    else:
+        mapped = model.transform_located(all_points, all_simplex)
+    inside = all_simplex >= 0
+
+    # 按路径拆分映射结果
+    bounds = np.searchsorted(owner, offsets)
+    mapped_list, inside_list, source_list = mapped.tolist(), inside.tolist(), all_points.tolist()
+    mapped_paths = [(mapped_list[bounds[i]:bounds[i + 1]], inside_list[bounds[i]:bounds[i + 1]],
+                     source_list[bounds[i]:bounds[i + 1]])
+                    for i in range(len(paths))]
+
+    clip = mode != 'tps'
+    boundary = hull_boundary(model) if clip and any(is_ring for _, is_ring, _ in paths) else None
+    output = []
+    for feature, structure in zip(features, structures):
+        mapped_feature = dict(feature)
+        mapped_feature['geometry'] = _rebuild(structure, mapped_paths, clip, boundary)
+        output.append(mapped_feature)
+
+    stats = {
+        'features': len(features),
+        'input_vertices': int(len(vertices)),
+        'inserted_vertices': int(len(params)),
+        'output_vertices': int(len(all_points)),
+        'outside_vertices': int(np.count_nonzero(vertex_simplex < 0)),
+        'hull_crossing_segments': int(hull_crossing)
+    }
+    return {'type': 'FeatureCollection', 'features': output}, stats
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+手绘地图图像的分段仿射变形
+将手绘地图重采样到经纬度空间，作为腾讯地图上的地理配准叠加图层：
+输出图像的每个像素中心（经纬度）经三角网查找和仿射变换得到手绘地图坐标，
+再从手绘图像中双线性采样。大图按分块并行处理，每块的中间数组大小固定
+"""
+
+import os
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 每个分块的边长（像素），中间数组内存约为 TILE_SIZE² x 64 字节
+TILE_SIZE = 256
+
+# 输出图像的最大边长
+MAX_OUTPUT_SIZE = 8192
+
+# 支持上传的手绘地图图像格式
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# 已解码图像缓存的最大数量
+IMAGE_CACHE_SIZE = 8
+
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+
+def load_image(image_path):
+    """读取图像为RGBA数组 (H, W, 4) uint8"""
+    from PIL import Image
+    with Image.open(image_path) as image:
+        return np.asarray(image.convert('RGBA'))
+
+
+def get_image(image_path):
+    """读取图像并按文件修改时间缓存解码结果"""
+    key = (os.path.abspath(image_path), os.stat(image_path).st_mtime_ns)
+    with _image_cache_lock:
+        if key in _image_cache:
+            _image_cache.move_to_end(key)
+            return _image_cache[key]
+    image = load_image(image_path)
+    with _image_cache_lock:
+        _image_cache[key] = image
+        while len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+    return image
+
+
+def image_cache_bytes():
+    """已解码图像缓存占用的内存（字节）"""
+    with _image_cache_lock:
+        return int(sum(image.nbytes for image in _image_cache.values()))
+
+
+def encode_png(rgba):
+    """将RGBA数组编码为PNG字节"""
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, 'RGBA').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def find_mapping_image(image_dir, json_filename):
+    """查找映射文件对应的手绘地图图像（与映射文件同名、扩展名为图像格式）"""
+    stem = os.path.splitext(json_filename)[0]
+    for ext in IMAGE_EXTENSIONS:
+        path = os.path.join(image_dir, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def sample_bilinear(image, x, y):
+    """
+    按归一化手绘坐标双线性采样图像
+
+    Args:
+        image (numpy.ndarray): RGBA图像 (H, W, 4)
+        x, y (numpy.ndarray): 归一化坐标（0-1，原点在左上角），形状相同
+
+    Returns:
+        numpy.ndarray: RGBA像素 (..., 4) uint8，图像范围外为透明
+    """
+    height, width = image.shape[:2]
+    px = x * width - 0.5
+    py = y * height - 0.5
+    x0 = np.floor(px).astype(np.int64)
+    y0 = np.floor(py).astype(np.int64)
+    wx = (px - x0)[..., None]
+    wy = (py - y0)[..., None]
+    x0c, x1c = np.clip(x0, 0, width - 1), np.clip(x0 + 1, 0, width - 1)
+    y0c, y1c = np.clip(y0, 0, height - 1), np.clip(y0 + 1, 0, height - 1)
+
+    top = image[y0c, x0c] * (1 - wx) + image[y0c, x1c] * wx
+    bottom = image[y1c, x0c] * (1 - wx) + image[y1c, x1c] * wx
+    result = np.rint(top * (1 - wy) + bottom * wy).astype(np.uint8)
+    result[~((x >= 0) & (x <= 1) & (y >= 0) & (y <= 1))] = 0
+    return result
+
+
+def render_pixels(model, image, lng, lat):
+    """
+    渲染一组经纬度像素中心：三角网查找 + 仿射变换 + 采样
+
+    Args:
+        model (MappingModel): 编译后的映射模型
+        image (numpy.ndarray): 手绘地图RGBA图像
+        lng, lat (numpy.ndarray): 像素中心经纬度，形状 (h, w)
+
+    Returns:
+        numpy.ndarray: RGBA像素 (h, w, 4)，映射范围外为透明
+    """
+    points = np.column_stack([lng.ravel(), lat.ravel()])
+    simplices = model.locate(points)
+    mapped = model.transform_located(points, simplices)
+    rgba = sample_bilinear(image, mapped[:, 0], mapped[:, 1])
+    rgba[simplices < 0] = 0
+    return rgba.reshape(lng.shape + (4,))
+
+
+def default_bounds(model):
+    """模型控制点的经纬度范围 (min_lng, min_lat, max_lng, max_lat)"""
+    return model.bounds
+
+
+def output_size(bounds, width):
+    """按纬度修正的长宽比计算输出图像高度，使叠加图层不变形"""
+    min_lng, min_lat, max_lng, max_lat = bounds
+    mean_lat = math.radians((min_lat + max_lat) / 2)
+    aspect = (max_lat - min_lat) / max((max_lng - min_lng) * math.cos(mean_lat), 1e-12)
+    return width, max(1, int(round(width * aspect)))
+
+
+def warp_image(model, image, bounds=None, width=1024, height=None,
+               tile_size=TILE_SIZE, max_workers=None):
+    """
+    将手绘地图图像变形到经纬度空间（等经纬度投影，北向上）
+
+    Args:
+        model (MappingModel): 编译后的映射模型
+        image (numpy.ndarray): 手绘地图RGBA图像 (H, W, 4)
+        bounds (tuple): 输出范围 (min_lng, min_lat, max_lng, max_lat)，默认为控制点范围
+        width (int): 输出宽度（像素）
+        height (int): 输出高度，默认按长宽比计算
+        tile_size (int): 分块边长
+        max_workers (int): 并行线程数
+
+    Returns:
+        tuple: (RGBA图像 (height, width, 4), bounds)
+    """
+    bounds = tuple(bounds) if bounds else default_bounds(model)
+    if height is None:
+        width, height = output_size(bounds, width)
+    if max(width, height) > MAX_OUTPUT_SIZE:
+        raise ValueError(f"输出图像边长不能超过 {MAX_OUTPUT_SIZE} 像素")
+
+    min_lng, min_lat, max_lng, max_lat = bounds
+    lng_step = (max_lng - min_lng) / width
+    lat_step = (max_lat - min_lat) / height
+    output = np.zeros((height, width, 4), dtype=np.uint8)
+
+    def render_tile(origin):
+        row, col = origin
+        rows = np.arange(row, min(row + tile_size, height))
+        cols = np.arange(col, min(col + tile_size, width))
+        lng, lat = np.meshgrid(min_lng + (cols + 0.5) * lng_step,
+                               max_lat - (rows + 0.5) * lat_step)
+        # 各分块写入互不重叠的区域，无需加锁
+        output[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1] = render_pixels(model, image, lng, lat)
+
+    origins = [(row, col) for row in range(0, height, tile_size) for col in range(0, width, tile_size)]
+    # find_simplex和numpy运算会释放GIL，线程池即可并行且无需复制模型和图像
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(render_tile, origins))
+
+    return output, bounds
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+最近控制点查询
+编译时在腾讯地图坐标和手绘地图坐标上分别建立KD树（cKDTree），随模型缓存，
+批量查询点击位置附近的已测量控制点（地标）：k近邻，或限定半径内按距离排序的控制点。
+
+腾讯地图空间中经度按纬度余弦缩放后换算为米（局部等距近似，深圳范围内误差可忽略），
+距离和半径均以米为单位；手绘地图空间使用手绘坐标单位（归一化的手绘地图坐标）
+"""
+
+import numpy as np
+
+# 坐标空间：腾讯地图经纬度、手绘地图坐标
+LANDMARK_SPACES = ('tencent', 'xy')
+
+# 每个查询点最多返回的控制点数（半径查询未指定k时使用此值）
+LANDMARK_MAX_K = 64
+
+# 每度纬度对应的米数（近似）
+METERS_PER_DEGREE = 111320.0
+
+
+class LandmarkIndex:
+    """
+    两个坐标空间的控制点KD树
+
+    Args:
+        coords (numpy.ndarray): 腾讯地图坐标 (n, 2)
+        xy (numpy.ndarray): 手绘地图坐标 (n, 2)
+    """
+
+    def __init__(self, coords, xy):
+        from scipy.spatial import cKDTree
+
+        self.lng_scale = float(np.cos(np.radians(np.mean(coords[:, 1])))) * METERS_PER_DEGREE
+        self.trees = {
+            'tencent': cKDTree(self.to_metric(coords, 'tencent')),
+            'xy': cKDTree(np.asarray(xy, dtype=np.float64))
+        }
+
+    def to_metric(self, points, space):
+        """把点转换为建树时使用的坐标（腾讯地图空间换算为米）"""
+        points = np.asarray(points, dtype=np.float64)
+        if space == 'tencent':
+            return points * np.array([self.lng_scale, METERS_PER_DEGREE])
+        return points
+
+    @property
+    def nbytes(self):
+        return sum(int(tree.data.nbytes + tree.indices.nbytes) for tree in self.trees.values())
+
+    def query(self, points, space, k=1, radius=None):
+        """
+        批量查询最近的控制点
+
+        Args:
+            points (numpy.ndarray): 查询点 (q, 2)
+            space (str): 查询点和距离所在的坐标空间
+            k (int): 每个点返回的最多控制点数
+            radius (float): 只返回此距离以内的控制点，None表示不限
+
+        Returns:
+            tuple: (控制点编号 (q, k)，距离 (q, k))，不足k个的位置编号为-1、距离为inf
+        """
+        tree = self.trees[space]
+        k = min(k, tree.n)
+        distances, indices = tree.query(self.to_metric(points, space).reshape(-1, 2), k=k,
+                                        distance_upper_bound=np.inf if radius is None else radius)
+        distances, indices = distances.reshape(-1, k), indices.reshape(-1, k)
+        indices = np.where(np.isfinite(distances), indices, -1)
+        return indices, distances
+
+
+def nearest_landmarks(model, points, space='tencent', k=None, radius=None):
+    """
+    查询每个点最近的控制点，返回两个空间中的配对坐标
+
+    Args:
+        model (MappingModel): 映射模型
+        points (array-like): 查询点 (q, 2)，坐标空间由space指定
+        space (str): 'tencent' 腾讯地图经纬度 或 'xy' 手绘地图坐标
+        k (int): 每个点返回的控制点数，None时k近邻查询为1、半径查询为 LANDMARK_MAX_K
+        radius (float): 半径（tencent空间为米，xy空间为手绘坐标单位），None表示k近邻查询
+
+    Returns:
+        list: 每个查询点一项：按距离排序的控制点列表（point 编号、distance、tencent、xy）
+
+    Raises:
+        ValueError: 坐标空间、k或半径参数无效
+    """
+    if space not in LANDMARK_SPACES:
+        raise ValueError(f"不支持的坐标空间: {space}")
+    if k is None:
+        k = 1 if radius is None else LANDMARK_MAX_K
+    k = int(k)
+    if not 0 < k <= LANDMARK_MAX_K:
+        raise ValueError(f"k需要在1到{LANDMARK_MAX_K}之间")
+    if radius is not None:
+        radius = float(radius)
+        if not radius > 0:
+            raise ValueError("radius需要为正数")
+
+    indices, distances = model.landmark_index().query(points, space, k, radius)
+    found = np.maximum(indices, 0)
+    rows = zip(indices.tolist(), distances.tolist(), model.coords[found].tolist(), model.xy[found].tolist())
+    return [
+        [
+            {'point': index, 'distance': distance, 'tencent': tencent, 'xy': xy}
+            for index, distance, tencent, xy in zip(*row) if index >= 0
+        ]
+        for row in rows
+    ]
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+并发负载测试脚本
+在本地启动Flask服务（或连接已有服务），使用合成映射文件并发发送
+坐标映射、批量映射、映射信息和文件列表请求，统计延迟分位数、吞吐量和错误率
+
+用法:
+    python load_test.py --concurrency 16 --duration 10
+    python load_test.py --mix coordinate=6,batch=2,info=1,files=1
+    python load_test.py --save-baseline baseline.json
+    python load_test.py --compare baseline.json --tolerance 0.2
+    python load_test.py --url http://localhost:5200     # 测试已运行的服务
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from bench_startup import free_port, start_server_process, wait_for_server
+from synthetic_data import DEFAULT_BOUNDS, write_sample_mapping, sample_points_in_bounds
+
+DEFAULT_MIX = 'coordinate=70,batch=10,info=10,files=10'
+
+
+def parse_mix(mix):
+    """解析请求比例，例如 'coordinate=7,batch=1' -> {'coordinate': 7.0, 'batch': 1.0}"""
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in REQUEST_BUILDERS:
+            raise ValueError(f"未知的请求类型: {name}，可选: {', '.join(REQUEST_BUILDERS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _coordinate_request(ctx, rng):
+    point = ctx['points'][rng.randrange(len(ctx['points']))]
+    return 'POST', '/api/coordinate', {'coordinates': point, 'jsonFile': rng.choice(ctx['files'])}
+
+
+def _batch_request(ctx, rng):
+    start = rng.randrange(len(ctx['points']) - ctx['batch_size'] + 1)
+    points = ctx['points'][start:start + ctx['batch_size']]
+    return 'POST', '/api/coordinate/batch', {'coordinates': points, 'jsonFile': rng.choice(ctx['files'])}
+
+
+def _info_request(ctx, rng):
+    return 'POST', '/api/mapping-info', {'jsonFile': rng.choice(ctx['files'])}
+
+
+def _files_request(ctx, rng):
+    return 'GET', '/api/mapping-files', None
+
+
+REQUEST_BUILDERS = {
+    'coordinate': _coordinate_request,
+    'batch': _batch_request,
+    'info': _info_request,
+    'files': _files_request,
+}
+
+
+def run_load(base_url, ctx, weights, concurrency, duration=None, total_requests=None, seed=0):
+    """
+    并发发送请求
+
+    Args:
+        base_url (str): 服务地址
+        ctx (dict): files / points / batch_size
+        weights (dict): 各请求类型的权重
+        concurrency (int): 并发数
+        duration (float): 持续时间（秒），与total_requests二选一
+        total_requests (int): 请求总数
+
+    Returns:
+        tuple: (记录列表 [(类型, 延迟秒数, 是否成功)], 实际耗时秒数)
+    """
+    names = list(weights)
+    cum_weights = np.cumsum([weights[n] for n in names]).tolist()
+    records = []
+    records_lock = threading.Lock()
+    counter = iter(range(total_requests)) if total_requests else None
+    counter_lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        local = []
+        while True:
+            if counter is not None:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        break
+            elif time.perf_counter() >= deadline:
+                break
+
+            name = rng.choices(names, cum_weights=cum_weights)[0]
+            method, path, body = REQUEST_BUILDERS[name](ctx, rng)
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=30)
+                ok = response.status_code == 200 and response.json().get('success', True) is not False
+                # 超出映射范围属于正常业务结果，不计为错误
+                if not ok and name == 'coordinate' and response.status_code == 200:
+                    ok = response.json().get('mapped_coordinates') == [-1, -1]
+            except (requests.RequestException, ValueError):
+                ok = False
+            local.append((name, time.perf_counter() - start, ok))
+        with records_lock:
+            records.extend(local)
+
+    start = time.perf_counter()
+    deadline = start + (duration or 0)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return records, time.perf_counter() - start
+
+
+def summarize(records, elapsed):
+    """计算整体和各请求类型的延迟分位数（毫秒）、吞吐量和错误率"""
+    def stats(items):
+        latencies = np.array([r[1] for r in items]) * 1000
+        errors = sum(1 for r in items if not r[2])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(items) else (0, 0, 0)
+        return {
+            'requests': len(items),
+            'throughput_rps': len(items) / elapsed if elapsed else 0.0,
+            'error_rate': errors / len(items) if items else 0.0,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+        }
+
+    summary = {'elapsed_s': elapsed, 'overall': stats(records), 'by_type': {}}
+    for name in sorted({r[0] for r in records}):
+        summary['by_type'][name] = stats([r for r in records if r[0] == name])
+    return summary
+
+
+def compare_with_baseline(summary, baseline, tolerance):
+    """
+    与基线比较，返回回归项列表
+    延迟分位数上升或吞吐量下降超过tolerance比例，或错误率上升即视为回归
+    """
+    regressions = []
+    for name, current in [('overall', summary['overall'])] + list(summary['by_type'].items()):
+        base = baseline['overall'] if name == 'overall' else baseline.get('by_type', {}).get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base[key] > 0 and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {base[key]:.2f} -> {current[key]:.2f}")
+        if current['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}.throughput_rps: {base['throughput_rps']:.1f} -> "
+                               f"{current['throughput_rps']:.1f}")
+        if current['error_rate'] > base['error_rate'] + 0.001:
+            regressions.append(f"{name}.error_rate: {base['error_rate']:.3%} -> "
+                               f"{current['error_rate']:.3%}")
+    return regressions
+
+
+def print_summary(summary):
+    """打印统计结果"""
+    header = f"{'类型':<12}{'请求数':>8}{'吞吐(rps)':>12}{'错误率':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+    print(header)
+    print("-" * len(header))
+    rows = list(summary['by_type'].items()) + [('overall', summary['overall'])]
+    for name, s in rows:
+        print(f"{name:<12}{s['requests']:>8}{s['throughput_rps']:>12.1f}{s['error_rate']:>10.2%}"
+              f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def prepare_mapping_files(storage_dir, n_files, n_points):
+    """在存储目录中生成合成映射文件，返回文件名列表"""
+    files = []
+    for i in range(n_files):
+        filename = f'load_test_{i}.json'
+        write_sample_mapping(os.path.join(storage_dir, filename), n_points=n_points, seed=i)
+        files.append(filename)
+    return files
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='坐标映射服务并发负载测试')
+    parser.add_argument('--url', help='已运行服务的地址；不指定时在本地启动服务')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发数')
+    parser.add_argument('--duration', type=float, default=10, help='持续时间（秒）')
+    parser.add_argument('--requests', type=int, help='请求总数（指定时忽略--duration）')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'请求比例，默认 {DEFAULT_MIX}')
+    parser.add_argument('--files', type=int, default=3, help='合成映射文件数量')
+    parser.add_argument('--points', type=int, default=2000, help='每个映射文件的控制点数量')
+    parser.add_argument('--batch-size', type=int, default=100, help='批量请求的坐标数')
+    parser.add_argument('--save-baseline', help='将结果保存为基线JSON文件')
+    parser.add_argument('--compare', help='与基线JSON文件比较，存在回归时退出码为1')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='回归判定的相对容差')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    storage_dir = tempfile.mkdtemp()
+    process = None
+    files = []
+
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            # 通过保存接口上传合成映射文件，测试结束后删除
+            for i in range(args.files):
+                filename = f'load_test_{i}.json'
+                data = write_sample_mapping(os.path.join(storage_dir, filename),
+                                            n_points=args.points, seed=i)
+                requests.post(f"{base_url}/api/save-json",
+                              json={'data': data, 'filename': filename}).raise_for_status()
+                files.append(filename)
+        else:
+            files = prepare_mapping_files(storage_dir, args.files, args.points)
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_server_process(storage_dir, port)
+            wait_for_server(f"{base_url}/api/health", time.perf_counter(), 30)
+
+        ctx = {
+            'files': files,
+            'points': sample_points_in_bounds(max(1000, args.batch_size), bounds=DEFAULT_BOUNDS).tolist(),
+            'batch_size': args.batch_size,
+        }
+
+        print("🏋️  并发负载测试")
+        print("=" * 50)
+        print(f"📍 服务: {base_url}")
+        print(f"⚙️  并发数 {args.concurrency}, 请求比例 {weights}, "
+              f"{args.files} 个映射文件 x {args.points} 个控制点")
+
+        # 预热：每个映射文件先编译一次，避免首次编译计入延迟
+        for filename in files:
+            requests.post(f"{base_url}/api/mapping-info", json={'jsonFile': filename}, timeout=60)
+
+        records, elapsed = run_load(base_url, ctx, weights, args.concurrency,
+                                    duration=args.duration, total_requests=args.requests)
+        summary = summarize(records, elapsed)
+        summary['config'] = {
+            'concurrency': args.concurrency, 'mix': weights, 'files': args.files,
+            'points': args.points, 'batch_size': args.batch_size,
+        }
+        print()
+        print_summary(summary)
+
+        if args.save_baseline:
+            with open(args.save_baseline, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 基线已保存: {args.save_baseline}")
+
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare_with_baseline(summary, baseline, args.tolerance)
+            if regressions:
+                print(f"\n❌ 相对基线存在 {len(regressions)} 项回归 (容差 {args.tolerance:.0%}):")
+                for item in regressions:
+                    print(f"   - {item}")
+                sys.exit(1)
+            print(f"\n✅ 与基线相比无回归 (容差 {args.tolerance:.0%})")
+
+    finally:
+        if args.url:
+            for filename in files:
+                requests.delete(f"{base_url}/api/delete/{filename}")
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(storage_dir)
+
+
+if __name__ == '__main__':
+    main()
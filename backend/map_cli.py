@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+离线坐标映射命令行工具
+读取CSV中的经纬度列，转换到GCJ-02并映射到手绘地图坐标，追加 x、y、triangle_index 列后写出。
+按块处理，每块的坐标转换和映射都是整块向量化计算；经纬度为空或不是有效数字的行
+x、y留空、triangle_index为-1，并在汇总中计数
+
+用法:
+    python map_cli.py <映射文件.json> <输入.csv> [-o 输出.csv] [--crs wgs84] [--mode affine]
+                      [--lng-col lng] [--lat-col lat] [--chunk-size 100000]
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+
+import numpy as np
+
+from coord_transform import CRS_CHOICES, to_mapping_crs
+from mapping_model import TRANSFORM_MODES, compile_mapping_model
+
+# 每块处理的行数
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def parse_points(rows, lng_index, lat_index):
+    """
+    解析一块CSV行的经纬度，整块转换失败时逐行解析
+
+    Returns:
+        tuple: (坐标 (n, 2)，无效行为nan；是否为有效的有限数值 (n,))
+    """
+    try:
+        points = np.array([[row[lng_index], row[lat_index]] for row in rows], dtype=np.float64).reshape(-1, 2)
+    except (IndexError, ValueError):
+        points = np.full((len(rows), 2), np.nan)
+        for i, row in enumerate(rows):
+            try:
+                points[i] = float(row[lng_index]), float(row[lat_index])
+            except (IndexError, ValueError):
+                pass
+    return points, np.isfinite(points).all(axis=1)
+
+
+def map_rows(model, rows, lng_index, lat_index, crs=None, mode=None):
+    """
+    映射一块CSV行
+
+    Returns:
+        tuple: (映射坐标 (n, 2)，三角形索引 (n,)，经纬度是否有效 (n,))，无效行的三角形索引为-1
+    """
+    points, valid = parse_points(rows, lng_index, lat_index)
+    mapped = np.full((len(rows), 2), np.nan)
+    triangle_indices = np.full(len(rows), -1, dtype=np.int64)
+    if np.any(valid):
+        mapped[valid], triangle_indices[valid] = model.map_points(to_mapping_crs(points[valid], crs), mode)
+    return mapped, triangle_indices, valid
+
+
+def map_csv(model, input_file, output_file, lng_col='lng', lat_col='lat', crs=None, mode=None,
+            chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    映射CSV文件中的所有坐标
+
+    Returns:
+        dict: rows / inside / invalid（经纬度无效的行数） / seconds
+    """
+    start = time.perf_counter()
+    total = inside = invalid = 0
+    reader = csv.reader(input_file)
+    writer = csv.writer(output_file)
+    header = next(reader)
+    try:
+        lng_index, lat_index = header.index(lng_col), header.index(lat_col)
+    except ValueError:
+        raise ValueError(f"CSV中缺少经纬度列: {lng_col}, {lat_col}（表头: {', '.join(header)}）")
+    writer.writerow(header + ['x', 'y', 'triangle_index'])
+
+    def flush(rows):
+        mapped, triangle_indices, valid = map_rows(model, rows, lng_index, lat_index, crs, mode)
+        writer.writerows(row + ([x, y] if ok else ['', '']) + [index] for row, (x, y), index, ok
+                         in zip(rows, mapped.tolist(), triangle_indices.tolist(), valid.tolist()))
+        return int(np.count_nonzero(triangle_indices >= 0)), int(np.count_nonzero(~valid))
+
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            counts = flush(rows)
+            inside, invalid, total = inside + counts[0], invalid + counts[1], total + len(rows)
+            rows = []
+    if rows:
+        counts = flush(rows)
+        inside, invalid, total = inside + counts[0], invalid + counts[1], total + len(rows)
+    return {'rows': total, 'inside': inside, 'invalid': invalid, 'seconds': time.perf_counter() - start}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='离线将CSV中的经纬度映射到手绘地图坐标')
+    parser.add_argument('mapping', help='映射文件路径（JSON）')
+    parser.add_argument('input', help='输入CSV文件，- 表示标准输入')
+    parser.add_argument('-o', '--output', default='-', help='输出CSV文件，默认为标准输出')
+    parser.add_argument('--crs', choices=CRS_CHOICES, default='gcj02', help='输入坐标系')
+    parser.add_argument('--mode', choices=TRANSFORM_MODES, default=None, help='变换模式，默认使用映射文件的设置')
+    parser.add_argument('--lng-col', default='lng', help='经度列名')
+    parser.add_argument('--lat-col', default='lat', help='纬度列名')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每块处理的行数')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.mapping):
+        print(f"❌ 映射文件不存在: {args.mapping}", file=sys.stderr)
+        sys.exit(1)
+    model = compile_mapping_model(args.mapping)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8', newline='')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        result = map_csv(model, input_file, output_file, args.lng_col, args.lat_col,
+                         args.crs, args.mode, args.chunk_size)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print(f"✅ 映射 {result['rows']} 行（{args.crs}），{result['inside']} 行在映射范围内，"
+          f"耗时 {result['seconds']:.2f} 秒", file=sys.stderr)
+    if result['invalid']:
+        print(f"⚠️  {result['invalid']} 行的经纬度为空或无效，x、y留空，triangle_index为-1", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
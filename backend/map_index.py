@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+映射文件自动选择
+对存储目录中所有映射文件的范围建立索引，把每个坐标路由到覆盖它的手绘地图：
+先用外包矩形（向量化比较）筛选候选地图，再用控制点凸包精确判断（建索引和选择地图都不需要编译模型）；
+多个地图覆盖同一点时，按metadata中的priority（大者优先）和凸包面积（小者优先，
+例如建筑平面图优先于校园全图）选择。跨多个地图的批量坐标按地图分组后逐组向量化映射
+"""
+
+import os
+import logging
+import threading
+
+import numpy as np
+
+from mapping_model import load_mapping_file, metadata_priority
+
+logger = logging.getLogger(__name__)
+
+
+# 判断点是否在凸包内时允许的距离误差（经纬度）
+HULL_EPS = 1e-12
+
+
+class MapEntry:
+    """索引中的一个映射文件（凸包顶点按逆时针排列）"""
+
+    def __init__(self, filename, bounds, priority, hull_area, hull):
+        self.filename = filename
+        self.bounds = bounds
+        self.priority = priority
+        self.hull_area = hull_area
+        self.hull = hull
+
+    def contains(self, points):
+        """点是否在凸包内 (n,)：对每条凸包边做一次向量化的半平面判断"""
+        inside = np.ones(len(points), dtype=bool)
+        for start, end in zip(self.hull, np.roll(self.hull, -1, axis=0)):
+            edge = end - start
+            offset = points - start
+            cross = edge[0] * offset[:, 1] - edge[1] * offset[:, 0]
+            inside &= cross >= -HULL_EPS * np.hypot(edge[0], edge[1])
+        return inside
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'bounds': list(self.bounds),
+            'priority': self.priority,
+            'hull_area': self.hull_area
+        }
+
+
+def read_map_entry(json_file_path, model=None):
+    """
+    映射文件的索引条目：外包矩形、priority和控制点凸包
+
+    只读取文件中的控制点并计算凸包（远快于三角剖分和矩阵求解），不编译模型；
+    文件的模型已编译时直接使用模型中的控制点
+
+    Args:
+        json_file_path (str): 映射文件路径
+        model (MappingModel): 已编译的模型，None时读取文件
+
+    Returns:
+        MapEntry: 索引条目
+    """
+    from scipy.spatial import ConvexHull
+
+    if model is not None:
+        coords, priority = model.coords, model.priority
+    else:
+        data = load_mapping_file(json_file_path)
+        coords, priority = data['coords'], metadata_priority(data['metadata'])
+    hull = ConvexHull(coords)
+    low, high = coords.min(axis=0), coords.max(axis=0)
+    bounds = (float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+    # 二维凸包的volume为面积，vertices按逆时针排列
+    return MapEntry(os.path.basename(json_file_path), bounds, priority, float(hull.volume),
+                    coords[hull.vertices])
+
+
+class MapIndex:
+    """
+    映射文件范围索引
+    目录中映射文件的列表、修改时间或大小变化后，下一次查询时自动重建：
+    只重新读取变化的文件的控制点凸包，不编译模型；重建在锁外进行，完成后整体替换，
+    重建期间其他查询继续使用旧索引（首次建立时等待）
+
+    Args:
+        storage_dir (str): 映射文件目录
+        get_model (callable): 根据文件路径返回编译后的模型，失败时返回None（映射时使用）
+        peek_model (callable): 根据文件路径返回已编译的模型，未就绪时返回None（建索引时复用，可选）
+    """
+
+    def __init__(self, storage_dir, get_model, peek_model=None):
+        self.storage_dir = storage_dir
+        self.get_model = get_model
+        self.peek_model = peek_model
+        self._entries = []
+        self._bounds = np.zeros((0, 4), dtype=np.float64)
+        self._version = None
+        self._files = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _scan(self):
+        """目录中映射文件的 (文件名, 修改时间, 大小)，用于判断索引是否过期"""
+        version = []
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    stats = entry.stat()
+                    version.append((entry.name, stats.st_mtime_ns, stats.st_size))
+        return tuple(sorted(version))
+
+    def _read_entry(self, filename):
+        """读取一个文件的索引条目，不是有效的映射文件时返回None"""
+        path = os.path.join(self.storage_dir, filename)
+        try:
+            return read_map_entry(path, self.peek_model(path) if self.peek_model is not None else None)
+        except Exception as e:
+            logger.warning(f"映射文件 {filename} 无法加入范围索引: {e}")
+            return None
+
+    def refresh(self):
+        """目录内容变化时重建索引"""
+        version = self._scan()
+        if version == self._version:
+            return
+        # 其他线程正在重建时继续使用旧索引；还没有索引时等待重建完成
+        if not self._refresh_lock.acquire(blocking=self._version is None):
+            return
+        try:
+            if version == self._version:
+                return
+            files = {}
+            for filename, mtime, size in version:
+                cached = self._files.get(filename)
+                if cached is None or cached[:2] != (mtime, size):
+                    cached = (mtime, size, self._read_entry(filename))
+                files[filename] = cached
+            entries = [entry for _, _, entry in files.values() if entry is not None]
+            entries.sort(key=lambda e: (-e.priority, e.hull_area, e.filename))
+            bounds = np.array([e.bounds for e in entries], dtype=np.float64).reshape(-1, 4)
+            self._files = files
+            with self._lock:
+                self._entries, self._bounds, self._version = entries, bounds, version
+            logger.info(f"映射文件范围索引已更新: {len(entries)} 个地图")
+        finally:
+            self._refresh_lock.release()
+
+    def entries(self):
+        """按优先级排序的索引条目"""
+        self.refresh()
+        with self._lock:
+            return list(self._entries)
+
+    def _candidates(self, points):
+        """外包矩形与点集范围相交的地图（按优先级排序）及其外包矩形"""
+        self.refresh()
+        with self._lock:
+            entries, bounds = self._entries, self._bounds
+        if not len(points) or not entries:
+            return [], bounds[:0]
+        low, high = points.min(axis=0), points.max(axis=0)
+        overlap = ((bounds[:, 0] <= high[0]) & (bounds[:, 2] >= low[0])
+                   & (bounds[:, 1] <= high[1]) & (bounds[:, 3] >= low[1]))
+        keep = np.flatnonzero(overlap)
+        return [entries[i] for i in keep], bounds[keep]
+
+    def route(self, points):
+        """
+        为每个点选择覆盖它的优先级最高的地图（外包矩形筛选后按凸包判断，不需要编译模型）
+
+        Args:
+            points (array-like): GCJ-02坐标 (n, 2)
+
+        Returns:
+            tuple: (地图文件名列表（与返回的编号对应），每个点的地图编号 (n,)（未被任何地图覆盖为-1）)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        assignment = np.full(len(points), -1, dtype=np.int64)
+        candidates, bounds = self._candidates(points)
+
+        filenames = []
+        for entry, (min_lng, min_lat, max_lng, max_lat) in zip(candidates, bounds):
+            pending = np.flatnonzero(assignment < 0)
+            if len(pending) == 0:
+                break
+            x, y = points[pending, 0], points[pending, 1]
+            pending = pending[(x >= min_lng) & (x <= max_lng) & (y >= min_lat) & (y <= max_lat)]
+            if len(pending) == 0:
+                continue
+            inside = entry.contains(points[pending])
+            if np.any(inside):
+                assignment[pending[inside]] = len(filenames)
+                filenames.append(entry.filename)
+        return filenames, assignment
+
+    def covering(self, point):
+        """覆盖某个点的所有地图文件名（按优先级排序）"""
+        point = np.asarray(point, dtype=np.float64).reshape(1, 2)
+        return [entry.filename for entry, _ in zip(*self._candidates(point)) if entry.contains(point)[0]]
+
+    def map_points(self, points, mode=None, approx_k=None, routed=None):
+        """
+        自动选择地图并按地图分组批量映射
+
+        Args:
+            points (array-like): GCJ-02坐标 (n, 2)
+            mode (str): 变换模式，None时使用各地图的默认模式
+            approx_k (int): 薄板样条近似邻域数
+            routed (tuple): 这些点的 route() 结果，None时重新计算
+
+        Returns:
+            tuple: (映射坐标 (n, 2)（未被覆盖的点为[-1, -1]），三角形索引 (n,)，
+                    每个点的地图文件名列表（未被覆盖为None），各地图的分组信息 {文件名: {count, mode}})
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        filenames, assignment = self.route(points) if routed is None else (routed[0], routed[1].copy())
+        triangles = np.full(len(points), -1, dtype=np.int64)
+        mapped = np.full((len(points), 2), -1.0, dtype=np.float64)
+        partitions = {}
+
+        for number, filename in enumerate(filenames):
+            group = np.flatnonzero(assignment == number)
+            model = self.get_model(os.path.join(self.storage_dir, filename))
+            if model is None:
+                assignment[group] = -1
+                continue
+            triangles[group] = model.locate(points[group])
+            # 凸包边界上数值误差范围内的点以三角网查找结果为准
+            outside = triangles[group] < 0
+            assignment[group[outside]] = -1
+            group = group[~outside]
+            if len(group) == 0:
+                continue
+            group_mode = mode or model.default_mode
+            if group_mode == 'tps':
+                mapped[group] = model.smooth_warp().evaluate(points[group], k=approx_k)
+            else:
+                mapped[group] = model.transform_located(points[group], triangles[group])
+            partitions[filename] = {'count': int(len(group)), 'mode': group_mode}
+
+        names = np.array(filenames + [None], dtype=object)
+        return mapped, triangles, names[assignment].tolist(), partitions
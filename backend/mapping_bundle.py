@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+二进制映射包
+把编译后的映射模型（三角网顶点、三角形、仿射系数和粗网格索引）写成紧凑的二进制包，
+浏览器可以直接用类型化数组（Float32Array / Int32Array）读取并在本地完成坐标映射，无需每次请求服务端。
+
+布局（全部为小端序，各段按4字节对齐，可直接作为类型化数组的视图）:
+
+    头部 (HEADER_SIZE = 112 字节)
+        magic          4s     b'SZMB'
+        version        uint16 格式版本
+        header_size    uint16 头部长度
+        vertex_count   uint32 顶点数 n
+        triangle_count uint32 三角形数 m
+        grid_cols      uint32 网格列数
+        grid_rows      uint32 网格行数
+        grid_entries   uint32 网格索引中的三角形条目数
+        flags          uint32 保留，当前为0
+        origin         2 x float64 重新居中的原点（经度, 纬度）
+        bounds         4 x float64 网格范围 (min_lng, min_lat, max_lng, max_lat)
+        digest         32s    其后所有数据段的SHA-256
+    数据段
+        vertices       float32 (n, 2)  顶点经纬度减去原点
+        simplices      int32   (m, 3)  三角形顶点编号
+        affines        float32 (m, 6)  [a, b, c, d, e, f]，x = a*dx + b*dy + c，y = d*dx + e*dy + f，
+                                       其中 (dx, dy) 为经纬度减去原点
+        grid_offsets   int32   (cols*rows + 1)  每个网格单元在grid_triangles中的起止位置（行优先）
+        grid_triangles int32   (grid_entries)   与单元外包矩形相交的三角形编号（单元内按编号升序）
+
+坐标减去原点后再存为float32，深圳范围内的顶点精度约为0.1毫米；
+仿射系数相应地改写为以原点为中心的形式，避免float32下大数相消
+"""
+
+import struct
+import hashlib
+
+import numpy as np
+
+BUNDLE_MAGIC = b'SZMB'
+BUNDLE_VERSION = 1
+
+_HEADER = struct.Struct('<4sHHIIIIII2d4d32s')
+HEADER_SIZE = _HEADER.size
+
+# 网格单元的平均三角形数（决定网格粗细）
+GRID_TRIANGLES_PER_CELL = 4
+
+# 客户端判断点是否在三角形内时使用的重心坐标容差（覆盖顶点存为float32后的舍入误差）
+BARYCENTRIC_EPS = 1e-5
+
+
+def grid_shape(bounds, triangle_count):
+    """按范围的长宽比选择网格行列数，使每个单元平均约有 GRID_TRIANGLES_PER_CELL 个三角形"""
+    width = max(bounds[2] - bounds[0], 1e-12)
+    height = max(bounds[3] - bounds[1], 1e-12)
+    cells = max(triangle_count / GRID_TRIANGLES_PER_CELL, 1.0)
+    cols = int(np.clip(np.round(np.sqrt(cells * width / height)), 1, 4096))
+    rows = int(np.clip(np.round(cells / cols), 1, 4096))
+    return cols, rows
+
+
+def cell_range(values, low, size, count):
+    """坐标所在的网格行或列编号（限制在网格范围内）"""
+    return np.clip(((values - low) / size * count).astype(np.int64), 0, count - 1)
+
+
+def build_grid_index(triangles, bounds, cols, rows):
+    """
+    构建粗网格索引：每个单元列出外包矩形与之相交的三角形
+
+    Args:
+        triangles (numpy.ndarray): 三角形顶点坐标 (m, 3, 2)
+        bounds (tuple): 网格范围 (min_lng, min_lat, max_lng, max_lat)
+        cols (int): 网格列数
+        rows (int): 网格行数
+
+    Returns:
+        tuple: (单元起止位置 (cols*rows + 1,)，三角形编号 (entries,))
+    """
+    width = max(bounds[2] - bounds[0], 1e-12)
+    height = max(bounds[3] - bounds[1], 1e-12)
+    low, high = triangles.min(axis=1), triangles.max(axis=1)
+    col0 = cell_range(low[:, 0], bounds[0], width, cols)
+    col1 = cell_range(high[:, 0], bounds[0], width, cols)
+    row0 = cell_range(low[:, 1], bounds[1], height, rows)
+    row1 = cell_range(high[:, 1], bounds[1], height, rows)
+
+    # 展开每个三角形覆盖的单元（向量化，无逐三角形循环）
+    span_cols = col1 - col0 + 1
+    counts = span_cols * (row1 - row0 + 1)
+    owner = np.repeat(np.arange(len(triangles)), counts)
+    local = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell = (row0[owner] + local // span_cols[owner]) * cols + col0[owner] + local % span_cols[owner]
+
+    order = np.argsort(cell, kind='stable')
+    offsets = np.zeros(cols * rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cell, minlength=cols * rows), out=offsets[1:])
+    return offsets, owner[order]
+
+
+def write_bundle(coords, simplices, affine_matrices):
+    """
+    写出二进制映射包
+
+    Args:
+        coords (numpy.ndarray): 顶点经纬度 (n, 2)
+        simplices (numpy.ndarray): 三角形顶点编号 (m, 3)
+        affine_matrices (numpy.ndarray): 每个三角形的仿射矩阵 (m, 3, 3)
+
+    Returns:
+        bytes: 映射包
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    simplices = np.asarray(simplices, dtype=np.int64).reshape(-1, 3)
+    matrices = np.asarray(affine_matrices, dtype=np.float64).reshape(-1, 3, 3)
+
+    low, high = coords.min(axis=0), coords.max(axis=0)
+    origin = (low + high) / 2
+    bounds = (float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+    cols, rows = grid_shape(bounds, len(simplices))
+    offsets, grid_triangles = build_grid_index(coords[simplices], bounds, cols, rows)
+
+    # x = A (p - origin) + (A origin + t)
+    linear = matrices[:, :2, :2]
+    translation = matrices[:, :2, 2] + linear @ origin
+    affines = np.concatenate([linear, translation[:, :, None]], axis=2).reshape(-1, 6)
+
+    body = b''.join([
+        (coords - origin).astype('<f4').tobytes(),
+        simplices.astype('<i4').tobytes(),
+        affines.astype('<f4').tobytes(),
+        offsets.astype('<i4').tobytes(),
+        grid_triangles.astype('<i4').tobytes()
+    ])
+    header = _HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, HEADER_SIZE, len(coords), len(simplices),
+                          cols, rows, len(grid_triangles), 0, *origin, *bounds,
+                          hashlib.sha256(body).digest())
+    return header + body
+
+
+def model_bundle(model):
+    """由编译后的映射模型写出二进制映射包"""
+    return write_bundle(model.coords, model.triangulation.simplices, model.affine_matrices)
+
+
+def bundle_hash(data):
+    """映射包的内容哈希（头部中数据段SHA-256的十六进制形式）"""
+    return _HEADER.unpack_from(data)[-1].hex()
+
+
+class MappingBundle:
+    """
+    读取后的二进制映射包，按与浏览器端相同的方法（网格索引 + 重心坐标判断）在本地映射坐标
+
+    Attributes:
+        version (int): 格式版本
+        digest (str): 数据段SHA-256
+        origin (numpy.ndarray): 重新居中的原点 (2,)
+        bounds (tuple): 网格范围
+        grid_shape (tuple): (列数, 行数)
+        vertices (numpy.ndarray): float32 顶点坐标（减去原点） (n, 2)
+        simplices (numpy.ndarray): int32 三角形顶点编号 (m, 3)
+        affines (numpy.ndarray): float32 仿射系数 (m, 6)
+        grid_offsets (numpy.ndarray): int32 网格单元起止位置
+        grid_triangles (numpy.ndarray): int32 网格单元中的三角形编号
+    """
+
+    def __init__(self, version, digest, origin, bounds, grid_shape, vertices, simplices, affines,
+                 grid_offsets, grid_triangles):
+        self.version = version
+        self.digest = digest
+        self.origin = origin
+        self.bounds = bounds
+        self.grid_shape = grid_shape
+        self.vertices = vertices
+        self.simplices = simplices
+        self.affines = affines
+        self.grid_offsets = grid_offsets
+        self.grid_triangles = grid_triangles
+
+    def locate(self, points):
+        """
+        批量查找点所在的三角形（在点所在网格单元的候选三角形中取编号最小的包含者）
+
+        Args:
+            points (array-like): 经纬度 (k, 2)
+
+        Returns:
+            numpy.ndarray: 三角形索引 (k,)，不在任何三角形内为-1
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = np.full(len(points), -1, dtype=np.int64)
+        min_lng, min_lat, max_lng, max_lat = self.bounds
+        cols, rows = self.grid_shape
+        inside_bounds = np.flatnonzero((points[:, 0] >= min_lng) & (points[:, 0] <= max_lng)
+                                       & (points[:, 1] >= min_lat) & (points[:, 1] <= max_lat))
+        if len(inside_bounds) == 0:
+            return result
+
+        relative = points[inside_bounds] - self.origin
+        col = cell_range(points[inside_bounds, 0], min_lng, max(max_lng - min_lng, 1e-12), cols)
+        row = cell_range(points[inside_bounds, 1], min_lat, max(max_lat - min_lat, 1e-12), rows)
+        cell = row * cols + col
+        start, end = self.grid_offsets[cell], self.grid_offsets[cell + 1]
+
+        # 展开 (点, 候选三角形) 对并一次性计算重心坐标
+        counts = (end - start).astype(np.int64)
+        pair_point = np.repeat(np.arange(len(cell)), counts)
+        pair_index = np.arange(len(pair_point)) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = self.grid_triangles[np.repeat(start, counts) + pair_index].astype(np.int64)
+
+        a, b, c = np.moveaxis(self.vertices[self.simplices[candidates]].astype(np.float64), 1, 0)
+        p = relative[pair_point]
+        u, v, w = b - a, c - a, p - a
+        det = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            l1 = (w[:, 0] * v[:, 1] - w[:, 1] * v[:, 0]) / det
+            l2 = (u[:, 0] * w[:, 1] - u[:, 1] * w[:, 0]) / det
+        hit = (det != 0) & (l1 >= -BARYCENTRIC_EPS) & (l2 >= -BARYCENTRIC_EPS) & (l1 + l2 <= 1 + BARYCENTRIC_EPS)
+
+        # 候选三角形在单元内按编号升序，取每个点的第一个命中
+        hit_points = pair_point[hit]
+        first = np.unique(hit_points, return_index=True)
+        result[inside_bounds[first[0]]] = candidates[hit][first[1]]
+        return result
+
+    def transform(self, points):
+        """
+        批量将经纬度映射到手绘地图坐标
+
+        Returns:
+            tuple: (映射坐标 (k, 2)，超出范围的点为[-1, -1]；三角形索引 (k,))
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        triangle_indices = self.locate(points)
+        mapped = np.full((len(points), 2), -1.0, dtype=np.float64)
+        inside = triangle_indices >= 0
+        if np.any(inside):
+            coefficients = self.affines[triangle_indices[inside]].astype(np.float64).reshape(-1, 2, 3)
+            relative = points[inside] - self.origin
+            mapped[inside] = np.einsum('kij,kj->ki', coefficients[:, :, :2], relative) + coefficients[:, :, 2]
+        return mapped, triangle_indices
+
+
+def read_bundle(data):
+    """
+    读取二进制映射包
+
+    Args:
+        data (bytes): 映射包
+
+    Returns:
+        MappingBundle: 读取结果（数组为映射包内存的只读视图）
+
+    Raises:
+        ValueError: 不是映射包、版本不支持、长度不符或内容哈希不一致
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError("映射包长度不足")
+    (magic, version, header_size, vertex_count, triangle_count, cols, rows, entries, _,
+     origin_lng, origin_lat, min_lng, min_lat, max_lng, max_lat, digest) = _HEADER.unpack_from(data)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("不是二进制映射包")
+    if version != BUNDLE_VERSION:
+        raise ValueError(f"不支持的映射包版本: {version}")
+
+    sections = [('<f4', vertex_count * 2), ('<i4', triangle_count * 3), ('<f4', triangle_count * 6),
+                ('<i4', cols * rows + 1), ('<i4', entries)]
+    if len(data) != header_size + 4 * sum(count for _, count in sections):
+        raise ValueError("映射包长度与头部不符")
+    body = memoryview(data)[header_size:]
+    if hashlib.sha256(body).digest() != digest:
+        raise ValueError("映射包内容哈希不一致")
+
+    arrays = []
+    offset = header_size
+    for dtype, count in sections:
+        arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+        offset += 4 * count
+    vertices, simplices, affines, grid_offsets, grid_triangles = arrays
+    return MappingBundle(version, digest.hex(), np.array([origin_lng, origin_lat]),
+                         (min_lng, min_lat, max_lng, max_lat), (cols, rows),
+                         vertices.reshape(-1, 2), simplices.reshape(-1, 3), affines.reshape(-1, 6),
+                         grid_offsets, grid_triangles)
@@ -0,0 +1,946 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+坐标映射模型编译与缓存
+将映射JSON文件编译为包含三角剖分和仿射矩阵的模型，并按文件缓存，
+避免每次请求都重新进行三角剖分和矩阵计算
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from utils import (
+    convert_coordinates,
+    triangulate_coords,
+    generate_triangle_lists,
+    calculate_all_affine_matrices
+)
+
+logger = logging.getLogger(__name__)
+
+# 支持的变换模式：分段仿射（默认）和薄板样条平滑变换
+TRANSFORM_MODES = ('affine', 'tps')
+
+# 模型存储精度：float64（默认）和 float32 紧凑模式
+PRECISIONS = ('float64', 'float32')
+
+# float32紧凑模式允许的最大映射偏差（手绘坐标单位，即归一化的手绘地图坐标），超出时保留float64
+COMPACT_TOLERANCE = 1e-6
+
+# 控制点抽稀后测量查找加速比使用的随机点数
+LOOKUP_BENCH_POINTS = 20000
+
+# 编译阶段：读取文件、三角剖分、求解仿射矩阵、构建查找索引（及抽稀、样条系数等）
+COMPILE_STAGES = ('load', 'triangulate', 'solve', 'index')
+
+# 影响编译结果的metadata字段，与映射内容一起决定模型键（其他metadata如名称、日期不影响）
+COMPILE_METADATA_KEYS = ('transformMode', 'priority', 'simplifyTolerance', 'qualityReport',
+                         'precision', 'compactTolerance')
+
+# 轨迹查找时逐点行走（先检查提示三角形）的最大点数，更长的轨迹走批量路径（find_simplex）
+TRAJECTORY_WALK_POINTS = 64
+
+# 平滑变换系数的延迟求解锁（模型需可序列化，不能在实例上保存锁）
+_smooth_warp_lock = threading.Lock()
+
+
+class MappingModel:
+    """
+    编译后的坐标映射模型
+
+    Attributes:
+        json_file_path (str): 映射数据文件路径
+        coords (numpy.ndarray): 腾讯地图坐标 (n, 2)
+        xy (numpy.ndarray): 手绘地图坐标 (n, 2)
+        triangulation (Delaunay): coords上的三角剖分
+        affine_matrices (numpy.ndarray): 每个三角形的仿射矩阵 (m, 3, 3)，float32模式下由紧凑系数还原
+        precision (str): 存储精度，'float64' 或 'float32'（见 compact_model）
+        affines (numpy.ndarray): float32模式下以三角形第一个顶点为原点的仿射系数 (m, 2, 3)，float64模式为None
+        compact_report (dict): float32模式的偏差测量结果（是否采用、最大偏差、节省的内存）
+        compile_seconds (float): 编译耗时（秒）
+        default_mode (str): 映射文件metadata中transformMode指定的默认变换模式
+        content_hash (str): 规范化的映射内容（控制点坐标）哈希，用于按内容缓存瓦片等派生数据
+        model_key (str): 模型键（映射内容和影响编译的metadata的哈希），内容相同的文件共用一个模型
+        simplified (MappingModel): 控制点抽稀后的简化模型（编译时指定了抽稀容差时存在）
+        simplify_report (dict): 抽稀报告：压缩比、最大误差和查找加速比
+        quality_report (dict): 编译时计算的映射质量报告（条件数、面积畸变、退化三角形和留一残差）
+        priority (float): 映射文件metadata中的priority，多个地图覆盖同一点时优先使用较大值
+    """
+
+    def __init__(self, json_file_path, coords, xy, triangulation, affine_matrices,
+                 compile_seconds=0.0, file_mtime_ns=None, file_size=None, default_mode='affine',
+                 content_hash=None, priority=0.0, model_key=None):
+        self.json_file_path = json_file_path
+        self.coords = coords
+        self.xy = xy
+        self.triangulation = triangulation
+        self._affine_matrices = affine_matrices
+        self.precision = 'float64'
+        self.affines = None
+        self.compact_report = None
+        self.compile_seconds = compile_seconds
+        self.file_mtime_ns = file_mtime_ns
+        self.file_size = file_size
+        self.default_mode = default_mode
+        self.content_hash = content_hash
+        self.priority = priority
+        self.model_key = model_key
+        self.compiled_at = time.time()
+        self._smooth_warp = None
+        self._walk = None
+        self._bundle = None
+        self._viewport = None
+        self._landmarks = None
+        self.simplified = None
+        self.simplify_report = None
+        self.quality_report = None
+
+    @property
+    def affine_matrices(self):
+        if self.affines is None:
+            return self._affine_matrices
+        # x = A (p - v0) + t'  =>  x = A p + (t' - A v0)
+        linear = self.affines[:, :, :2].astype(np.float64)
+        anchors = self.coords[self.triangulation.simplices[:, 0]]
+        matrices = np.zeros((len(self.affines), 3, 3), dtype=np.float64)
+        matrices[:, :2, :2] = linear
+        matrices[:, :2, 2] = self.affines[:, :, 2] - np.einsum('mij,mj->mi', linear, anchors)
+        matrices[:, 2, 2] = 1.0
+        return matrices
+
+    @property
+    def triangles_count(self):
+        return int(len(self.triangulation.simplices))
+
+    @property
+    def bounds(self):
+        """控制点的经纬度范围 (min_lng, min_lat, max_lng, max_lat)"""
+        low = self.coords.min(axis=0)
+        high = self.coords.max(axis=0)
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+    @property
+    def hull_area(self):
+        """三角网（即控制点凸包）的面积（经纬度平方）"""
+        a, b, c = np.moveaxis(self.coords_triangles(), 1, 0)
+        u, v = b - a, c - a
+        return float(np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]).sum() / 2)
+
+    def coords_triangles(self, limit=None):
+        """返回coords坐标系下的三角形顶点 (m, 3, 2)"""
+        simplices = self.triangulation.simplices[:limit]
+        return self.coords[simplices]
+
+    def xy_triangles(self, limit=None):
+        """返回xy坐标系下的三角形顶点 (m, 3, 2)"""
+        simplices = self.triangulation.simplices[:limit]
+        return self.xy[simplices]
+
+    def locate(self, points):
+        """
+        批量查找点所在的三角形
+
+        Args:
+            points (array-like): 点坐标 (k, 2)
+
+        Returns:
+            numpy.ndarray: 三角形索引 (k,)，不在任何三角形内为-1
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return self.triangulation.find_simplex(points)
+
+    def memory_usage(self):
+        """
+        模型各部分占用的内存（字节）
+
+        Returns:
+            dict: arrays（控制点和仿射矩阵）、delaunay（三角剖分内部数组，含延迟计算的transform等）、
+                  indexes（逐点查找的索引表、视口查询网格和控制点KD树）、caches（薄板样条系数、二进制映射包等延迟构建的缓存）、
+                  simplified（抽稀后的简化模型）和total
+        """
+        usage = {
+            'arrays': int(self.coords.nbytes + self.xy.nbytes
+                          + (self.affines if self.affines is not None else self._affine_matrices).nbytes),
+            'delaunay': _nbytes(vars(self.triangulation)),
+            'indexes': sum(_table_bytes(table) for table in self._walk or ())
+                       + (self._viewport.nbytes if self._viewport is not None else 0)
+                       + (self._landmarks.nbytes if self._landmarks is not None else 0),
+            'caches': (self._smooth_warp.nbytes if self._smooth_warp is not None else 0)
+                      + (len(self._bundle) if self._bundle is not None else 0),
+            'simplified': self.simplified.memory_usage()['total'] if self.simplified is not None else 0
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def _walk_tables(self):
+        """三角形重心坐标变换和邻接表的Python列表（逐点查找时避免numpy小数组的调用开销）"""
+        if self._walk is None:
+            self._walk = (self.triangulation.transform.tolist(), self.triangulation.neighbors.tolist())
+        return self._walk
+
+    def locate_next(self, point, hint=-1):
+        """
+        查找单个轨迹点所在的三角形，先检查提示三角形（通常为上一个点所在的三角形）及其相邻三角形
+
+        Returns:
+            tuple: (三角形索引，不在任何三角形内为-1；是否命中提示三角形或其相邻三角形)
+        """
+        transforms, neighbors = self._walk_tables()
+        x, y = float(point[0]), float(point[1])
+        if 0 <= hint < len(transforms):
+            found = _walk_step(transforms, neighbors, hint, x, y)
+            if found >= 0:
+                return found, True
+        return int(self.triangulation.find_simplex(np.array([[x, y]]))[0]), False
+
+    def locate_trajectory(self, points, hint=-1):
+        """
+        按顺序查找轨迹点所在的三角形
+
+        不超过 TRAJECTORY_WALK_POINTS 个点时逐点行走：每个点先检查上一个点所在的三角形及其
+        相邻三角形（triangulation.neighbors），未命中时才对该点做完整查找，适用于实时跟踪中逐条到达的少量点。
+        更长的轨迹走批量路径：只有第一个点使用提示，其余点一次性交给 find_simplex
+        （qhull从上一个点的三角形开始行走，同样利用轨迹的连续性，但不经过提示检查）
+
+        Args:
+            points (array-like): 按时间排序的点坐标 (k, 2)
+            hint (int): 第一个点的提示三角形（例如上一批轨迹最后一个点所在的三角形）
+
+        Returns:
+            tuple: (三角形索引 (k,)，不在任何三角形内为-1；统计dict：
+                    walked_points 先检查提示三角形的点数（批量路径下为1），
+                    adjacent_points 落在前一个范围内点所在三角形或其相邻三角形内的点数，
+                    由查找结果统一计算，反映轨迹的连续性，与走哪条路径无关)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        walk_count = len(points) if len(points) <= TRAJECTORY_WALK_POINTS else min(1, len(points))
+        result = np.empty(len(points), dtype=np.int64)
+        last = hint
+        for i, point in enumerate(points[:walk_count].tolist()):
+            found, _ = self.locate_next(point, last)
+            result[i] = found
+            if found >= 0:
+                last = found
+        if walk_count < len(points):
+            result[walk_count:] = self.triangulation.find_simplex(points[walk_count:])
+        return result, {'walked_points': walk_count, 'adjacent_points': self._adjacent_count(result, hint)}
+
+    def _adjacent_count(self, result, hint=-1):
+        """落在前一个范围内点所在三角形（第一个点为提示三角形）或其相邻三角形内的点数"""
+        if len(result) == 0:
+            return 0
+        # 每个点之前最近的范围内点所在的三角形，之前没有范围内点时为提示三角形
+        positions = np.where(result >= 0, np.arange(len(result)), -1)
+        latest = np.maximum.accumulate(positions)
+        previous = np.concatenate([[hint], np.where(latest[:-1] >= 0, result[np.maximum(latest[:-1], 0)], hint)])
+        valid = (previous >= 0) & (previous < len(self.triangulation.simplices)) & (result >= 0)
+        near = (result == previous) | np.any(
+            self.triangulation.neighbors[np.where(valid, previous, 0)] == result[:, None], axis=1)
+        return int(np.count_nonzero(valid & near))
+
+    def transform(self, points):
+        """
+        批量将腾讯地图坐标映射到手绘地图坐标
+
+        Args:
+            points (array-like): 点坐标 (k, 2)
+
+        Returns:
+            tuple: (映射坐标 (k, 2)，超出范围的点为[-1, -1]；三角形索引 (k,))
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        triangle_indices = self.locate(points)
+        return self.transform_located(points, triangle_indices), triangle_indices
+
+    def smooth_warp(self):
+        """获取薄板样条平滑变换，系数在首次使用时求解一次并缓存"""
+        if self._smooth_warp is None:
+            with _smooth_warp_lock:
+                if self._smooth_warp is None:
+                    from smooth_warp import ThinPlateSpline
+                    start = time.perf_counter()
+                    self._smooth_warp = ThinPlateSpline(self.coords, self.xy)
+                    logger.info(f"求解薄板样条系数 {os.path.basename(self.json_file_path)}: "
+                                f"{self._smooth_warp.centers_count} 个中心, "
+                                f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+        return self._smooth_warp
+
+    def bundle(self):
+        """二进制映射包（供浏览器本地映射），首次使用时生成并缓存"""
+        if self._bundle is None:
+            from mapping_bundle import model_bundle
+            self._bundle = model_bundle(self)
+        return self._bundle
+
+    def viewport_index(self):
+        """两个坐标空间中三角形和控制点的视口查询网格索引（编译时构建，简化模型在首次使用时构建）"""
+        if self._viewport is None:
+            from viewport_index import ViewportIndex
+            self._viewport = ViewportIndex(self.coords, self.xy, self.triangulation.simplices)
+        return self._viewport
+
+    def landmark_index(self):
+        """两个坐标空间中控制点的KD树（编译时构建，简化模型在首次使用时构建）"""
+        if self._landmarks is None:
+            from landmark_index import LandmarkIndex
+            self._landmarks = LandmarkIndex(self.coords, self.xy)
+        return self._landmarks
+
+    def map_points(self, points, mode=None, approx_k=None):
+        """
+        按指定变换模式批量映射坐标
+
+        Args:
+            points (array-like): 点坐标 (k, 2)
+            mode (str): 'affine' 分段仿射 或 'tps' 薄板样条，None时使用文件默认模式
+            approx_k (int): 薄板样条近似计算使用的邻域中心数，None表示精确计算
+
+        Returns:
+            tuple: (映射坐标 (k, 2)，三角形索引 (k,))
+                   affine模式下超出范围的点为[-1, -1]；tps模式在凸包外也给出结果
+        """
+        mode = mode or self.default_mode
+        if mode not in TRANSFORM_MODES:
+            raise ValueError(f"不支持的变换模式: {mode}")
+        if mode == 'affine':
+            return self.transform(points)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return self.smooth_warp().evaluate(points, k=approx_k), self.locate(points)
+
+    def transform_located(self, points, triangle_indices):
+        """
+        使用已知的三角形索引进行批量仿射变换
+        float32模式下点先减去所在三角形的第一个顶点（float64）再转为float32，与紧凑系数一起以float32计算
+        """
+        mapped = np.full((len(points), 2), -1.0, dtype=np.float64)
+        inside = triangle_indices >= 0
+        if np.any(inside) and self.affines is not None:
+            located = triangle_indices[inside]
+            coefficients = self.affines[located]
+            anchors = self.coords[self.triangulation.simplices[located, 0]]
+            relative = (points[inside] - anchors).astype(np.float32)
+            mapped[inside] = np.einsum('kij,kj->ki', coefficients[:, :, :2], relative) + coefficients[:, :, 2]
+        elif np.any(inside):
+            matrices = self.affine_matrices[triangle_indices[inside]]
+            mapped[inside] = (
+                np.einsum('kij,kj->ki', matrices[:, :2, :2], points[inside])
+                + matrices[:, :2, 2]
+            )
+        return mapped
+
+
+def _nbytes(value):
+    """numpy数组（含dict/tuple/list中的数组）占用的字节数"""
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _table_bytes(table):
+    """由等长行组成的Python嵌套列表的内存估算（按第一行的大小乘以行数）"""
+    if not table:
+        return sys.getsizeof(table)
+
+    def size(value):
+        if isinstance(value, list):
+            return sys.getsizeof(value) + sum(size(v) for v in value)
+        return sys.getsizeof(value)
+
+    return sys.getsizeof(table) + size(table[0]) * len(table)
+
+
+def _walk_step(transforms, neighbors, simplex, x, y, eps=1e-12):
+    """检查点是否在指定三角形或其相邻三角形内（纯Python计算重心坐标），返回所在三角形或-1"""
+    for candidate in (simplex, *neighbors[simplex]):
+        if candidate < 0:
+            continue
+        (a, b), (c, d), (ox, oy) = transforms[candidate]
+        dx, dy = x - ox, y - oy
+        l0 = a * dx + b * dy
+        l1 = c * dx + d * dy
+        if l0 >= -eps and l1 >= -eps and 1.0 - l0 - l1 >= -eps:
+            return candidate
+    return -1
+
+
+def mapping_content_hash(coords, xy):
+    """
+    规范化的映射内容哈希：按文件中的顺序把控制点坐标转为float64后计算SHA-256，
+    与文件名、JSON格式（缩进、键顺序、数字写法）和metadata无关
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(coords, dtype='<f8').tobytes())
+    digest.update(np.ascontiguousarray(xy, dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def mapping_model_key(content_hash, metadata):
+    """模型键：映射内容哈希加上影响编译结果的metadata字段"""
+    options = {key: metadata.get(key) for key in COMPILE_METADATA_KEYS}
+    return hashlib.sha256(
+        (content_hash + json.dumps(options, sort_keys=True, default=str)).encode('utf-8')).hexdigest()
+
+
+def load_mapping_file(json_file_path):
+    """
+    读取映射文件并计算内容哈希和模型键
+
+    Returns:
+        dict: coords / xy（numpy数组）、metadata、content_hash、model_key
+    """
+    data = convert_coordinates(json_file_path)
+    coords = np.asarray(data['coords'], dtype=np.float64).reshape(-1, 2)
+    xy = np.asarray(data['xy'], dtype=np.float64).reshape(-1, 2)
+    content_hash = mapping_content_hash(coords, xy)
+    return {
+        'coords': coords,
+        'xy': xy,
+        'metadata': data['metadata'],
+        'content_hash': content_hash,
+        'model_key': mapping_model_key(content_hash, data['metadata'])
+    }
+
+
+def metadata_priority(metadata):
+    """metadata中的priority（多个地图覆盖同一点时优先使用较大值），无效时为0"""
+    try:
+        return float(metadata.get('priority', 0))
+    except (TypeError, ValueError):
+        logger.warning(f"metadata中的priority无效: {metadata.get('priority')}")
+        return 0.0
+
+
+def mapping_file_hash(json_file_path):
+    """映射文件的规范化内容哈希（文件不存在或不是映射文件时返回None）"""
+    try:
+        return load_mapping_file(json_file_path)['content_hash']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def build_mapping_model(json_file_path, coords, xy, progress=None, **attributes):
+    """
+    由控制点数组构建映射模型（三角剖分 + 每个三角形的仿射矩阵）
+
+    Args:
+        json_file_path (str): 映射数据文件路径
+        coords (array-like): 腾讯地图坐标 (n, 2)
+        xy (array-like): 手绘地图坐标 (n, 2)
+        progress (callable): 进入各编译阶段时的回调 (stage)
+        **attributes: 传给MappingModel的其他属性
+
+    Returns:
+        MappingModel: 映射模型
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    xy = np.asarray(xy, dtype=np.float64)
+    if progress is not None:
+        progress('triangulate')
+    triangulation = triangulate_coords(coords)
+    if progress is not None:
+        progress('solve')
+    coords_triangles, xy_triangles = generate_triangle_lists(coords, xy, triangulation)
+    affine_matrices = calculate_all_affine_matrices(coords_triangles, xy_triangles)
+    return MappingModel(json_file_path, coords, xy, triangulation,
+                        np.asarray(affine_matrices, dtype=np.float64).reshape(-1, 3, 3), **attributes)
+
+
+def _lookup_seconds(model, points, runs=3):
+    """批量三角形查找的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.locate(points)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def simplify_model(model, tolerance, seed=0, lookup_points=LOOKUP_BENCH_POINTS):
+    """
+    抽稀控制点，构建简化模型
+
+    Args:
+        model (MappingModel): 完整模型
+        tolerance (float): 被删除控制点处的最大允许误差（手绘坐标单位）
+        lookup_points (int): 测量查找加速比使用的随机点数
+
+    Returns:
+        tuple: (简化模型, 报告dict：控制点/三角形数、压缩比、最大误差、查找耗时和加速比,
+                保留的控制点掩码 (n,))
+    """
+    from decimation import decimate_control_points
+
+    kept, max_error, stats = decimate_control_points(model.coords, model.xy, tolerance, seed)
+    simplified = build_mapping_model(
+        model.json_file_path, model.coords[kept], model.xy[kept],
+        file_mtime_ns=model.file_mtime_ns, file_size=model.file_size, default_mode=model.default_mode,
+        content_hash=model.content_hash, priority=model.priority
+    )
+
+    rng = np.random.default_rng(seed)
+    min_lng, min_lat, max_lng, max_lat = model.bounds
+    points = np.column_stack([rng.uniform(min_lng, max_lng, lookup_points),
+                              rng.uniform(min_lat, max_lat, lookup_points)])
+    full_seconds = _lookup_seconds(model, points)
+    simplified_seconds = _lookup_seconds(simplified, points)
+
+    report = {
+        'tolerance': tolerance,
+        'full_points': int(len(model.coords)),
+        'kept_points': int(np.count_nonzero(kept)),
+        'full_triangles': model.triangles_count,
+        'kept_triangles': simplified.triangles_count,
+        'compression_ratio': len(model.coords) / max(int(np.count_nonzero(kept)), 1),
+        'max_error': max_error,
+        'full_lookup_us': full_seconds / lookup_points * 1e6,
+        'simplified_lookup_us': simplified_seconds / lookup_points * 1e6,
+        'lookup_speedup': full_seconds / max(simplified_seconds, 1e-12),
+        'seconds': stats['seconds'],
+        'rounds': stats['rounds']
+    }
+    return simplified, report, kept
+
+
+def compact_model(model, tolerance=COMPACT_TOLERANCE):
+    """
+    把模型切换为float32紧凑存储：仿射系数改写为以三角形第一个顶点为原点的形式后存为float32 (m, 2, 3)，
+    手绘坐标存为float32；编译时测量与float64结果的最大偏差，超出容差时保持float64不变。
+    按三角形而不是按全图中心重新居中：狭长三角形的线性系数可达普通三角形的上千倍，
+    以全图中心为原点时float32下的偏差随之放大，以自身顶点为原点时偏差只与三角形在手绘图上的大小有关。
+    系数舍入引起的偏差在每个三角形内是仿射函数，最大值在顶点处取得，因此在所有三角形的
+    顶点处比较两种计算即得到三角形内的最大偏差（单位矩阵替代的退化三角形不参与比较）
+
+    Args:
+        model (MappingModel): float64模型
+        tolerance (float): 最大允许偏差（手绘坐标单位）
+
+    Returns:
+        dict: 报告：是否采用、容差、最大偏差（仿射/手绘坐标）、节省的内存和耗时
+    """
+    start = time.perf_counter()
+    matrices = model.affine_matrices
+    simplices = model.triangulation.simplices
+    anchors = model.coords[simplices[:, 0]]
+    linear = matrices[:, :2, :2]
+    translation = np.einsum('mij,mj->mi', linear, anchors) + matrices[:, :2, 2]
+    affines = np.concatenate([linear, translation[:, :, None]], axis=2).astype(np.float32)
+    xy = model.xy.astype(np.float32)
+
+    measured = ~np.all(matrices == np.eye(3), axis=(1, 2))
+    vertices = model.coords[simplices[measured]]
+    exact = np.einsum('mij,mkj->mki', linear[measured], vertices) + matrices[measured, None, :2, 2]
+    relative = (vertices - anchors[measured, None, :]).astype(np.float32)
+    compact = (np.einsum('mij,mkj->mki', affines[measured, :, :2], relative)
+               + affines[measured, None, :, 2])
+    affine_deviation = float(np.linalg.norm(compact - exact, axis=2).max()) if np.any(measured) else 0.0
+    xy_deviation = float(np.linalg.norm(xy - model.xy, axis=1).max()) if len(xy) else 0.0
+    max_deviation = max(affine_deviation, xy_deviation)
+    accepted = max_deviation <= tolerance
+
+    before = model.memory_usage()['arrays']
+    if accepted:
+        model.affines = affines
+        model._affine_matrices = None
+        model.xy = xy
+        model.precision = 'float32'
+    return {
+        'precision': model.precision,
+        'accepted': accepted,
+        'tolerance': tolerance,
+        'max_deviation': max_deviation,
+        'affine_deviation': affine_deviation,
+        'xy_deviation': xy_deviation,
+        'excluded_triangles': int(np.count_nonzero(~measured)),
+        'saved_bytes': int(before - model.memory_usage()['arrays']),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def compile_mapping_model(json_file_path, simplify_tolerance=None, progress=None, data=None, precision=None):
+    """
+    编译映射数据文件为MappingModel
+
+    Args:
+        json_file_path (str): JSON文件路径
+        simplify_tolerance (float): 控制点抽稀容差（手绘坐标单位），同时保留完整模型和简化模型；
+                                    None时使用metadata中的simplifyTolerance，均未设置时不抽稀
+        progress (callable): 进入各编译阶段（COMPILE_STAGES）时的回调 (stage)
+        data (dict): 已读取的文件内容（load_mapping_file的结果），None时读取文件
+        precision (str): 存储精度（PRECISIONS之一），None时使用metadata中的precision，均未设置时为float64；
+                         float32的最大允许偏差由metadata中的compactTolerance指定（默认COMPACT_TOLERANCE）
+
+    Returns:
+        MappingModel: 编译后的模型（抽稀时简化模型为其simplified属性）
+    """
+    start = time.perf_counter()
+    if progress is not None:
+        progress('load')
+    stats = os.stat(json_file_path)
+
+    if data is None:
+        data = load_mapping_file(json_file_path)
+    metadata = data['metadata']
+
+    default_mode = metadata.get('transformMode', 'affine')
+    if default_mode not in TRANSFORM_MODES:
+        logger.warning(f"未知的transformMode: {default_mode}，使用分段仿射")
+        default_mode = 'affine'
+
+    priority = metadata_priority(metadata)
+
+    model = build_mapping_model(
+        json_file_path, data['coords'], data['xy'],
+        file_mtime_ns=stats.st_mtime_ns,
+        file_size=stats.st_size,
+        default_mode=default_mode,
+        content_hash=data['content_hash'],
+        model_key=data['model_key'],
+        priority=priority,
+        progress=progress
+    )
+    if progress is not None:
+        progress('index')
+    # 预先计算点查找使用的重心坐标变换（否则在第一次查找时计算）、视口查询索引和控制点KD树
+    model.triangulation.transform
+    model.viewport_index()
+    model.landmark_index()
+    if metadata.get('qualityReport', True):
+        from mapping_quality import quality_report
+        model.quality_report = quality_report(model)
+        triangles = model.quality_report['triangles']
+        if triangles['identity_fallback'] or triangles['flipped']:
+            logger.warning(f"映射质量 {os.path.basename(json_file_path)}: "
+                           f"{triangles['identity_fallback']} 个三角形的仿射矩阵求解失败（已用单位矩阵代替）, "
+                           f"{triangles['flipped']} 个三角形翻转")
+    # 文件默认使用平滑变换时，在编译阶段就求解样条系数
+    if default_mode == 'tps':
+        model.smooth_warp()
+
+    if simplify_tolerance is None:
+        simplify_tolerance = metadata.get('simplifyTolerance')
+    if simplify_tolerance is not None:
+        try:
+            model.simplified, model.simplify_report, _ = simplify_model(model, float(simplify_tolerance))
+            logger.info(f"控制点抽稀 {os.path.basename(json_file_path)}: "
+                        f"{model.simplify_report['full_points']} -> {model.simplify_report['kept_points']} 个控制点, "
+                        f"查找加速 {model.simplify_report['lookup_speedup']:.2f}x")
+        except (TypeError, ValueError) as e:
+            logger.warning(f"控制点抽稀失败: {str(e)}")
+
+    # 紧凑存储放在最后：质量报告和抽稀使用float64的控制点和仿射矩阵
+    precision = precision or metadata.get('precision', 'float64')
+    if precision not in PRECISIONS:
+        logger.warning(f"未知的precision: {precision}，使用float64")
+    elif precision == 'float32':
+        try:
+            tolerance = float(metadata.get('compactTolerance', COMPACT_TOLERANCE))
+        except (TypeError, ValueError):
+            logger.warning(f"metadata中的compactTolerance无效: {metadata.get('compactTolerance')}")
+            tolerance = COMPACT_TOLERANCE
+        model.compact_report = compact_model(model, tolerance)
+        if model.simplified is not None:
+            model.simplified.compact_report = compact_model(model.simplified, tolerance)
+        if model.compact_report['accepted']:
+            logger.info(f"float32紧凑模式 {os.path.basename(json_file_path)}: "
+                        f"最大偏差 {model.compact_report['max_deviation']:.2e}, "
+                        f"节省 {model.compact_report['saved_bytes'] / 1024:.0f} KB")
+        else:
+            logger.warning(f"float32紧凑模式未采用 {os.path.basename(json_file_path)}: "
+                           f"最大偏差 {model.compact_report['max_deviation']:.2e} 超出容差 {tolerance:.2e}")
+
+    model.compile_seconds = time.perf_counter() - start
+    return model
+
+
+class ModelCache:
+    """
+    按映射内容缓存编译后的映射模型
+    每个文件记录修改时间、大小和模型键，文件变化时重新读取并计算内容哈希；
+    映射内容（及影响编译的metadata）相同的多个文件共用一个编译模型。
+    设置内存预算后，放入新模型时按最近最少使用的顺序淘汰旧模型，直到总内存不超过预算
+
+    Args:
+        max_bytes (int): 模型内存预算（字节），None表示不限制
+    """
+
+    def __init__(self, max_bytes=None):
+        self._models = OrderedDict()
+        self._files = {}
+        self._lock = threading.Lock()
+        self._compile_locks = {}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dedup_hits = 0
+        self.dedup_saved_seconds = 0.0
+
+    def _key(self, json_file_path):
+        return os.path.abspath(json_file_path)
+
+    def _fresh_model(self, key, stats):
+        """文件记录未过期且对应模型仍在缓存中时返回模型（需持有锁）"""
+        entry = self._files.get(key)
+        if entry is None or entry[0] != stats.st_mtime_ns or entry[1] != stats.st_size:
+            return None
+        model = self._models.get(entry[2])
+        if model is not None:
+            self._models.move_to_end(entry[2])
+        return model
+
+    def _count_dedup(self, model, key):
+        """其他文件复用了该模型时记录节省的编译（需持有锁）"""
+        if self._key(model.json_file_path) != key:
+            self.dedup_hits += 1
+            self.dedup_saved_seconds += model.compile_seconds
+
+    def get(self, json_file_path):
+        """
+        获取文件对应的模型，缓存失效时重新编译；内容相同的模型已在缓存中时直接复用
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        key = self._key(json_file_path)
+        stats = os.stat(key)
+
+        with self._lock:
+            model = self._fresh_model(key, stats)
+            if model is not None:
+                self.hits += 1
+                return model
+
+        # 文件新出现或已修改：读取内容并计算模型键（远快于三角剖分和矩阵求解）
+        data = load_mapping_file(key)
+        model_key = data['model_key']
+        with self._lock:
+            self._files[key] = (stats.st_mtime_ns, stats.st_size, model_key, data['content_hash'])
+            model = self._models.get(model_key)
+            if model is not None:
+                self._models.move_to_end(model_key)
+                self.hits += 1
+                self._count_dedup(model, key)
+                return model
+            compile_lock = self._compile_locks.setdefault(model_key, threading.Lock())
+
+        # 同一内容只编译一次，其他请求等待编译结果
+        with compile_lock:
+            try:
+                with self._lock:
+                    model = self._models.get(model_key)
+                    if model is not None:
+                        self._models.move_to_end(model_key)
+                        self.hits += 1
+                        self._count_dedup(model, key)
+                        return model
+                    self.misses += 1
+
+                model = compile_mapping_model(key, data=data)
+                logger.info(f"编译映射模型 {os.path.basename(key)}: "
+                            f"{model.triangles_count} 个三角形, 耗时 {model.compile_seconds * 1000:.1f} ms")
+                return self.put(model)
+            finally:
+                # 编译结束（模型已放入缓存）后移除该内容的编译锁，避免锁表随文件数无限增长；
+                # 仍在等待的请求持有同一个锁对象，获得锁后直接取到缓存中的模型
+                with self._lock:
+                    if self._compile_locks.get(model_key) is compile_lock:
+                        del self._compile_locks[model_key]
+
+    def peek(self, json_file_path):
+        """
+        获取已编译且未过期的模型，不触发编译（文件不存在或模型未就绪时返回None）
+        """
+        key = self._key(json_file_path)
+        try:
+            stats = os.stat(key)
+        except OSError:
+            return None
+        with self._lock:
+            model = self._fresh_model(key, stats)
+            if model is not None:
+                self.hits += 1
+            return model
+
+    def put(self, model):
+        """
+        放入已编译的模型（例如由预热进程池编译的模型）
+        内容相同的模型已在缓存中时保留已有模型，只记录该文件
+
+        Returns:
+            MappingModel: 缓存中该内容对应的模型
+        """
+        key = self._key(model.json_file_path)
+        model_key = model.model_key or key
+        with self._lock:
+            self._files[key] = (model.file_mtime_ns, model.file_size, model_key, model.content_hash)
+            cached = self._models.get(model_key)
+            if cached is not None and cached is not model:
+                self._count_dedup(cached, key)
+                model = cached
+            self._models[model_key] = model
+            self._models.move_to_end(model_key)
+        self.enforce_budget()
+        return model
+
+    def enforce_budget(self):
+        """
+        淘汰最近最少使用的模型，直到总内存不超过预算（至少保留最近使用的一个模型）
+        模型的延迟缓存（如薄板样条系数）在构建后的下一次检查时计入
+
+        Returns:
+            list: 被淘汰模型的文件名
+        """
+        if self.max_bytes is None:
+            return []
+        evicted = []
+        with self._lock:
+            sizes = {key: model.memory_usage()['total'] for key, model in self._models.items()}
+            total = sum(sizes.values())
+            while total > self.max_bytes and len(self._models) > 1:
+                key, model = self._models.popitem(last=False)
+                total -= sizes[key]
+                self.evictions += 1
+                evicted.append(os.path.basename(model.json_file_path))
+        for filename in evicted:
+            logger.info(f"模型内存超出预算，淘汰 {filename}")
+        return evicted
+
+    def invalidate(self, json_file_path):
+        """移除文件的缓存记录；没有其他文件使用同一模型时一并移除模型"""
+        with self._lock:
+            entry = self._files.pop(self._key(json_file_path), None)
+            if entry is None:
+                return False
+            if not any(other[2] == entry[2] for other in self._files.values()):
+                self._models.pop(entry[2], None)
+            return True
+
+    def content_files(self, content_hash):
+        """缓存记录中映射内容哈希相同的文件名"""
+        with self._lock:
+            return sorted(os.path.basename(key) for key, entry in self._files.items() if entry[3] == content_hash)
+
+    def _model_files(self):
+        """每个缓存模型对应的文件名（需持有锁）"""
+        files = {}
+        for key, entry in self._files.items():
+            if entry[2] in self._models:
+                files.setdefault(entry[2], []).append(os.path.basename(key))
+        return files
+
+    def _dedup_summary(self, files, sizes):
+        """去重统计：共用模型的文件数、复用次数、节省的内存和编译时间"""
+        return {
+            'files': sum(len(names) for names in files.values()),
+            'models': len(sizes),
+            'shared_files': sum(len(names) - 1 for names in files.values()),
+            'hits': self.dedup_hits,
+            'saved_bytes': sum((len(files.get(key, ())) - 1) * size for key, size in sizes.items()
+                               if len(files.get(key, ())) > 1),
+            'saved_compile_seconds': self.dedup_saved_seconds
+        }
+
+    def memory_report(self):
+        """
+        各模型内存占用（按最近使用排序，最近的在前）和总量
+
+        Returns:
+            dict: models / total_bytes / budget_bytes / evictions / dedup
+        """
+        with self._lock:
+            items = list(self._models.items())[::-1]
+            files = self._model_files()
+        models = [
+            {
+                'file': os.path.basename(model.json_file_path),
+                'files': sorted(files.get(key, [])),
+                'triangles': model.triangles_count,
+                'bytes': model.memory_usage()
+            }
+            for key, model in items
+        ]
+        sizes = {key: m['bytes']['total'] for (key, _), m in zip(items, models)}
+        return {
+            'models': models,
+            'total_bytes': sum(sizes.values()),
+            'budget_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'dedup': self._dedup_summary(files, sizes)
+        }
+
+    def stats(self):
+        """缓存统计信息（dedup为内容去重节省的模型数、内存和编译时间）"""
+        with self._lock:
+            models = list(self._models.items())
+            files = self._model_files()
+            stats = {
+                'models': len(models),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'files': [os.path.basename(model.json_file_path) for _, model in models]
+            }
+        stats['dedup'] = self._dedup_summary(files, {key: model.memory_usage()['total'] for key, model in models})
+        return stats
+
+
+def _compile_for_warmup(json_file_path):
+    """预热进程池中执行的编译任务（需为模块级函数以便序列化）"""
+    try:
+        return json_file_path, compile_mapping_model(json_file_path), None
+    except Exception as e:
+        return json_file_path, None, str(e)
+
+
+def warmup_models(storage_dir, cache, max_workers=None, on_compiled=None):
+    """
+    使用进程池并行编译目录中的所有映射文件并放入缓存
+
+    Args:
+        storage_dir (str): 映射文件目录
+        cache (ModelCache): 目标模型缓存
+        max_workers (int): 进程数，默认为CPU核数
+        on_compiled (callable): 每个文件完成时的回调 (filename, seconds, error)
+
+    Returns:
+        dict: {filename: {'seconds': float, 'triangles': int} 或 {'error': str}}
+    """
+    json_files = [os.path.join(storage_dir, f)
+                  for f in sorted(os.listdir(storage_dir)) if f.endswith('.json')]
+    report = {}
+    if not json_files:
+        return report
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_compile_for_warmup, path) for path in json_files]
+        for future in as_completed(futures):
+            path, model, error = future.result()
+            filename = os.path.basename(path)
+            if model is not None:
+                cache.put(model)
+                report[filename] = {
+                    'seconds': model.compile_seconds,
+                    'triangles': model.triangles_count
+                }
+                seconds = model.compile_seconds
+            else:
+                report[filename] = {'error': error}
+                seconds = None
+            if on_compiled is not None:
+                on_compiled(filename, seconds, error)
+
+    return report
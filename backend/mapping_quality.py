@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+映射质量报告
+编译时计算，在标记点落到错误位置之前发现有问题的控制点和三角形：
+
+- 条件数：每个三角形仿射变换线性部分的最大/最小奇异值之比（经度按纬度余弦缩放为局部等距坐标），
+  越大表示该三角形内的变形越各向异性
+- 面积畸变比：三角形在手绘地图中的面积占比与在腾讯地图中的面积占比之比；
+  朝向与多数三角形相反的为翻转（折叠）三角形，通常由手绘坐标标错的控制点引起
+- 退化三角形：仿射矩阵求解失败、被 calculate_all_affine_matrices 替换为单位矩阵的三角形，以及面积接近0的三角形
+- 留一残差：去掉每个内部控制点后，用其余控制点的三角网插值该点得到的手绘坐标与实际值的距离。
+  去掉一个顶点只改变与它相邻的三角形，因此只对其邻居环做局部重新三角剖分；
+  邻居数相同的控制点分为一组，一次性向量化计算，不需要逐点重建整个三角网；
+  向量化计算的代价随邻居数四次方增长，邻居数很多的控制点改为逐个对邻居环做Delaunay剖分
+"""
+
+import time
+import itertools
+
+import numpy as np
+
+# 报告中列出的最差三角形和控制点数
+QUALITY_WORST = 10
+
+# 面积小于中位数此倍数的三角形视为接近退化
+DEGENERATE_AREA_RATIO = 1e-9
+
+# 留一残差分块计算时每块的最大元素数（控制内存）
+RING_CHUNK_ELEMENTS = 4_000_000
+
+# 向量化计算留一残差的最大邻居数（三元组数×邻居数随邻居数四次方增长，超过时逐点剖分邻居环）
+RING_VECTOR_MAX_DEGREE = 24
+
+
+def _summary(values):
+    """有限值的分位数统计"""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return None
+    p50, p95, p99 = np.percentile(finite, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(finite.max())}
+
+
+def _worst(values, limit=QUALITY_WORST):
+    """数值最大的有限值的编号（从大到小）"""
+    finite = np.flatnonzero(np.isfinite(values))
+    if len(finite) > limit:
+        finite = finite[np.argpartition(values[finite], -limit)[-limit:]]
+    return finite[np.argsort(values[finite])[::-1]]
+
+
+def triangle_metrics(coords, simplices, affine_matrices):
+    """
+    每个三角形的质量指标（向量化）
+
+    Args:
+        coords (numpy.ndarray): 腾讯地图坐标 (n, 2)
+        simplices (numpy.ndarray): 三角形顶点编号 (m, 3)
+        affine_matrices (numpy.ndarray): 仿射矩阵 (m, 3, 3)
+
+    Returns:
+        dict: condition 条件数、area_ratio 面积畸变比、flipped 是否翻转、
+              identity 是否为单位矩阵替代、degenerate 是否退化，均为 (m,) 数组
+    """
+    # 局部等距坐标：经度乘以纬度余弦，使两个方向的单位长度相同
+    scale = np.cos(np.radians(coords[:, 1].mean()))
+    jacobian = affine_matrices[:, :2, :2] / np.array([scale, 1.0])
+
+    a, b, c = np.moveaxis(coords[simplices] * np.array([scale, 1.0]), 1, 0)
+    u, v = b - a, c - a
+    source_area = np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]) / 2
+
+    det = jacobian[:, 0, 0] * jacobian[:, 1, 1] - jacobian[:, 0, 1] * jacobian[:, 1, 0]
+    frobenius = np.einsum('mij,mij->m', jacobian, jacobian)
+    root = np.sqrt(np.maximum(frobenius ** 2 - 4 * det ** 2, 0))
+    largest = np.sqrt((frobenius + root) / 2)
+    smallest = np.sqrt(np.maximum((frobenius - root) / 2, 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        condition = np.where(smallest > 0, largest / smallest, np.inf)
+
+    identity = np.all(affine_matrices == np.eye(3), axis=(1, 2))
+    degenerate = identity | (source_area <= DEGENERATE_AREA_RATIO * np.median(source_area))
+    valid = ~degenerate
+    # 全局面积比（手绘面积总和 / 腾讯地图面积总和）作为基准
+    overall = np.sum(np.abs(det[valid]) * source_area[valid]) / max(np.sum(source_area[valid]), 1e-300)
+    area_ratio = np.where(valid, np.abs(det) / overall, np.nan)
+    orientation = np.sign(np.median(det[valid])) if np.any(valid) else 1.0
+    flipped = valid & (np.sign(det) == -orientation)
+
+    return {
+        'condition': np.where(valid, condition, np.nan),
+        'area_ratio': area_ratio,
+        'flipped': flipped,
+        'identity': identity,
+        'degenerate': degenerate
+    }
+
+
+def _ring_triangle_residuals(coords, xy, centers, rings):
+    """
+    同一邻居数的一组控制点的留一残差
+
+    去掉顶点后，空洞由其邻居环重新三角剖分；空洞中包含该点的三角形就是邻居环的
+    Delaunay三角形中包含该点的那个：在邻居的所有三元组中选出包含该点、且外接圆内
+    没有其他邻居的三角形（共圆等数值情况下取违反最少的），再用重心坐标插值
+
+    Args:
+        centers (numpy.ndarray): 控制点编号 (k,)
+        rings (numpy.ndarray): 每个控制点的邻居编号 (k, d)
+
+    Returns:
+        numpy.ndarray: 残差 (k,)
+    """
+    degree = rings.shape[1]
+    combos = np.array(list(itertools.combinations(range(degree), 3)))
+    # 以控制点为原点、按邻居范围归一化，使判断与坐标尺度无关
+    offsets = coords[rings] - coords[centers][:, None, :]
+    offsets /= np.abs(offsets).max(axis=(1, 2))[:, None, None]
+    a, b, c = (offsets[:, combos[:, i]] for i in range(3))
+
+    def cross(u, v):
+        return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+    # 包含原点的三角形：原点相对三条边的方向与三角形朝向一致
+    orientation = cross(b - a, c - a)
+    sign = np.sign(orientation)
+    eps = 1e-12
+    contains = ((cross(b - a, -a) * sign >= -eps) & (cross(c - b, -b) * sign >= -eps)
+                & (cross(a - c, -c) * sign >= -eps) & (np.abs(orientation) > eps))
+
+    # 外接圆判断（incircle行列式，按三角形朝向取符号），三角形自身的顶点为0
+    def lifted(p):
+        return p[..., 0] ** 2 + p[..., 1] ** 2
+
+    d = offsets[:, None, :, :]
+    ad, bd, cd = a[:, :, None] - d, b[:, :, None] - d, c[:, :, None] - d
+    incircle = (lifted(ad) * cross(bd, cd) + lifted(bd) * cross(cd, ad) + lifted(cd) * cross(ad, bd))
+    violations = np.count_nonzero(incircle * sign[:, :, None] > eps, axis=2)
+
+    best = np.argmin(np.where(contains, violations, np.iinfo(np.int64).max), axis=1)
+    rows = np.arange(len(centers))
+    pa, pb, pc = a[rows, best], b[rows, best], c[rows, best]
+    area = cross(pb - pa, pc - pa)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.column_stack([cross(pb, pc), cross(pc, pa), cross(pa, pb)]) / area[:, None]
+    predicted = np.einsum('ki,kij->kj', weights, xy[rings[rows[:, None], combos[best]]])
+    residuals = np.linalg.norm(predicted - xy[centers], axis=1)
+    # 数值上没有找到包含该点的三角形时不报告残差
+    return np.where(contains.any(axis=1), residuals, np.nan)
+
+
+def _ring_delaunay_residual(coords, xy, center, ring):
+    """
+    邻居数很多的单个控制点的留一残差：直接对邻居环做Delaunay剖分并定位该点
+
+    Args:
+        center (int): 控制点编号
+        ring (numpy.ndarray): 邻居编号 (d,)
+
+    Returns:
+        float: 残差，数值上没有找到包含该点的三角形时为nan
+    """
+    from scipy.spatial import Delaunay, QhullError
+
+    # 与向量化计算相同的归一化，以控制点为原点
+    offsets = coords[ring] - coords[center]
+    offsets /= np.abs(offsets).max()
+    try:
+        mesh = Delaunay(offsets)
+    except QhullError:
+        return np.nan
+    simplex = int(mesh.find_simplex(np.zeros(2)))
+    if simplex < 0:
+        return np.nan
+    partial = mesh.transform[simplex, :2] @ -mesh.transform[simplex, 2]
+    predicted = np.append(partial, 1 - partial.sum()) @ xy[ring[mesh.simplices[simplex]]]
+    return float(np.linalg.norm(predicted - xy[center]))
+
+
+def leave_one_out_residuals(coords, xy, triangulation):
+    """
+    每个内部控制点的留一残差（按邻居数分组向量化计算）
+
+    Args:
+        coords (numpy.ndarray): 腾讯地图坐标 (n, 2)
+        xy (numpy.ndarray): 手绘地图坐标 (n, 2)
+        triangulation (Delaunay): 全部控制点的三角剖分
+
+    Returns:
+        numpy.ndarray: 残差 (n,)，凸包顶点和重复点等无法插值的点为nan
+    """
+    residuals = np.full(len(coords), np.nan)
+    indptr, neighbors = triangulation.vertex_neighbor_vertices
+    degrees = np.diff(indptr)
+    interior = degrees >= 3
+    interior[np.unique(triangulation.convex_hull)] = False
+
+    for degree in np.unique(degrees[interior]):
+        group = np.flatnonzero(interior & (degrees == degree))
+        if degree > RING_VECTOR_MAX_DEGREE:
+            for center in group:
+                ring = neighbors[indptr[center]:indptr[center + 1]]
+                residuals[center] = _ring_delaunay_residual(coords, xy, center, ring)
+            continue
+        # 每块的 (点数 × 三元组数 × 邻居数) 不超过 RING_CHUNK_ELEMENTS
+        per_point = len(list(itertools.combinations(range(degree), 3))) * degree
+        chunk = max(1, RING_CHUNK_ELEMENTS // per_point)
+        for start in range(0, len(group), chunk):
+            centers = group[start:start + chunk]
+            rings = neighbors[indptr[centers][:, None] + np.arange(degree)]
+            residuals[centers] = _ring_triangle_residuals(coords, xy, centers, rings)
+
+    return residuals
+
+
+def quality_report(model, limit=QUALITY_WORST):
+    """
+    编译后模型的质量报告
+
+    Args:
+        model (MappingModel): 映射模型
+        limit (int): 列出的最差三角形和控制点数
+
+    Returns:
+        dict: triangles（条件数、面积畸变比、翻转和退化三角形）、residuals（留一残差）和耗时
+    """
+    start = time.perf_counter()
+    simplices = model.triangulation.simplices
+    metrics = triangle_metrics(model.coords, simplices, model.affine_matrices)
+    residuals = leave_one_out_residuals(model.coords, model.xy, model.triangulation)
+    median = np.nanmedian(residuals) if np.any(np.isfinite(residuals)) else np.nan
+
+    def triangle_entry(index):
+        return {
+            'triangle': int(index),
+            'vertices': simplices[index].tolist(),
+            'condition': float(metrics['condition'][index]),
+            'area_ratio': float(metrics['area_ratio'][index])
+        }
+
+    return {
+        'triangles': {
+            'count': int(len(simplices)),
+            'condition': _summary(metrics['condition']),
+            'area_ratio': _summary(metrics['area_ratio']),
+            'min_area_ratio': float(np.nanmin(metrics['area_ratio'])) if np.any(~metrics['degenerate']) else None,
+            'flipped': int(np.count_nonzero(metrics['flipped'])),
+            'identity_fallback': int(np.count_nonzero(metrics['identity'])),
+            'degenerate': int(np.count_nonzero(metrics['degenerate'])),
+            'worst_condition': [triangle_entry(i) for i in _worst(metrics['condition'], limit)],
+            'flipped_triangles': np.flatnonzero(metrics['flipped'])[:limit].tolist(),
+            'degenerate_triangles': np.flatnonzero(metrics['degenerate'])[:limit].tolist()
+        },
+        'residuals': {
+            'points': int(np.count_nonzero(np.isfinite(residuals))),
+            'skipped': int(np.count_nonzero(~np.isfinite(residuals))),
+            'stats': _summary(residuals),
+            'worst': [
+                {
+                    'point': int(index),
+                    'residual': float(residuals[index]),
+                    'relative': float(residuals[index] / median) if median > 0 else None,
+                    'tencent': model.coords[index].tolist(),
+                    'xy': model.xy[index].tolist()
+                }
+                for index in _worst(residuals, limit)
+            ]
+        },
+        'seconds': time.perf_counter() - start
+    }
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+tracemalloc内存快照
+设置环境变量 MAP_TRACEMALLOC=1（可选 MAP_TRACEMALLOC_FRAMES 指定保留的调用栈深度）后
+在启动时开始跟踪内存分配；每次取快照时返回分配最多的代码位置，并与上一次快照比较，
+用于排查映射文件反复更新（模型重新编译）后内存是否持续增长
+"""
+
+import threading
+import tracemalloc
+
+_previous_snapshot = None
+_snapshot_lock = threading.Lock()
+
+# 快照中忽略的分配来源
+_IGNORED_FILES = ('<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>',
+                  tracemalloc.__file__)
+
+
+def start_tracing(frames=1):
+    """开始跟踪内存分配（已在跟踪时不做任何事）"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def _format_stat(stat):
+    frame = stat.traceback[0]
+    return {
+        'location': f'{frame.filename}:{frame.lineno}',
+        'size_bytes': stat.size,
+        'count': stat.count
+    }
+
+
+def take_snapshot(limit=20):
+    """
+    获取内存快照摘要
+
+    Args:
+        limit (int): 返回的代码位置数
+
+    Returns:
+        dict: 当前/峰值跟踪内存、分配最多的位置、与上一次快照相比增长最多的位置；
+              未开启跟踪时返回None
+    """
+    global _previous_snapshot
+    if not tracemalloc.is_tracing():
+        return None
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES])
+    current, peak = tracemalloc.get_traced_memory()
+    result = {
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'top': [_format_stat(stat) for stat in snapshot.statistics('lineno')[:limit]]
+    }
+
+    with _snapshot_lock:
+        previous, _previous_snapshot = _previous_snapshot, snapshot
+    if previous is not None:
+        result['growth'] = [
+            dict(_format_stat(stat), size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+            for stat in snapshot.compare_to(previous, 'lineno')[:limit]
+            if stat.size_diff > 0
+        ]
+    return result
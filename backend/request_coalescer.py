@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单点映射请求合并
+在一个很短的时间窗口内收集同一映射模型的并发单点请求，
+合并为一次向量化的三角形查找和仿射变换，再把结果分发回各个请求
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 批大小统计的分桶上界
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# 保留的最近排队延迟样本数（用于计算分位数）
+LATENCY_SAMPLES = 10000
+
+
+class _Batch:
+    """一个正在收集中的批次"""
+
+    def __init__(self):
+        self.points = []
+        self.enqueued_at = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PointCoalescer:
+    """
+    单点请求合并器
+
+    第一个到达的请求成为批次的执行者：等待窗口结束或批次达到上限后执行一次批量映射，
+    同一窗口内到达的其他请求只追加坐标并等待结果
+
+    Args:
+        window_ms (float): 收集窗口（毫秒）
+        max_points (int): 单个批次的最大点数，达到后立即执行
+    """
+
+    def __init__(self, window_ms=2.0, max_points=256):
+        self.window = window_ms / 1000.0
+        self.max_points = max_points
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.points = 0
+        self.max_batch_size = 0
+        self._size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def map_point(self, model, point, mode=None, approx_k=None):
+        """
+        映射单个点（与其他并发请求合并执行）
+
+        Returns:
+            tuple: (映射坐标 (2,)，三角形索引)，含义与 MappingModel.map_points 相同
+        """
+        # 模型对象本身作为键的一部分：映射文件更新后的新模型自然进入新的批次
+        key = (id(model), mode, approx_k)
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._pending[key] = batch
+            index = len(batch.points)
+            batch.points.append(point)
+            batch.enqueued_at.append(time.perf_counter())
+            if len(batch.points) >= self.max_points:
+                del self._pending[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+            self._run(model, batch, mode, approx_k)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        mapped, triangle_indices = batch.result
+        return mapped[index], int(triangle_indices[index])
+
+    def _run(self, model, batch, mode, approx_k):
+        started = time.perf_counter()
+        try:
+            points = np.asarray(batch.points, dtype=np.float64).reshape(-1, 2)
+            batch.result = model.map_points(points, mode, approx_k)
+        except Exception as e:
+            batch.error = e
+        finally:
+            self._record(len(batch.points), [started - t for t in batch.enqueued_at])
+            batch.done.set()
+
+    def _record(self, size, waits):
+        bucket = next((i for i, upper in enumerate(BATCH_SIZE_BUCKETS) if size <= upper),
+                      len(BATCH_SIZE_BUCKETS))
+        with self._lock:
+            self.batches += 1
+            self.points += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self._size_counts[bucket] += 1
+            self._latencies.extend(waits)
+
+    def stats(self):
+        """批大小分布和合并带来的额外排队延迟（毫秒）"""
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000
+            labels = [f'<={upper}' for upper in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+            stats = {
+                'window_ms': self.window * 1000,
+                'max_points': self.max_points,
+                'batches': self.batches,
+                'points': self.points,
+                'mean_batch_size': self.points / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'batch_sizes': dict(zip(labels, self._size_counts))
+            }
+        if len(latencies):
+            stats['queue_latency_ms'] = {
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max())
+            }
+        return stats
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按需请求性能分析
+设置环境变量 MAP_PROFILE=1 后，带有请求头 X-Profile: 1 或查询参数 profile=1 的请求
+会在 cProfile 下执行，分析结果（.prof，可用 snakeviz / pstats 查看）和摘要（.json）
+保存到分析目录，文件名包含时间、映射文件名和耗时。
+未启用时不注册任何请求钩子，对请求处理没有额外开销
+"""
+
+import os
+import re
+import io
+import json
+import time
+import pstats
+import logging
+import cProfile
+from datetime import datetime
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# 摘要中保留的函数数（按累计耗时排序）
+SUMMARY_FUNCTIONS = 20
+
+_UNSAFE_CHARS = re.compile(r'[^\w.-]+')
+
+
+def profiling_requested():
+    """当前请求是否要求性能分析"""
+    return request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+
+
+def request_mapping_file():
+    """从请求中取出映射文件名（JSON的jsonFile、表单字段或URL中的文件名）"""
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict) and data.get('jsonFile'):
+        return str(data['jsonFile'])
+    if request.form.get('jsonFile'):
+        return request.form['jsonFile']
+    view_args = request.view_args or {}
+    return str(view_args.get('filename') or view_args.get('mapping') or '')
+
+
+def _summarize(profile):
+    """按累计耗时排序的热点函数摘要"""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({name})',
+            'calls': calls,
+            'total_ms': total * 1000,
+            'cumulative_ms': cumulative * 1000
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:SUMMARY_FUNCTIONS]
+
+
+class RequestProfiler:
+    """
+    请求性能分析器
+
+    Args:
+        profile_dir (str): 分析结果保存目录
+    """
+
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+
+    def install(self, app):
+        """在Flask应用上注册请求钩子"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        logger.info(f"请求性能分析已启用，结果保存到 {self.profile_dir}")
+
+    def _start(self):
+        if not profiling_requested():
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 其他分析器正在运行（例如并发的分析请求），本次请求不做分析
+            logger.warning("已有性能分析在进行，跳过本次请求")
+            return
+        g.profile = profile
+        g.profile_started = time.perf_counter()
+
+    def _finish(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profile.disable()
+        elapsed_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+        try:
+            name = self.save(profile, elapsed_ms, response.status_code)
+            response.headers['X-Profile-File'] = name
+        except Exception as e:
+            logger.error(f"保存性能分析结果失败: {str(e)}")
+        return response
+
+    def save(self, profile, elapsed_ms, status_code):
+        """
+        保存分析结果和摘要
+
+        Returns:
+            str: 分析文件名（不含扩展名）
+        """
+        mapping_file = request_mapping_file()
+        endpoint = request.endpoint or 'unknown'
+        stem = _UNSAFE_CHARS.sub('_', '_'.join(filter(None, [
+            datetime.now().strftime('%Y%m%d-%H%M%S-%f'),
+            endpoint,
+            os.path.splitext(mapping_file)[0],
+            f'{elapsed_ms:.0f}ms'
+        ])))
+        profile.dump_stats(os.path.join(self.profile_dir, stem + '.prof'))
+        summary = {
+            'name': stem,
+            'createdAt': datetime.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'jsonFile': mapping_file,
+            'status': status_code,
+            'duration_ms': elapsed_ms,
+            'functions': _summarize(profile)
+        }
+        with open(os.path.join(self.profile_dir, stem + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        logger.info(f"性能分析已保存: {stem} ({elapsed_ms:.1f} ms)")
+        return stem
+
+    def list_profiles(self, limit=20):
+        """最近的分析结果摘要（不含函数列表），按时间倒序"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        names = sorted((f for f in os.listdir(self.profile_dir) if f.endswith('.json')), reverse=True)
+        profiles = []
+        for filename in names[:limit]:
+            try:
+                with open(os.path.join(self.profile_dir, filename), 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary.pop('functions', None)
+            profiles.append(summary)
+        return profiles
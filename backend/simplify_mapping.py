@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+控制点抽稀命令行工具
+在给定容差（手绘坐标单位）下抽稀映射文件的控制点，输出压缩比、最大误差和查找加速比，
+可选写出只包含保留控制点的简化映射文件
+
+用法:
+    python simplify_mapping.py <映射文件.json> --tolerance 0.001 [-o 简化文件.json]
+
+服务端在编译时抽稀：在映射文件metadata中设置 "simplifyTolerance": 0.001，
+编译后同时保留完整模型和简化模型，坐标映射请求中 "simplified": true 时使用简化模型
+"""
+
+import sys
+import json
+import argparse
+
+from mapping_model import compile_mapping_model, simplify_model
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='在误差容差内抽稀映射文件的控制点')
+    parser.add_argument('mapping', help='映射文件路径（JSON）')
+    parser.add_argument('--tolerance', type=float, required=True, help='被删除控制点处的最大允许误差（手绘坐标单位）')
+    parser.add_argument('-o', '--output', help='写出简化后的映射文件')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    if args.tolerance <= 0:
+        print("❌ 容差需要大于0")
+        sys.exit(1)
+
+    model = compile_mapping_model(args.mapping)
+    print(f"✂️  抽稀控制点: {args.mapping}, 容差 {args.tolerance}")
+    _, report, kept = simplify_model(model, args.tolerance, args.seed)
+    print(f"   控制点: {report['full_points']} -> {report['kept_points']} "
+          f"(压缩比 {report['compression_ratio']:.2f}x)")
+    print(f"   三角形: {report['full_triangles']} -> {report['kept_triangles']}")
+    print(f"   最大误差: {report['max_error']:.6f}")
+    print(f"   查找耗时: {report['full_lookup_us']:.3f} -> {report['simplified_lookup_us']:.3f} us/点 "
+          f"(加速 {report['lookup_speedup']:.2f}x)")
+    print(f"   抽稀耗时: {report['seconds']:.2f} 秒, {report['rounds']} 轮")
+
+    if args.output:
+        with open(args.mapping, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['mappings'] = [m for m, keep in zip(data['mappings'], kept) if keep]
+        metadata = data.setdefault('metadata', {})
+        metadata.pop('simplifyTolerance', None)
+        metadata['totalPoints'] = len(data['mappings'])
+        metadata['simplifiedFrom'] = {'points': report['full_points'], 'tolerance': args.tolerance,
+                                      'maxError': report['max_error']}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"✅ 简化映射文件已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+薄板样条(TPS)平滑变换
+作为分段仿射变换的替代：在三角形边界处没有折痕，且在凸包外也能给出结果
+系数在编译时一次性求解并随模型缓存，映射时分块批量计算以限制内存
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 控制点超过该数量时只取部分点作为样条中心，用最小二乘拟合所有控制点
+MAX_CENTERS = 2000
+
+# 分块计算时每块的查询点数量，内存约为 CHUNK_SIZE x 中心数 x 8 字节
+CHUNK_SIZE = 2048
+
+# 近似计算允许的最大邻域中心数：局部样条方程组为 (中心数, k+3, k+3)，内存随k平方增长
+APPROX_MAX_K = 64
+
+# 每个模型最多缓存的局部样条（不同k值）数量，超出时淘汰最久未使用的
+LOCAL_SPLINE_CACHE_SIZE = 4
+
+_local_lock = threading.Lock()
+
+
+def _tps_kernel_sq(d2):
+    """薄板样条径向基函数 φ(r) = r² log r，以距离平方 d² 为输入：φ = d² log(d²) / 2"""
+    d2 = np.maximum(d2, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 0.5 * d2 * np.log(d2)
+    values[d2 == 0] = 0.0
+    return values
+
+
+def _squared_distances(points, centers):
+    """使用矩阵乘法计算两组点之间的距离平方 (n, m)"""
+    return (
+        np.einsum('ij,ij->i', points, points)[:, None]
+        + np.einsum('ij,ij->i', centers, centers)[None, :]
+        - 2.0 * points @ centers.T
+    )
+
+
+def _solve_tps_systems(points, values, smoothing=0.0):
+    """
+    批量求解薄板样条插值方程组
+
+    Args:
+        points (numpy.ndarray): 控制点 (..., n, 2)
+        values (numpy.ndarray): 目标值 (..., n, 2)
+
+    Returns:
+        tuple: (径向基系数 (..., n, 2), 仿射系数 (..., 3, 2))
+    """
+    n = points.shape[-2]
+    batch = points.shape[:-2]
+    diff = points[..., :, None, :] - points[..., None, :, :]
+    K = _tps_kernel_sq(np.einsum('...ijk,...ijk->...ij', diff, diff))
+    K[..., np.arange(n), np.arange(n)] += smoothing
+    P = np.concatenate([np.ones(batch + (n, 1)), points], axis=-1)
+    A = np.zeros(batch + (n + 3, n + 3), dtype=np.float64)
+    A[..., :n, :n] = K
+    A[..., :n, n:] = P
+    A[..., n:, :n] = np.swapaxes(P, -1, -2)
+    b = np.zeros(batch + (n + 3, 2), dtype=np.float64)
+    b[..., :n, :] = values
+    solution = np.linalg.solve(A, b)
+    return solution[..., :n, :], solution[..., n:, :]
+
+
+class ThinPlateSpline:
+    """
+    二维薄板样条变换 src -> dst
+
+    Attributes:
+        centers (numpy.ndarray): 归一化后的样条中心 (m, 2)
+        weights (numpy.ndarray): 径向基系数 (m, 2)
+        affine (numpy.ndarray): 仿射部分系数 (3, 2)，对应 [1, x, y]
+        max_fit_error (float): 拟合后在控制点处的最大误差（目标坐标单位）
+    """
+
+    def __init__(self, src, dst, smoothing=0.0, max_centers=MAX_CENTERS):
+        src = np.asarray(src, dtype=np.float64)
+        dst = np.asarray(dst, dtype=np.float64)
+        if len(src) < 3:
+            raise ValueError("薄板样条至少需要3个控制点")
+
+        # 归一化到单位尺度，避免经纬度差值过小导致的病态矩阵
+        self.offset = src.mean(axis=0)
+        self.scale = float(np.abs(src - self.offset).max()) or 1.0
+        points = (src - self.offset) / self.scale
+
+        if len(points) <= max_centers:
+            self.centers = points
+            self._solve_exact(points, dst, smoothing)
+        else:
+            # 控制点过多时均匀抽取部分点作为中心，对全部控制点做最小二乘拟合
+            index = np.linspace(0, len(points) - 1, max_centers).astype(np.int64)
+            self.centers = points[index]
+            self._solve_least_squares(points, dst, smoothing)
+
+        self._tree = None
+        self._local = OrderedDict()
+        self.max_fit_error = float(np.abs(self.evaluate(src) - dst).max())
+
+    def _solve_exact(self, points, dst, smoothing):
+        self.weights, self.affine = _solve_tps_systems(points, dst, smoothing)
+
+    def _solve_least_squares(self, points, dst, smoothing):
+        # 分块累加法方程，内存只与中心数有关，与控制点数量无关
+        m = len(self.centers)
+        gram = np.zeros((m + 3, m + 3), dtype=np.float64)
+        rhs = np.zeros((m + 3, 2), dtype=np.float64)
+        for start in range(0, len(points), CHUNK_SIZE):
+            chunk = points[start:start + CHUNK_SIZE]
+            A = np.column_stack([
+                _tps_kernel_sq(_squared_distances(chunk, self.centers)),
+                np.ones(len(chunk)),
+                chunk
+            ])
+            gram += A.T @ A
+            rhs += A.T @ dst[start:start + CHUNK_SIZE]
+        gram[np.arange(m), np.arange(m)] += smoothing
+        solution = np.linalg.lstsq(gram, rhs, rcond=None)[0]
+        self.weights = solution[:m]
+        self.affine = solution[m:]
+
+    def _local_splines(self, k):
+        """
+        近似计算用的局部样条：每个中心与其最近的k个中心拟合一个小样条
+        系数只在首次使用该k值时批量求解一次，之后随模型缓存（最多 LOCAL_SPLINE_CACHE_SIZE 个k值，LRU淘汰）
+        """
+        with _local_lock:
+            if k in self._local:
+                self._local.move_to_end(k)
+                return self._local[k]
+            from scipy.spatial import cKDTree
+            if self._tree is None:
+                self._tree = cKDTree(self.centers)
+            _, neighbors = self._tree.query(self.centers, k=k)
+            # 局部样条拟合全局样条在邻居处的值，使近似结果与全局结果一致
+            targets = self._evaluate_exact(self.centers)[neighbors]
+            weights, affine = _solve_tps_systems(self.centers[neighbors], targets)
+            self._local[k] = (neighbors, weights, affine)
+            while len(self._local) > LOCAL_SPLINE_CACHE_SIZE:
+                self._local.popitem(last=False)
+            return self._local[k]
+
+    def _evaluate_exact(self, chunk):
+        radial = _tps_kernel_sq(_squared_distances(chunk, self.centers)) @ self.weights
+        return radial + self.affine[0] + chunk @ self.affine[1:]
+
+    def _evaluate_local(self, chunk, k):
+        neighbors, weights, affine = self._local_splines(k)
+        _, nearest = self._tree.query(chunk, k=1)
+        local_points = self.centers[neighbors[nearest]]
+        diff = chunk[:, None, :] - local_points
+        radial = np.einsum('nk,nkj->nj', _tps_kernel_sq(np.einsum('nkj,nkj->nk', diff, diff)),
+                           weights[nearest])
+        local_affine = affine[nearest]
+        return radial + local_affine[:, 0] + np.einsum('nj,njk->nk', chunk, local_affine[:, 1:])
+
+    @property
+    def centers_count(self):
+        return int(len(self.centers))
+
+    @property
+    def nbytes(self):
+        """样条系数、局部样条缓存和近邻索引数组占用的内存（字节）"""
+        total = self.centers.nbytes + self.weights.nbytes + self.affine.nbytes
+        for arrays in self._local.values():
+            total += sum(array.nbytes for array in arrays)
+        if self._tree is not None:
+            total += self._tree.data.nbytes + self._tree.indices.nbytes
+        return int(total)
+
+    def evaluate(self, points, chunk_size=CHUNK_SIZE, k=None):
+        """
+        分块批量计算变换结果
+
+        Args:
+            points (array-like): 源坐标 (n, 2)
+            chunk_size (int): 每块的点数
+            k (int): 近似计算时使用最近中心处预先求解的k邻域局部样条，None表示使用全部中心；
+                     超过 APPROX_MAX_K 时按 APPROX_MAX_K 计算，不小于中心数时精确计算
+
+        Returns:
+            numpy.ndarray: 目标坐标 (n, 2)
+        """
+        points = (np.asarray(points, dtype=np.float64).reshape(-1, 2) - self.offset) / self.scale
+        result = np.empty((len(points), 2), dtype=np.float64)
+        if k is not None:
+            k = min(int(k), APPROX_MAX_K)
+        use_local = k is not None and 3 <= k < len(self.centers)
+
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            if use_local:
+                result[start:start + chunk_size] = self._evaluate_local(chunk, k)
+            else:
+                result[start:start + chunk_size] = self._evaluate_exact(chunk)
+        return result
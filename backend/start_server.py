@@ -10,7 +10,7 @@ Flask服务启动脚本
 import os
 import sys
 import json
-from app import app, STORAGE_DIR
+from app import app, STORAGE_DIR, start_warmup
 
 def check_dependencies():
     """检查必要的依赖和文件"""
@@ -54,14 +54,47 @@ def show_api_endpoints():
     print("\n🌐 API端点列表:")
     print("  坐标映射相关:")
     print("    POST /api/coordinate     - 坐标映射 (需要提供jsonFile参数)")
-    print("    GET  /api/health         - 健康检查")
+    print("    POST /api/coordinate/batch - 批量坐标映射 (需要提供jsonFile参数)")
+    print("    POST /api/coordinate/trajectory - 轨迹映射 (需要提供jsonFile参数)")
+    print("    GET  /api/map-index      - 地图范围索引 (坐标接口未指定jsonFile时自动选择地图)")
+    print("    POST /api/geojson        - GeoJSON要素映射 (需要提供jsonFile参数)")
+    print("    WS   /api/stream         - 实时位置跟踪流 (WebSocket)")
+    print("    POST /api/upload-image   - 上传映射文件对应的手绘地图图像")
+    print("    GET  /api/warped-image/<filename> - 变形到经纬度空间的手绘地图")
+    print("    GET  /tiles/<filename>/<z>/<x>/<y>.png - 手绘地图XYZ瓦片")
+    print("    GET  /api/health         - 健康检查 (ready字段表示模型预热是否完成)")
+    print("    GET  /api/memory         - 模型内存占用 (snapshot=1 附带tracemalloc快照)")
     print("    POST /api/mapping-info   - 映射信息 (需要提供jsonFile参数)")
+    print("    POST /api/viewport       - 视口内的三角形和控制点 (需要提供jsonFile和bbox参数)")
+    print("    POST /api/landmarks      - 最近控制点查询 (需要提供jsonFile和points参数)")
     print("    GET  /api/mapping-files  - 获取可用映射文件列表")
     print("  文件管理相关:")
     print("    POST /api/save-json      - 保存JSON文件")
     print("    GET  /api/saved-files    - 获取文件列表")
     print("    GET  /api/download/<filename> - 下载文件")
     print("    DELETE /api/delete/<filename> - 删除文件")
+    print("    GET  /api/profiles       - 最近的请求性能分析结果 (MAP_PROFILE=1)")
+
+def run_warmup():
+    """
+    启动映射模型预热：在后台使用进程池并行编译所有映射文件
+    设置环境变量 MAP_WARMUP=0 可关闭预热，MAP_WARMUP_WORKERS 指定进程数
+    """
+    if os.environ.get('MAP_WARMUP', '1') == '0':
+        print("⏭️  已跳过映射模型预热 (MAP_WARMUP=0)")
+        return None
+    
+    workers = os.environ.get('MAP_WARMUP_WORKERS')
+    max_workers = int(workers) if workers else None
+    
+    def report(filename, seconds, error):
+        if error:
+            print(f"   ❌ {filename}: 编译失败 ({error})")
+        else:
+            print(f"   ⚡ {filename}: {seconds * 1000:.1f} ms")
+    
+    print("🔥 后台预热映射模型 (预热完成前 /api/health 中 ready 为 false)...")
+    return start_warmup(max_workers=max_workers, on_compiled=report)
 
 def main():
     """主函数"""
@@ -76,6 +109,10 @@ def main():
     # 显示API端点
     show_api_endpoints()
     
+    # 预热映射模型
+    print()
+    run_warmup()
+    
     print("\n" + "=" * 50)
     print("🎉 服务器即将启动...")
     print("📍 访问地址: http://localhost:5000")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+合成映射数据生成
+用于测试脚本和性能基准，生成与标记点工具保存格式一致的映射文件
+"""
+
+import json
+
+import numpy as np
+
+# 深大校园附近的经纬度范围 (min_lng, min_lat, max_lng, max_lat)
+DEFAULT_BOUNDS = (113.930, 22.528, 113.942, 22.538)
+
+
+def make_sample_mapping(n_points=60, seed=0, bounds=DEFAULT_BOUNDS):
+    """
+    生成随机样本映射数据
+
+    Args:
+        n_points (int): 控制点数量
+        seed (int): 随机种子
+        bounds (tuple): 经纬度范围 (min_lng, min_lat, max_lng, max_lat)
+
+    Returns:
+        dict: 包含metadata和mappings的映射数据
+    """
+    rng = np.random.default_rng(seed)
+    min_lng, min_lat, max_lng, max_lat = bounds
+    width, height = max_lng - min_lng, max_lat - min_lat
+    lng = min_lng + rng.random(n_points) * width
+    lat = min_lat + rng.random(n_points) * height
+    # 手绘坐标为经纬度的轻微非线性函数，归一化到0-1
+    u, v = (lng - min_lng) / width, (lat - min_lat) / height
+    x = u + 0.03 * np.sin(v * 6)
+    y = 1 - v + 0.03 * np.cos(u * 6)
+    return {
+        'metadata': {
+            'description': '合成测试数据',
+            'totalPoints': n_points
+        },
+        'mappings': [
+            {
+                '腾讯地图坐标': {'经度': float(lng[i]), '纬度': float(lat[i])},
+                '手绘地图坐标': {'x': float(x[i]), 'y': float(y[i])}
+            }
+            for i in range(n_points)
+        ]
+    }
+
+
+def write_sample_mapping(file_path, n_points=60, seed=0, bounds=DEFAULT_BOUNDS):
+    """生成随机样本映射数据并写入文件"""
+    data = make_sample_mapping(n_points, seed, bounds)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return data
+
+
+def sample_points_in_bounds(n_points, seed=0, bounds=DEFAULT_BOUNDS, margin=0.1):
+    """在范围内部生成随机查询点 (n, 2)，margin为向内收缩的比例"""
+    rng = np.random.default_rng(seed)
+    min_lng, min_lat, max_lng, max_lat = bounds
+    width, height = max_lng - min_lng, max_lat - min_lat
+    lng = min_lng + width * (margin + rng.random(n_points) * (1 - 2 * margin))
+    lat = min_lat + height * (margin + rng.random(n_points) * (1 - 2 * margin))
+    return np.column_stack([lng, lat])
+
+
+def walking_trace(n_points, seed=0, bounds=DEFAULT_BOUNDS, step_m=1.4, margin=0.1):
+    """
+    生成步行GPS轨迹 (n, 2)：每秒约step_m米，方向缓慢变化，碰到范围边缘时折返
+
+    Args:
+        n_points (int): 轨迹点数
+        step_m (float): 相邻两点的距离（米）
+    """
+    rng = np.random.default_rng(seed)
+    min_lng, min_lat, max_lng, max_lat = bounds
+    width, height = max_lng - min_lng, max_lat - min_lat
+    low = np.array([min_lng + width * margin, min_lat + height * margin])
+    high = np.array([max_lng - width * margin, max_lat - height * margin])
+    meters_per_degree = np.array([111320.0 * np.cos(np.radians((min_lat + max_lat) / 2)), 111320.0])
+
+    position = low + rng.random(2) * (high - low)
+    heading = rng.random() * 2 * np.pi
+    trace = np.empty((n_points, 2))
+    for i in range(n_points):
+        trace[i] = position
+        heading += rng.normal(0, 0.2)
+        step = step_m * np.array([np.cos(heading), np.sin(heading)]) / meters_per_degree
+        position = position + step + rng.normal(0, 0.3, 2) / meters_per_degree
+        # 碰到边缘时反向
+        outside = (position < low) | (position > high)
+        if np.any(outside):
+            position = np.clip(position, low, high)
+            heading += np.pi
+    return trace
@@ -0,0 +1,1413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+映射模型测试脚本
+测试模型编译、缓存失效和启动预热，无需启动服务器
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import app as app_module
+from mapping_model import ModelCache, compile_mapping_model, warmup_models
+from synthetic_data import write_sample_mapping, sample_points_in_bounds
+from utils import (
+    get_coordinate_data,
+    triangulate_coords,
+    generate_triangle_lists,
+    calculate_all_affine_matrices,
+    find_triangle_containing_point
+)
+
+
+def test_model_matches_original_pipeline():
+    """测试编译模型的批量映射结果与逐点计算一致"""
+    print("🧮 测试模型映射结果...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path)
+        model = compile_mapping_model(path)
+
+        coords, xy = get_coordinate_data(path)
+        triangulation = triangulate_coords(coords)
+        coords_triangles, xy_triangles = generate_triangle_lists(coords, xy, triangulation)
+        matrices = calculate_all_affine_matrices(coords_triangles, xy_triangles)
+
+        points = np.array(coords) * 0.999 + np.mean(coords, axis=0) * 0.001
+        mapped, triangle_indices = model.transform(points)
+        for point, result, index in zip(points, mapped, triangle_indices):
+            expected_index = find_triangle_containing_point(point[0], point[1], triangulation)
+            assert index == expected_index
+            if index >= 0:
+                expected = matrices[index] @ np.array([point[0], point[1], 1.0])
+                assert np.allclose(result, expected[:2])
+            else:
+                assert list(result) == [-1, -1]
+        print("✅ 批量映射与逐点计算一致")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_cache_invalidation():
+    """测试文件修改后缓存自动重新编译"""
+    print("\n🗃️  测试模型缓存...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=30)
+        cache = ModelCache()
+        first = cache.get(path)
+        assert cache.get(path) is first
+
+        write_sample_mapping(path, n_points=40, seed=1)
+        second = cache.get(path)
+        assert second is not first
+        assert len(second.coords) == 40
+
+        assert cache.invalidate(path)
+        assert cache.get(path) is not second
+        print(f"✅ 缓存统计: {cache.stats()}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_warmup_and_health():
+    """测试并行预热填充缓存，并在完成后报告ready"""
+    print("\n🔥 测试启动预热...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for i in range(3):
+            write_sample_mapping(os.path.join(tmp_dir, f'map_{i}.json'), seed=i)
+
+        cache = ModelCache()
+        report = warmup_models(tmp_dir, cache, max_workers=2)
+        assert sorted(report) == ['map_0.json', 'map_1.json', 'map_2.json']
+        assert cache.stats()['models'] == 3
+        for filename, info in report.items():
+            print(f"   ⚡ {filename}: {info['seconds'] * 1000:.1f} ms")
+
+        original_dir, original_cache = app_module.STORAGE_DIR, app_module.model_cache
+        app_module.STORAGE_DIR, app_module.model_cache = tmp_dir, cache
+        try:
+            app_module.start_warmup(max_workers=2, background=False)
+            health = app_module.app.test_client().get('/api/health').get_json()
+            assert health['ready'] is True
+            assert len(health['warmup']['files']) == 3
+        finally:
+            app_module.STORAGE_DIR, app_module.model_cache = original_dir, original_cache
+        print("✅ 预热完成，健康检查ready为true")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_smooth_warp_mode():
+    """测试薄板样条模式：经过控制点、分块结果一致、近似计算误差较小"""
+    print("\n🌊 测试薄板样条平滑变换...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=300)
+        model = compile_mapping_model(path)
+        spline = model.smooth_warp()
+        assert model.smooth_warp() is spline
+
+        mapped, _ = model.map_points(model.coords, mode='tps')
+        assert np.allclose(mapped, model.xy, atol=1e-8)
+
+        points = sample_points_in_bounds(5000, seed=1)
+        exact = spline.evaluate(points)
+        assert np.allclose(spline.evaluate(points, chunk_size=97), exact)
+        approx = spline.evaluate(points, k=32)
+        error = float(np.abs(approx - exact).max())
+        assert error < 5e-3
+
+        # k超过上限时按上限计算，局部样条缓存的k值数有上限
+        from smooth_warp import APPROX_MAX_K, LOCAL_SPLINE_CACHE_SIZE
+        assert np.array_equal(spline.evaluate(points[:100], k=2000), spline.evaluate(points[:100], k=APPROX_MAX_K))
+        for k in range(3, 3 + 2 * LOCAL_SPLINE_CACHE_SIZE):
+            spline.evaluate(points[:10], k=k)
+        assert list(spline._local) == list(range(3 + LOCAL_SPLINE_CACHE_SIZE, 3 + 2 * LOCAL_SPLINE_CACHE_SIZE))
+
+        client = app_module.app.test_client()
+        original_dir = app_module.STORAGE_DIR
+        app_module.STORAGE_DIR = tmp_dir
+        try:
+            request = {'jsonFile': 'sample.json', 'coordinates': points[:10].tolist(), 'mode': 'tps'}
+            assert client.post('/api/coordinate/batch', json={**request, 'approxK': APPROX_MAX_K}).status_code == 200
+            assert client.post('/api/coordinate/batch', json={**request, 'approxK': 2000}).status_code == 400
+        finally:
+            app_module.STORAGE_DIR = original_dir
+            app_module.model_cache.invalidate(path)
+        print(f"✅ 薄板样条拟合误差 {spline.max_fit_error:.2e}, k=32近似最大误差 {error:.2e}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_geojson_mapping():
+    """测试GeoJSON映射：加密后的折线与逐点映射的真实形状一致"""
+    print("\n🛣️  测试GeoJSON要素映射...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=300)
+        model = compile_mapping_model(path)
+        line = [[113.933, 22.530], [113.937, 22.535], [113.940, 22.531]]
+        feature_collection = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'properties': {'name': '测试道路'},
+             'geometry': {'type': 'LineString', 'coordinates': line}},
+            {'type': 'Feature', 'properties': {}, 'geometry': None}
+        ]}
+
+        client = app_module.app.test_client()
+        original_dir = app_module.STORAGE_DIR
+        app_module.STORAGE_DIR = tmp_dir
+        try:
+            result = client.post('/api/geojson', json={
+                'jsonFile': 'sample.json', 'geojson': feature_collection
+            }).get_json()
+        finally:
+            app_module.STORAGE_DIR = original_dir
+
+        assert result['success']
+        assert result['stats']['inserted_vertices'] > 0
+        features = result['geojson']['features']
+        assert features[0]['properties'] == {'name': '测试道路'}
+        assert features[1]['geometry'] is None
+        polyline = np.array(features[0]['geometry']['coordinates'])
+
+        # 沿原折线密集采样并逐点映射，所有结果都应落在映射后的折线上
+        line = np.array(line)
+        samples = np.concatenate([a + np.linspace(0, 1, 500)[:, None] * (b - a)
+                                  for a, b in zip(line[:-1], line[1:])])
+        mapped, _ = model.transform(samples)
+        distances = np.full(len(mapped), np.inf)
+        for a, b in zip(polyline[:-1], polyline[1:]):
+            t = np.clip((mapped - a) @ (b - a) / max((b - a) @ (b - a), 1e-30), 0, 1)
+            distances = np.minimum(distances, np.linalg.norm(mapped - (a + t[:, None] * (b - a)), axis=1))
+        assert distances.max() < 1e-9
+        print(f"✅ 插入 {result['stats']['inserted_vertices']} 个顶点, 形状偏差 {distances.max():.1e}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_image_warp():
+    """测试分块变形的图像与逐像素映射采样结果一致"""
+    print("\n🖼️  测试手绘地图图像变形...")
+    from image_warp import warp_image, sample_bilinear, default_bounds
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=200)
+        model = compile_mapping_model(path)
+        image = np.zeros((300, 400, 4), dtype=np.uint8)
+        image[..., 0] = np.linspace(0, 255, 400)[None, :]
+        image[..., 1] = np.linspace(0, 255, 300)[:, None]
+        image[..., 3] = 255
+
+        warped, bounds = warp_image(model, image, width=300, tile_size=64, max_workers=4)
+        assert bounds == default_bounds(model)
+        height, width = warped.shape[:2]
+
+        rows, cols = np.mgrid[0:height:7, 0:width:7]
+        lng = bounds[0] + (cols + 0.5) * (bounds[2] - bounds[0]) / width
+        lat = bounds[3] - (rows + 0.5) * (bounds[3] - bounds[1]) / height
+        mapped, simplices = model.transform(np.column_stack([lng.ravel(), lat.ravel()]))
+        expected = sample_bilinear(image, mapped[:, 0], mapped[:, 1])
+        expected[simplices < 0] = 0
+        assert np.array_equal(warped[rows, cols].reshape(-1, 4), expected)
+        print(f"✅ 变形图像 {width}x{height}, 覆盖率 {(warped[..., 3] > 0).mean():.1%}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_tile_cache():
+    """测试瓦片按需渲染、磁盘缓存命中，以及覆盖映射文件后清理旧瓦片"""
+    print("\n🧱 测试瓦片缓存...")
+    import io
+    from PIL import Image
+    from image_warp import default_bounds
+    from tile_server import TileCache, tiles_in_bounds
+    from synthetic_data import make_sample_mapping
+    tmp_dir = tempfile.mkdtemp()
+    original = (app_module.STORAGE_DIR, app_module.IMAGE_DIR, app_module.tile_cache)
+    try:
+        app_module.STORAGE_DIR = tmp_dir
+        app_module.IMAGE_DIR = os.path.join(tmp_dir, 'images')
+        app_module.tile_cache = TileCache(os.path.join(tmp_dir, 'tile-cache'))
+        write_sample_mapping(os.path.join(tmp_dir, 'sample.json'), n_points=200)
+        buffer = io.BytesIO()
+        Image.fromarray(np.full((100, 100, 3), 200, dtype=np.uint8)).save(buffer, 'PNG')
+        buffer.seek(0)
+
+        client = app_module.app.test_client()
+        client.post('/api/upload-image', data={'jsonFile': 'sample.json', 'image': (buffer, 'map.png')},
+                    content_type='multipart/form-data')
+        model = compile_mapping_model(os.path.join(tmp_dir, 'sample.json'))
+        x, y = next(tiles_in_bounds(default_bounds(model), 16))
+
+        first = client.get(f'/tiles/sample.json/16/{x}/{y}.png')
+        second = client.get(f'/tiles/sample.json/16/{x}/{y}.png')
+        assert first.headers['X-Tile-Cache'] == 'MISS'
+        assert second.headers['X-Tile-Cache'] == 'HIT'
+        assert first.data == second.data
+        first.close()
+        second.close()
+
+        client.post('/api/save-json', json={'filename': 'sample.json',
+                                            'data': make_sample_mapping(100, seed=5)})
+        assert not os.path.exists(os.path.join(tmp_dir, 'tile-cache', model.content_hash[:16]))
+        print("✅ 瓦片缓存命中，覆盖映射文件后旧瓦片已清理")
+    finally:
+        app_module.STORAGE_DIR, app_module.IMAGE_DIR, app_module.tile_cache = original
+        shutil.rmtree(tmp_dir)
+
+
+def test_tracking_stream():
+    """测试跟踪流：订阅、逐条位置映射、提示三角形命中和错误消息"""
+    print("\n📡 测试位置跟踪流...")
+    import json
+    from tracking_stream import TrackingStream
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=200)
+        cache = ModelCache()
+        stream = TrackingStream(lambda name: cache.get(os.path.join(tmp_dir, name))
+                                if os.path.exists(os.path.join(tmp_dir, name)) else None)
+
+        assert stream.handle({'type': 'position', 'coordinates': [0, 0]})['type'] == 'error'
+        assert stream.handle({'type': 'subscribe', 'jsonFile': 'missing.json'})['type'] == 'error'
+        reply = json.loads(stream.handle_text(json.dumps({'type': 'subscribe', 'jsonFile': 'sample.json'})))
+        assert reply['type'] == 'subscribed' and reply['mode'] == 'affine'
+
+        # 沿一条短路径连续移动，结果与批量映射一致
+        model = cache.get(path)
+        center = model.coords.mean(axis=0)
+        track = center + np.linspace(0, 1, 50)[:, None] * np.array([2e-4, 1e-4])
+        expected, expected_indices = model.transform(track)
+        for i, point in enumerate(track):
+            reply = stream.handle({'type': 'position', 'id': i, 'coordinates': point.tolist()})
+            assert reply['id'] == i and reply['success']
+            assert reply['triangle_index'] == expected_indices[i]
+            assert np.allclose(reply['mapped_coordinates'], expected[i])
+        assert stream.walked_points == len(track) and stream.adjacent_points > 0
+
+        reply = stream.handle({'type': 'positions', 'coordinates': track.tolist()})
+        assert np.allclose(reply['mapped_coordinates'], expected)
+        assert json.loads(stream.handle_text('not json'))['type'] == 'error'
+        assert stream.handle({'type': 'position', 'coordinates': [1, 2, 3]})['type'] == 'error'
+        print(f"✅ 跟踪流映射正确，{stream.positions} 个位置中 {stream.adjacent_points} 个落在前一个位置的相邻三角形内")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_request_coalescer():
+    """测试并发单点请求合并后的结果与逐点映射一致，并记录批大小"""
+    print("\n🧺 测试单点请求合并...")
+    from concurrent.futures import ThreadPoolExecutor
+    from request_coalescer import PointCoalescer
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=200)
+        model = compile_mapping_model(path)
+        points = sample_points_in_bounds(200, seed=3)
+        expected, expected_indices = model.transform(points)
+
+        coalescer = PointCoalescer(window_ms=20, max_points=64)
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(lambda p: coalescer.map_point(model, p), points.tolist()))
+        for (mapped, index), exp, exp_index in zip(results, expected, expected_indices):
+            assert index == exp_index
+            assert np.allclose(mapped, exp)
+
+        stats = coalescer.stats()
+        assert stats['points'] == len(points)
+        assert stats['batches'] < len(points) and stats['max_batch_size'] <= 64
+        assert stats['queue_latency_ms']['max'] >= 0
+        print(f"✅ {stats['points']} 个请求合并为 {stats['batches']} 批, "
+              f"平均批大小 {stats['mean_batch_size']:.1f}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_trajectory_lookup():
+    """测试轨迹提示查找与find_simplex结果一致，以及轨迹映射接口的分段提示"""
+    print("\n🚶 测试轨迹查找...")
+    from synthetic_data import walking_trace
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=500)
+        model = compile_mapping_model(path)
+        trace = walking_trace(300, seed=2)
+        expected = model.locate(trace)
+
+        # 短轨迹逐点行走，长轨迹批量查找，结果都与find_simplex一致
+        short, short_stats = model.locate_trajectory(trace[:50])
+        full, full_stats = model.locate_trajectory(trace)
+        assert np.array_equal(short, expected[:50]) and np.array_equal(full, expected)
+        assert short_stats['walked_points'] == 50 and full_stats['walked_points'] == 1
+        assert short_stats['adjacent_points'] >= 40 and full_stats['adjacent_points'] >= 250
+
+        # 相邻点数与逐点行走时的提示命中数一致，与走哪条路径无关
+        last, hits = -1, 0
+        for point in trace:
+            index, hit = model.locate_next(point, last)
+            hits += hit
+            last = index if index >= 0 else last
+        assert full_stats['adjacent_points'] == hits
+
+        app_module.STORAGE_DIR = tmp_dir
+        client = app_module.app.test_client()
+        first = client.post('/api/coordinate/trajectory',
+                            json={'jsonFile': 'sample.json', 'coordinates': trace[:20].tolist()}).get_json()
+        second = client.post('/api/coordinate/trajectory',
+                             json={'jsonFile': 'sample.json', 'coordinates': trace[20:40].tolist(),
+                                   'hint': first['last_triangle']}).get_json()
+        assert first['success'] and second['adjacent_points'] >= first['adjacent_points']
+        assert first['walked_points'] == 20
+        mapped, _ = model.transform(trace[20:40])
+        assert np.allclose(second['mapped_coordinates'], mapped)
+        assert client.post('/api/coordinate/trajectory',
+                           json={'jsonFile': 'sample.json', 'coordinates': [[1, 2]],
+                                 'hint': 'x'}).status_code == 400
+        print(f"✅ 轨迹查找与find_simplex一致，{full_stats['adjacent_points']}/{len(trace)} 个点落在前一个点的相邻三角形内")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_request_profiler():
+    """测试按需性能分析：未启用时不注册钩子，启用后按请求头保存分析结果并可列出"""
+    print("\n⏱️  测试请求性能分析...")
+    from flask import Flask, jsonify
+    from request_profiler import RequestProfiler
+    tmp_dir = tempfile.mkdtemp()
+    original = (app_module.profiler, app_module.PROFILE_DIR)
+    try:
+        if os.environ.get('MAP_PROFILE') != '1':
+            assert not app_module.app.before_request_funcs
+            assert app_module.app.test_client().get('/api/profiles').status_code == 404
+
+        profile_dir = os.path.join(tmp_dir, 'profiles')
+        profiler = RequestProfiler(profile_dir)
+        mini = Flask('profiled')
+        profiler.install(mini)
+
+        @mini.route('/work', methods=['POST'])
+        def work():
+            return jsonify({'total': float(np.linalg.norm(np.random.rand(200, 200)))})
+
+        client = mini.test_client()
+        assert 'X-Profile-File' not in client.post('/work', json={'jsonFile': 'a.json'}).headers
+        response = client.post('/work?profile=1', json={'jsonFile': 'campus.json'})
+        name = response.headers['X-Profile-File']
+        assert 'campus' in name and os.path.exists(os.path.join(profile_dir, name + '.prof'))
+
+        app_module.profiler, app_module.PROFILE_DIR = profiler, profile_dir
+        listing = app_module.app.test_client().get('/api/profiles').get_json()
+        assert listing['success'] and listing['profiles'][0]['jsonFile'] == 'campus.json'
+        detail = app_module.app.test_client().get(f'/api/profiles/{name}').get_json()
+        assert detail['profile']['functions']
+        print(f"✅ 分析结果已保存: {name}")
+    finally:
+        app_module.profiler, app_module.PROFILE_DIR = original
+        shutil.rmtree(tmp_dir)
+
+
+def test_memory_budget():
+    """测试模型内存统计和超出预算时按LRU淘汰"""
+    print("\n🧠 测试模型内存预算...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(tmp_dir, f'map{i}.json') for i in range(3)]
+        for i, path in enumerate(paths):
+            write_sample_mapping(path, n_points=300, seed=i)
+
+        model = compile_mapping_model(paths[0])
+        usage = model.memory_usage()
+        assert usage['arrays'] == model.coords.nbytes + model.xy.nbytes + model.affine_matrices.nbytes
+        assert usage['delaunay'] >= model.triangulation.simplices.nbytes
+        assert usage['indexes'] == model.viewport_index().nbytes + model.landmark_index().nbytes
+        model.locate_trajectory(model.coords[:5])
+        model.smooth_warp()
+        grown = model.memory_usage()
+        assert grown['indexes'] > usage['indexes'] and grown['caches'] > 0
+        assert grown['total'] == sum(v for k, v in grown.items() if k != 'total')
+
+        # 预算约为两个模型的大小：放入第三个模型时淘汰最久未使用的第二个
+        cache = ModelCache(max_bytes=int(usage['total'] * 2.5))
+        cache.get(paths[0])
+        cache.get(paths[1])
+        cache.get(paths[0])
+        cache.get(paths[2])
+        report = cache.memory_report()
+        assert [m['file'] for m in report['models']] == ['map2.json', 'map0.json']
+        assert report['evictions'] == 1 and report['total_bytes'] <= report['budget_bytes']
+
+        from memory_tracing import start_tracing, take_snapshot
+        import tracemalloc
+        start_tracing()
+        try:
+            take_snapshot()
+            cache.invalidate(paths[0])
+            cache.get(paths[0])
+            snapshot = take_snapshot(limit=5)
+            assert snapshot['top'] and 'growth' in snapshot
+        finally:
+            tracemalloc.stop()
+        print(f"✅ 模型内存 {usage['total']} 字节，超出预算时淘汰了 1 个模型")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_input_crs():
+    """测试坐标系转换的参考值，以及接口和离线工具按inputCrs转换后再映射"""
+    print("\n🌐 测试输入坐标系转换...")
+    import csv
+    import io
+    from coord_transform import wgs84_to_gcj02, gcj02_to_wgs84, gcj02_to_bd09, bd09_to_gcj02
+    from map_cli import map_csv
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        gcj = wgs84_to_gcj02([[116.404, 39.915], [0.0, 0.0]])
+        assert np.allclose(gcj[0], [116.41024449916938, 39.91640428150164], atol=1e-9)
+        assert np.array_equal(gcj[1], [0.0, 0.0])
+        assert np.allclose(gcj02_to_wgs84(gcj), [[116.404, 39.915], [0.0, 0.0]], atol=1e-9)
+        assert np.allclose(gcj02_to_bd09([[128.543, 37.065]]), [[128.54944656, 37.07113428]], atol=1e-7)
+
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=200)
+        model = compile_mapping_model(path)
+        gcj_points = sample_points_in_bounds(20, seed=4)
+        wgs_points = gcj02_to_wgs84(gcj_points)
+        expected, _ = model.transform(gcj_points)
+
+        app_module.STORAGE_DIR = tmp_dir
+        client = app_module.app.test_client()
+        batch = client.post('/api/coordinate/batch', json={
+            'jsonFile': 'sample.json', 'coordinates': wgs_points.tolist(), 'inputCrs': 'wgs84'}).get_json()
+        assert batch['inputCrs'] == 'wgs84'
+        assert np.allclose(batch['mapped_coordinates'], expected, atol=1e-7)
+        single = client.post('/api/coordinate', json={
+            'jsonFile': 'sample.json', 'coordinates': gcj02_to_bd09(gcj_points[:1])[0].tolist(),
+            'inputCrs': 'bd09'}).get_json()
+        assert np.allclose(single['gcj02_coordinates'], bd09_to_gcj02(gcj02_to_bd09(gcj_points[:1]))[0])
+        assert client.post('/api/coordinate', json={
+            'jsonFile': 'sample.json', 'coordinates': [1, 2], 'inputCrs': 'utm'}).status_code == 400
+
+        lines = ['id,lng,lat'] + [f'{i},{lng!r},{lat!r}' for i, (lng, lat) in enumerate(wgs_points.tolist())]
+        output = io.StringIO()
+        result = map_csv(model, io.StringIO('\n'.join(lines)), output, crs='wgs84', chunk_size=7)
+        rows = output.getvalue().strip().splitlines()
+        assert result['rows'] == 20 and rows[0] == 'id,lng,lat,x,y,triangle_index'
+        mapped = np.array([[float(v) for v in row.split(',')[3:5]] for row in rows[1:]])
+        assert np.allclose(mapped, expected, atol=1e-7)
+
+        # 经纬度为空、不是数字或缺列的行不中断整个文件：x、y留空，triangle_index为-1
+        bad = lines[:4] + ['90,,22.53', '91,abc,22.53', '92'] + lines[4:]
+        output = io.StringIO()
+        result = map_csv(model, io.StringIO('\n'.join(bad)), output, crs='wgs84', chunk_size=7)
+        rows = list(csv.reader(io.StringIO(output.getvalue())))[1:]
+        assert result['rows'] == 23 and result['invalid'] == 3 and result['inside'] == 20
+        assert all(row[-3:] == ['', '', '-1'] for row in rows[3:6])
+        good = [row for row in rows if row[0] not in ('90', '91', '92')]
+        assert np.allclose(np.array([[float(v) for v in row[3:5]] for row in good]), expected, atol=1e-7)
+        print("✅ WGS-84/BD-09输入转换后映射结果与GCJ-02输入一致")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_auto_map_selection():
+    """测试未指定jsonFile时按范围和优先级自动选择地图，批量坐标按地图分组映射"""
+    print("\n🧭 测试自动选择地图...")
+    import json
+    from map_index import MapIndex
+    from synthetic_data import make_sample_mapping
+    tmp_dir = tempfile.mkdtemp()
+    original = (app_module.STORAGE_DIR, app_module.map_index)
+    try:
+        # 校园全图、其中的一栋建筑（面积更小，优先），以及旁边的另一个校区
+        campus = (113.930, 22.528, 113.942, 22.538)
+        building = (113.934, 22.531, 113.937, 22.534)
+        east = (113.950, 22.528, 113.960, 22.538)
+        for name, bounds in (('campus.json', campus), ('building.json', building), ('east.json', east)):
+            with open(os.path.join(tmp_dir, name), 'w', encoding='utf-8') as f:
+                json.dump(make_sample_mapping(150, seed=len(name), bounds=bounds), f)
+
+        app_module.STORAGE_DIR = tmp_dir
+        app_module.map_index = MapIndex(tmp_dir, app_module.process_mapping_data)
+        maps = app_module.app.test_client().get('/api/map-index').get_json()['maps']
+        assert len(maps) == 3 and maps[0]['filename'] == 'building.json'
+        assert maps[0]['hull_area'] < min(m['hull_area'] for m in maps[1:])
+
+        points = np.concatenate([sample_points_in_bounds(30, seed=1, bounds=building, margin=0.3),
+                                 sample_points_in_bounds(30, seed=2, bounds=east, margin=0.3),
+                                 [[100.0, 10.0]]])
+        client = app_module.app.test_client()
+        single = client.post('/api/coordinate', json={'coordinates': points[0].tolist()}).get_json()
+        assert single['jsonFile'] == 'building.json' and single['candidates'] == ['building.json', 'campus.json']
+        outside = client.post('/api/coordinate', json={'coordinates': [100.0, 10.0]}).get_json()
+        assert not outside['success'] and outside['candidates'] == []
+
+        batch = client.post('/api/coordinate/batch', json={'coordinates': points.tolist()}).get_json()
+        assert batch['files'][-1] is None and set(batch['files'][:30]) == {'building.json'}
+        assert set(batch['files'][30:60]) == {'east.json'} and batch['inside_count'] == 60
+        for filename in ('building.json', 'east.json'):
+            rows = [i for i, f in enumerate(batch['files']) if f == filename]
+            expected, _ = compile_mapping_model(os.path.join(tmp_dir, filename)).transform(points[rows])
+            assert np.allclose(np.array(batch['mapped_coordinates'])[rows], expected)
+
+        # 提高校园全图的优先级后重新选择
+        data = make_sample_mapping(150, seed=len('campus.json'), bounds=campus)
+        data['metadata']['priority'] = 10
+        with open(os.path.join(tmp_dir, 'campus.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        single = client.post('/api/coordinate', json={'coordinates': points[0].tolist()}).get_json()
+        assert single['jsonFile'] == 'campus.json'
+        print(f"✅ 自动选择地图正确，批量坐标分为 {len(batch['partitions'])} 组")
+    finally:
+        app_module.STORAGE_DIR, app_module.map_index = original
+        shutil.rmtree(tmp_dir)
+
+
+def test_control_point_decimation():
+    """测试控制点抽稀：被删除控制点处误差不超过容差，映射范围不变，接口可选用简化模型"""
+    print("\n✂️  测试控制点抽稀...")
+    import json
+    from mapping_model import simplify_model
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        path = os.path.join(tmp_dir, 'dense.json')
+        write_sample_mapping(path, n_points=2000)
+        model = compile_mapping_model(path)
+        tolerance = 1e-3
+        simplified, report, kept = simplify_model(model, tolerance, lookup_points=2000)
+        assert report['kept_points'] == int(kept.sum()) < report['full_points']
+        assert report['compression_ratio'] > 1 and report['max_error'] <= tolerance
+
+        removed_mapped, removed_triangles = simplified.transform(model.coords[~kept])
+        assert np.all(removed_triangles >= 0)
+        assert np.max(np.linalg.norm(removed_mapped - model.xy[~kept], axis=1)) <= tolerance + 1e-12
+        assert np.allclose(simplified.bounds, model.bounds)
+        points = sample_points_in_bounds(500, seed=8)
+        assert np.array_equal(simplified.locate(points) >= 0, model.locate(points) >= 0)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['metadata']['simplifyTolerance'] = tolerance
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        app_module.STORAGE_DIR = tmp_dir
+        client = app_module.app.test_client()
+        removed = model.coords[~kept]
+        full = client.post('/api/coordinate/batch', json={
+            'jsonFile': 'dense.json', 'coordinates': removed.tolist()}).get_json()
+        fast = client.post('/api/coordinate/batch', json={
+            'jsonFile': 'dense.json', 'coordinates': removed.tolist(), 'simplified': True}).get_json()
+        assert not full['simplified'] and fast['simplified']
+        assert np.allclose(full['mapped_coordinates'], model.xy[~kept])
+        assert np.allclose(fast['mapped_coordinates'], removed_mapped)
+        info = client.post('/api/mapping-info', json={'jsonFile': 'dense.json'}).get_json()
+        assert info['simplify']['kept_points'] < info['simplify']['full_points']
+        print(f"✅ 控制点 {report['full_points']} -> {report['kept_points']}，"
+              f"最大误差 {report['max_error']:.6f}")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_mapping_bundle():
+    """测试二进制映射包：读写往返一致，本地映射结果与服务端一致，按哈希访问可永久缓存"""
+    print("\n📦 测试二进制映射包...")
+    from mapping_bundle import read_bundle, write_bundle, HEADER_SIZE
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=2000)
+        app_module.STORAGE_DIR = tmp_dir
+        client = app_module.app.test_client()
+        response = client.get('/api/bundle/sample.json')
+        assert response.status_code == 200 and response.headers['ETag'].strip('"') == response.headers['X-Bundle-Hash']
+        data = response.get_data()
+        bundle = read_bundle(data)
+        assert HEADER_SIZE % 4 == 0 and bundle.digest == response.headers['X-Bundle-Hash']
+
+        # 读出的数组重新写出得到相同的映射包
+        model = compile_mapping_model(path)
+        assert write_bundle(model.coords, bundle.simplices, model.affine_matrices) == data
+        assert np.array_equal(bundle.simplices, model.triangulation.simplices)
+
+        points = np.concatenate([sample_points_in_bounds(5000, seed=6, margin=0.2), model.coords])
+        batch = client.post('/api/coordinate/batch', json={
+            'jsonFile': 'sample.json', 'coordinates': points.tolist()}).get_json()
+        server_mapped = np.array(batch['mapped_coordinates'])
+        local_mapped, local_triangles = bundle.transform(points)
+        assert np.array_equal(local_triangles >= 0, np.array(batch['triangle_indices']) >= 0)
+        assert np.allclose(local_mapped[:5000], server_mapped[:5000], atol=1e-6)
+
+        corrupted = bytearray(data)
+        corrupted[-1] ^= 1
+        try:
+            read_bundle(bytes(corrupted))
+            assert False, "内容哈希校验失败"
+        except ValueError:
+            pass
+
+        assert client.get('/api/bundle/sample.json',
+                          headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        immutable = client.get(response.headers['X-Bundle-Url'])
+        assert immutable.get_data() == data and 'immutable' in immutable.headers['Cache-Control']
+        assert client.get('/api/bundle/sample.json/0000.bin').status_code == 404
+        print(f"✅ 映射包 {len(data)} 字节，本地映射与服务端最大差异 "
+              f"{np.abs(local_mapped[:5000] - server_mapped[:5000]).max():.2e}")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_async_compile_jobs():
+    """测试异步编译：模型未就绪时立即返回"编译中"，任务完成后正常映射，队列满时拒绝提交"""
+    print("\n⚙️  测试异步编译任务...")
+    import time
+    from compile_jobs import CompileJobs, JobQueueFull
+    tmp_dir = tempfile.mkdtemp()
+    original = (app_module.STORAGE_DIR, app_module.ASYNC_COMPILE, app_module.model_cache, app_module.compile_jobs)
+    cache = ModelCache()
+    jobs = CompileJobs(cache, max_workers=1, max_queue=1)
+    try:
+        for name in ('large.json', 'other.json'):
+            write_sample_mapping(os.path.join(tmp_dir, name), n_points=5000)
+        app_module.STORAGE_DIR = tmp_dir
+        app_module.ASYNC_COMPILE = True
+        app_module.model_cache = cache
+        app_module.compile_jobs = jobs
+        client = app_module.app.test_client()
+        points = sample_points_in_bounds(100, seed=9)
+
+        response = client.post('/api/coordinate/batch', json={'jsonFile': 'large.json', 'coordinates': points.tolist()})
+        assert response.status_code == 202 and response.get_json()['compiling']
+        job_id = response.get_json()['job']['jobId']
+        # 同一文件再次请求复用同一任务，其他文件因队列已满被拒绝
+        again = client.post('/api/coordinate', json={'jsonFile': 'large.json', 'coordinates': points[0].tolist()})
+        assert again.status_code == 202 and again.get_json()['job']['jobId'] == job_id
+        try:
+            jobs.submit(os.path.join(tmp_dir, 'other.json'))
+            assert False, "队列已满时应拒绝提交"
+        except JobQueueFull:
+            pass
+
+        deadline = time.time() + 60
+        while True:
+            job = client.get(f'/api/compile-jobs/{job_id}').get_json()['job']
+            if job['status'] in ('done', 'failed') or time.time() > deadline:
+                break
+            time.sleep(0.05)
+        assert job['status'] == 'done' and job['progress'] == 1.0 and job['stage'] == 'index'
+
+        batch = client.post('/api/coordinate/batch', json={'jsonFile': 'large.json', 'coordinates': points.tolist()})
+        assert batch.status_code == 200
+        expected, _ = compile_mapping_model(os.path.join(tmp_dir, 'large.json')).transform(points)
+        assert np.allclose(batch.get_json()['mapped_coordinates'], expected)
+        listing = client.get('/api/compile-jobs').get_json()
+        assert listing['stats']['done'] == 1 and listing['stats']['rejected'] == 1
+        assert client.get('/api/compile-jobs/missing').status_code == 404
+        print(f"✅ 异步编译完成，编译耗时 {job['compile_seconds'] * 1000:.0f} ms，"
+              f"排队 {job['queued_seconds'] * 1000:.0f} ms")
+    finally:
+        jobs.shutdown()
+        (app_module.STORAGE_DIR, app_module.ASYNC_COMPILE,
+         app_module.model_cache, app_module.compile_jobs) = original
+        shutil.rmtree(tmp_dir)
+
+
+def test_content_dedup():
+    """测试映射内容相同的文件共用一个编译模型和瓦片缓存，并统计去重节省"""
+    print("\n🧬 测试映射内容去重...")
+    import json
+    from synthetic_data import make_sample_mapping
+    from tile_server import TileCache
+    tmp_dir = tempfile.mkdtemp()
+    original = (app_module.STORAGE_DIR, app_module.model_cache, app_module.tile_cache)
+    try:
+        data = make_sample_mapping(300, seed=3)
+        paths = {name: os.path.join(tmp_dir, name) for name in ('a.json', 'b.json', 'c.json')}
+        with open(paths['a.json'], 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        # 另存的副本：格式和描述不同，映射内容相同
+        copy = dict(data, metadata=dict(data['metadata'], description='2025-7-13 副本'))
+        with open(paths['b.json'], 'w', encoding='utf-8') as f:
+            json.dump(copy, f, ensure_ascii=False, indent=2)
+        # 优先级不同的副本单独编译
+        with open(paths['c.json'], 'w', encoding='utf-8') as f:
+            json.dump(dict(data, metadata=dict(data['metadata'], priority=5)), f)
+
+        cache = ModelCache()
+        first = cache.get(paths['a.json'])
+        assert cache.get(paths['b.json']) is first and cache.get(paths['c.json']) is not first
+        assert first.content_hash == cache.get(paths['c.json']).content_hash
+        stats = cache.stats()
+        assert stats['models'] == 2 and stats['misses'] == 2
+        assert stats['dedup']['shared_files'] == 1 and stats['dedup']['hits'] == 1
+        assert stats['dedup']['saved_bytes'] == first.memory_usage()['total']
+        assert cache.memory_report()['models'][-1]['files'] == ['a.json', 'b.json']
+        # 编译结束后不保留编译锁；并发请求同一内容只编译一次
+        assert cache._compile_locks == {}
+        from concurrent.futures import ThreadPoolExecutor
+        concurrent = ModelCache()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            models = list(executor.map(concurrent.get, [paths['a.json'], paths['b.json']] * 8))
+        assert all(model is models[0] for model in models) and concurrent.misses == 1
+        assert concurrent._compile_locks == {}
+
+        # 删除其中一个文件的记录后另一个文件仍使用同一模型
+        assert cache.invalidate(paths['a.json'])
+        assert cache.get(paths['b.json']) is first
+
+        app_module.STORAGE_DIR = tmp_dir
+        app_module.model_cache = ModelCache()
+        app_module.tile_cache = TileCache(os.path.join(tmp_dir, 'tile-cache'))
+        client = app_module.app.test_client()
+        client.post('/api/mapping-info', json={'jsonFile': 'a.json'})
+        saved = client.post('/api/save-json', json={'filename': 'd.json', 'data': data}).get_json()
+        assert saved['contentHash'] == first.content_hash and saved['sameContentAs'] == ['a.json']
+        assert app_module.process_mapping_data(os.path.join(tmp_dir, 'd.json')) is \
+            app_module.process_mapping_data(paths['a.json'])
+
+        tile_dir = os.path.join(tmp_dir, 'tile-cache', first.content_hash[:16])
+        os.makedirs(tile_dir)
+        client.delete('/api/delete/a.json')
+        assert os.path.isdir(tile_dir)
+        client.delete('/api/delete/d.json')
+        assert not os.path.isdir(tile_dir)
+        print(f"✅ 内容相同的文件共用模型，节省 {stats['dedup']['saved_bytes']} 字节")
+    finally:
+        app_module.STORAGE_DIR, app_module.model_cache, app_module.tile_cache = original
+        shutil.rmtree(tmp_dir)
+
+
+def test_quality_report():
+    """测试编译时的质量报告：留一残差与完整重新三角剖分一致，标错的控制点和退化三角形被发现"""
+    print("\n🩺 测试映射质量报告...")
+    import json
+    from scipy.spatial import Delaunay
+    from mapping_quality import triangle_metrics, leave_one_out_residuals
+    from synthetic_data import make_sample_mapping
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        data = make_sample_mapping(2000, seed=11)
+        with open(os.path.join(tmp_dir, 'clean.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        model = compile_mapping_model(os.path.join(tmp_dir, 'clean.json'))
+        residuals = leave_one_out_residuals(model.coords, model.xy, model.triangulation)
+        for i in np.flatnonzero(np.isfinite(residuals))[:40]:
+            keep = np.arange(len(model.coords)) != i
+            mesh = Delaunay(model.coords[keep])
+            simplex = mesh.find_simplex(model.coords[i])
+            partial = mesh.transform[simplex, :2] @ (model.coords[i] - mesh.transform[simplex, 2])
+            predicted = np.append(partial, 1 - partial.sum()) @ model.xy[keep][mesh.simplices[simplex]]
+            assert abs(np.linalg.norm(predicted - model.xy[i]) - residuals[i]) < 1e-9
+        assert np.all(np.isnan(residuals[np.unique(model.triangulation.convex_hull)]))
+
+        # 仿射矩阵求解失败时使用的单位矩阵被识别为退化三角形
+        matrices = model.affine_matrices.copy()
+        matrices[3] = np.eye(3)
+        metrics = triangle_metrics(model.coords, model.triangulation.simplices, matrices)
+        assert metrics['identity'][3] and metrics['degenerate'][3] and np.isnan(metrics['condition'][3])
+        assert np.count_nonzero(metrics['degenerate']) == 1
+
+        # 手绘坐标标错的控制点
+        interior = int(np.flatnonzero(np.isfinite(residuals))[0])
+        data['mappings'][interior]['手绘地图坐标']['x'] += 0.2
+        with open(os.path.join(tmp_dir, 'bad.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        app_module.STORAGE_DIR = tmp_dir
+        info = app_module.app.test_client().post('/api/mapping-info', json={'jsonFile': 'bad.json'}).get_json()
+        report = info['quality']
+        assert report['residuals']['worst'][0]['point'] == interior
+        assert report['residuals']['worst'][0]['relative'] > 100
+        assert report['triangles']['identity_fallback'] == 0
+        assert report['triangles']['flipped'] > model.quality_report['triangles']['flipped']
+        print(f"✅ 标错的控制点残差为中位数的 {report['residuals']['worst'][0]['relative']:.0f} 倍，"
+              f"报告耗时 {report['seconds'] * 1000:.0f} ms")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_compact_precision():
+    """测试float32紧凑模式：映射偏差不超过编译时测量的最大偏差，超出容差时保持float64"""
+    print("\n🗜️ 测试float32紧凑模式...")
+    import json
+    from synthetic_data import make_sample_mapping
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        data = make_sample_mapping(3000, seed=5)
+        data['metadata']['qualityReport'] = False
+        paths = {}
+        for name, options in [('full', {}), ('compact', {'precision': 'float32'}),
+                              ('strict', {'precision': 'float32', 'compactTolerance': 1e-12})]:
+            paths[name] = os.path.join(tmp_dir, f'{name}.json')
+            with open(paths[name], 'w', encoding='utf-8') as f:
+                json.dump(dict(data, metadata=dict(data['metadata'], **options)), f)
+
+        full = compile_mapping_model(paths['full'])
+        compact = compile_mapping_model(paths['compact'])
+        report = compact.compact_report
+        assert full.precision == 'float64' and full.compact_report is None
+        assert compact.precision == 'float32' and report['accepted']
+        assert compact.affines.dtype == np.float32 and compact.xy.dtype == np.float32
+        assert report['max_deviation'] <= report['tolerance']
+        assert compact.memory_usage()['arrays'] < full.memory_usage()['arrays'] * 0.5
+
+        points = sample_points_in_bounds(20000, seed=6, bounds=full.bounds)
+        expected, expected_triangles = full.transform(points)
+        mapped, triangles = compact.transform(points)
+        assert np.array_equal(triangles, expected_triangles)
+        deviation = np.linalg.norm(mapped - expected, axis=1).max()
+        assert deviation <= report['max_deviation'] * (1 + 1e-3)
+        assert np.all(mapped[triangles < 0] == -1)
+
+        strict = compile_mapping_model(paths['strict'])
+        assert strict.precision == 'float64' and not strict.compact_report['accepted']
+        assert strict.affines is None and strict.affine_matrices.dtype == np.float64
+        print(f"✅ 测量的最大偏差 {report['max_deviation']:.1e}，随机点偏差 {deviation:.1e}，"
+              f"节省 {report['saved_bytes'] / 1024:.0f} KB")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_async_serving():
+    """测试ASGI异步服务：与Flask响应一致、流式下载、通道满时返回503且不影响另一通道"""
+    print("\n⚡ 测试ASGI异步服务...")
+    import json
+    import asyncio
+    import threading
+    from asgi_app import create_asgi_app
+
+    async def call(server, method, path, payload=None, chunks=None):
+        chunks = chunks or [json.dumps(payload).encode('utf-8') if payload is not None else b'']
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                    for i, chunk in enumerate(chunks)]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'http_version': '1.1',
+                 'headers': [(b'content-type', b'application/json'), (b'host', b'localhost')]}
+        await server(scope, receive, send)
+        return sent[0]['status'], dict(sent[0]['headers']), sent[1:]
+
+    def content(messages):
+        return b''.join(message['body'] for message in messages)
+
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        app_module.STORAGE_DIR = tmp_dir
+        write_sample_mapping(os.path.join(tmp_dir, 'sample.json'), n_points=3000)
+        request = {'jsonFile': 'sample.json', 'coordinates': [113.936, 22.533]}
+        expected = app_module.app.test_client().post('/api/coordinate', json=request).get_json()
+        assert expected['success']
+
+        async def scenario():
+            server = create_asgi_app(cpu_workers=1, cpu_queue=0, io_workers=2, io_queue=4, max_body_bytes=4096)
+            status, _, messages = await call(server, 'POST', '/api/coordinate', request)
+            assert status == 200 and json.loads(content(messages)) == expected
+
+            # 文件下载按块流式发送
+            status, _, messages = await call(server, 'GET', '/api/download/sample.json')
+            with open(os.path.join(tmp_dir, 'sample.json'), 'rb') as f:
+                assert status == 200 and content(messages) == f.read()
+            assert len(messages) > 2 and messages[0]['more_body'] and not messages[-1]['more_body']
+
+            # cpu 通道被占满时映射请求立即返回503，io 通道的请求不受影响
+            release = threading.Event()
+            blocker = asyncio.ensure_future(server.cpu.run(release.wait))
+            await asyncio.sleep(0)
+            status, headers, _ = await call(server, 'POST', '/api/coordinate', request)
+            assert status == 503 and headers[b'retry-after'] == b'1'
+            status, _, messages = await call(server, 'GET', '/api/saved-files')
+            assert status == 200 and json.loads(content(messages))['success']
+            release.set()
+            await blocker
+            status, _, _ = await call(server, 'POST', '/api/coordinate', request)
+            assert status == 200
+
+            # 分块到达的请求体在事件循环中拼接，超出上限时返回413
+            body = json.dumps(request).encode('utf-8')
+            status, _, messages = await call(server, 'POST', '/api/coordinate', chunks=[body[:10], body[10:]])
+            assert status == 200 and json.loads(content(messages)) == expected
+            status, _, _ = await call(server, 'POST', '/api/save-json', chunks=[b' ' * 4000, b' ' * 200])
+            assert status == 413
+
+            status, _, messages = await call(server, 'GET', '/api/async-status')
+            stats = json.loads(content(messages))
+            assert stats['cpu']['rejected'] == 1 and stats['cpu']['in_flight'] == 0
+            server.cpu.shutdown()
+            server.io.shutdown()
+            return stats
+
+        stats = asyncio.run(scenario())
+        print(f"✅ 通道统计: cpu {stats['cpu']}, io {stats['io']}")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_viewport_query():
+    """测试视口查询：网格索引结果与逐个检查一致，超过上限时抽稀并截断"""
+    print("\n🔲 测试视口查询...")
+    import time
+    from viewport_index import viewport_query
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        write_sample_mapping(os.path.join(tmp_dir, 'sample.json'), n_points=5000)
+        model = compile_mapping_model(os.path.join(tmp_dir, 'sample.json'))
+        assert model.memory_usage()['indexes'] >= model.viewport_index().nbytes > 0
+
+        for space, vertices in (('tencent', model.coords), ('xy', model.xy)):
+            low, high = vertices.min(axis=0), vertices.max(axis=0)
+            bbox = [*(low + (high - low) * 0.3), *(low + (high - low) * 0.45)]
+            result = viewport_query(model, bbox, space, limit=50000)
+            corners = vertices[model.triangulation.simplices]
+            low, high = corners.min(axis=1), corners.max(axis=1)
+            expected = np.flatnonzero((low[:, 0] <= bbox[2]) & (high[:, 0] >= bbox[0])
+                                      & (low[:, 1] <= bbox[3]) & (high[:, 1] >= bbox[1]))
+            inside = np.flatnonzero((vertices[:, 0] >= bbox[0]) & (vertices[:, 0] <= bbox[2])
+                                    & (vertices[:, 1] >= bbox[1]) & (vertices[:, 1] <= bbox[3]))
+            assert result['triangles']['ids'] == expected.tolist() and result['points']['ids'] == inside.tolist()
+            assert not result['lod']['thinned'] and not result['truncated']
+            assert set(np.ravel(result['triangles']['vertices'])) <= set(result['vertices']['ids'])
+
+        # 整个范围、上限较小时按屏幕网格抽稀，数量不超过上限
+        start = time.perf_counter()
+        thinned = viewport_query(model, model.bounds, limit=200)
+        seconds = time.perf_counter() - start
+        assert thinned['lod']['thinned'] and thinned['triangles']['total'] == model.triangles_count
+        assert thinned['triangles']['returned'] <= 200 and thinned['points']['returned'] <= 200
+        assert viewport_query(model, [0, 0, 1, 1])['triangles']['total'] == 0
+
+        app_module.STORAGE_DIR = tmp_dir
+        client = app_module.app.test_client()
+        response = client.post('/api/viewport', json={'jsonFile': 'sample.json', 'bbox': [0.2, 0.2, 0.4, 0.4],
+                                                      'space': 'xy', 'width': 800})
+        body = response.get_json()
+        assert response.status_code == 200 and body['success'] and body['space'] == 'xy'
+        assert body['lod']['cell_size'] == 0.2 / 800 * 8
+        for request in ({'bbox': [1, 1, 0, 0]}, {'bbox': [0, 0, 1, 1], 'space': 'wgs84'},
+                        {'bbox': [0, 0, 1, 1], 'limit': 0}, {'bbox': 'all'}):
+            assert client.post('/api/viewport', json={'jsonFile': 'sample.json', **request}).status_code == 400
+        print(f"✅ {model.triangles_count} 个三角形抽稀到 {thinned['triangles']['returned']} 个，"
+              f"查询耗时 {seconds * 1000:.1f} ms")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        shutil.rmtree(tmp_dir)
+
+
+def test_landmark_query():
+    """测试最近控制点查询：与逐个计算距离一致，半径查询只返回半径内的控制点，KD树随模型缓存复用"""
+    print("\n📌 测试最近控制点查询...")
+    from landmark_index import METERS_PER_DEGREE, nearest_landmarks
+    tmp_dir = tempfile.mkdtemp()
+    original_dir = app_module.STORAGE_DIR
+    try:
+        write_sample_mapping(os.path.join(tmp_dir, 'sample.json'), n_points=2000)
+        model = compile_mapping_model(os.path.join(tmp_dir, 'sample.json'))
+        index = model.landmark_index()
+        points = sample_points_in_bounds(50, seed=8, bounds=model.bounds)
+
+        # 腾讯地图空间按米计算距离
+        scale = np.array([np.cos(np.radians(model.coords[:, 1].mean())), 1.0]) * METERS_PER_DEGREE
+        distances = np.linalg.norm((model.coords[None, :, :] - points[:, None, :]) * scale, axis=2)
+        results = nearest_landmarks(model, points, 'tencent', k=3)
+        for row, result in zip(distances, results):
+            assert [item['point'] for item in result] == np.argsort(row)[:3].tolist()
+            assert np.allclose([item['distance'] for item in result], np.sort(row)[:3])
+            assert result[0]['xy'] == model.xy[result[0]['point']].tolist()
+
+        xy_points = model.xy[:20] + 0.001
+        xy_distances = np.linalg.norm(model.xy[None, :, :] - xy_points[:, None, :], axis=2)
+        radius = float(np.median(np.sort(xy_distances, axis=1)[:, 2]))
+        for row, result in zip(xy_distances, nearest_landmarks(model, xy_points, 'xy', radius=radius)):
+            assert [item['point'] for item in result] == np.argsort(row)[:np.count_nonzero(row <= radius)].tolist()
+            assert all(item['tencent'] == model.coords[item['point']].tolist() for item in result)
+
+        app_module.STORAGE_DIR = tmp_dir
+        client = app_module.app.test_client()
+        request = {'jsonFile': 'sample.json', 'points': points[:5].tolist(), 'k': 2}
+        body = client.post('/api/landmarks', json=request).get_json()
+        cached = app_module.model_cache.get(os.path.join(tmp_dir, 'sample.json'))
+        assert body['success'] and len(body['results']) == 5
+        assert [item['point'] for item in body['results'][0]] == [item['point'] for item in results[0][:2]]
+        tree = cached.landmark_index()
+        client.post('/api/landmarks', json=request)
+        assert app_module.model_cache.get(os.path.join(tmp_dir, 'sample.json')).landmark_index() is tree
+        for bad in ({'k': 0}, {'k': 100}, {'radius': -1}, {'space': 'wgs84'}, {'points': [1, 2]}):
+            assert client.post('/api/landmarks', json={**request, **bad}).status_code == 400
+        print(f"✅ KD树 {index.nbytes / 1024:.0f} KB，半径 {radius:.4f} 内平均 "
+              f"{np.mean(np.count_nonzero(xy_distances <= radius, axis=1)):.1f} 个控制点")
+    finally:
+        app_module.STORAGE_DIR = original_dir
+        app_module.model_cache.invalidate(os.path.join(tmp_dir, 'sample.json'))
+        shutil.rmtree(tmp_dir)
+
+
+def test_geojson_3d_positions():
+    """测试GeoJSON三维位置：[经度, 纬度, 高程] 去掉高程后与二维坐标的映射结果一致"""
+    print("\n🏔️  测试三维GeoJSON位置...")
+    from geojson_mapping import map_feature_collection
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=300)
+        model = compile_mapping_model(path)
+        line = [[113.933, 22.530], [113.937, 22.535]]
+        ring = [[113.934, 22.531], [113.938, 22.531], [113.938, 22.534], [113.934, 22.531]]
+
+        def collection(line, ring):
+            return {'type': 'FeatureCollection', 'features': [
+                {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'LineString', 'coordinates': line}},
+                {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+            ]}
+
+        flat, flat_stats = map_feature_collection(model, collection(line, ring))
+        raised, raised_stats = map_feature_collection(
+            model, collection([p + [35.0] for p in line], [p + [12.5] for p in ring]))
+
+        assert raised_stats['input_vertices'] == flat_stats['input_vertices'] == len(line) + len(ring)
+        assert raised_stats == flat_stats
+        for a, b in zip(flat['features'], raised['features']):
+            assert a['geometry'] == b['geometry']
+        print(f"✅ 三维位置映射一致，输入 {raised_stats['input_vertices']} 个顶点")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_geojson_hull_crossing():
+    """测试两端都在映射范围外、中间穿过范围的线段：保留范围内部分，形状与逐点映射一致"""
+    print("\n🚧 测试穿过映射范围的GeoJSON线段...")
+    from geojson_mapping import map_feature_collection
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=300)
+        model = compile_mapping_model(path)
+        min_lng, min_lat, max_lng, max_lat = model.bounds
+        mid_lat = (min_lat + max_lat) / 2
+        line = np.array([[min_lng - 0.01, mid_lat - 0.001], [max_lng + 0.01, mid_lat + 0.001]])
+        assert np.all(model.locate(line) < 0)
+
+        result, stats = map_feature_collection(model, {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'LineString', 'coordinates': line.tolist()}}
+        ]})
+        geometry = result['features'][0]['geometry']
+        assert geometry is not None and geometry['type'] == 'LineString'
+        assert stats['hull_crossing_segments'] == 1 and stats['inserted_vertices'] > 2
+        polyline = np.array(geometry['coordinates'])
+
+        # 范围内的采样点逐点映射后都落在映射后的折线上，且折线覆盖范围内的整段
+        samples = line[0] + np.linspace(0, 1, 5000)[:, None] * (line[1] - line[0])
+        samples = samples[model.locate(samples) >= 0]
+        mapped, _ = model.transform(samples)
+        distances = np.full(len(mapped), np.inf)
+        for a, b in zip(polyline[:-1], polyline[1:]):
+            t = np.clip((mapped - a) @ (b - a) / max((b - a) @ (b - a), 1e-30), 0, 1)
+            distances = np.minimum(distances, np.linalg.norm(mapped - (a + t[:, None] * (b - a)), axis=1))
+        assert distances.max() < 1e-9
+        step = np.linalg.norm(np.diff(mapped, axis=0), axis=1).max()
+        assert np.linalg.norm(polyline[0] - mapped[0]) <= step
+        assert np.linalg.norm(polyline[-1] - mapped[-1]) <= step
+        print(f"✅ 穿过范围的线段保留 {len(polyline)} 个顶点, 形状偏差 {distances.max():.1e}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_quality_high_degree_vertex():
+    """测试邻居数很多的控制点：留一残差按邻居环Delaunay剖分计算，与完整重新三角剖分一致且不占用大量内存"""
+    print("\n🕸️  测试高邻居数控制点的留一残差...")
+    import time
+    from scipy.spatial import Delaunay
+    import mapping_quality
+    from mapping_quality import leave_one_out_residuals
+
+    rng = np.random.default_rng(5)
+    background = rng.uniform([113.93, 22.52], [113.95, 22.54], size=(400, 2))
+    center = np.array([113.94, 22.53])
+    angles = np.sort(rng.uniform(0, 2 * np.pi, 120))
+    fan = center + 0.002 * np.column_stack([np.cos(angles), np.sin(angles)]) * rng.uniform(0.998, 1.002, (120, 1))
+    coords = np.vstack([background[np.linalg.norm(background - center, axis=1) > 0.003], fan, center])
+    xy = np.column_stack([np.sin(coords[:, 0] * 300), np.cos(coords[:, 1] * 250)])
+    triangulation = Delaunay(coords)
+    indptr, _ = triangulation.vertex_neighbor_vertices
+    hub = len(coords) - 1
+    degree = int(indptr[hub + 1] - indptr[hub])
+    assert degree > mapping_quality.RING_VECTOR_MAX_DEGREE
+
+    start = time.perf_counter()
+    residuals = leave_one_out_residuals(coords, xy, triangulation)
+    elapsed = time.perf_counter() - start
+    keep = np.arange(len(coords)) != hub
+    mesh = Delaunay(coords[keep])
+    simplex = mesh.find_simplex(coords[hub])
+    partial = mesh.transform[simplex, :2] @ (coords[hub] - mesh.transform[simplex, 2])
+    predicted = np.append(partial, 1 - partial.sum()) @ xy[keep][mesh.simplices[simplex]]
+    assert abs(np.linalg.norm(predicted - xy[hub]) - residuals[hub]) < 1e-9
+
+    # 逐点剖分与向量化计算的结果一致
+    original = mapping_quality.RING_VECTOR_MAX_DEGREE
+    mapping_quality.RING_VECTOR_MAX_DEGREE = 0
+    try:
+        per_ring = leave_one_out_residuals(coords, xy, triangulation)
+    finally:
+        mapping_quality.RING_VECTOR_MAX_DEGREE = original
+    assert np.array_equal(np.isnan(per_ring), np.isnan(residuals))
+    assert np.nanmax(np.abs(per_ring - residuals)) < 1e-9
+    print(f"✅ 邻居数 {degree} 的控制点残差与重新剖分一致，计算耗时 {elapsed * 1000:.0f} ms")
+
+
+def test_geojson_hull_exit():
+    """测试从起点所在三角形的凸包边离开的线段：在凸包边界处裁剪，不在凸包外插入顶点"""
+    print("\n🚪 测试从起点三角形的凸包边离开的线段...")
+    from scipy.spatial import Delaunay
+    from geojson_mapping import find_edge_crossings, hull_intervals
+
+    square = Delaunay(np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float64))
+    segment_ids, params, simplices = find_edge_crossings(square, [[0.9, 0.2]], [[3.0, 0.3]])
+    assert segment_ids.tolist() == [0] and simplices[0] >= 0
+    assert abs(0.9 + params[0] * 2.1 - 1.0) < 1e-12
+
+    # 随机三角网：从范围内出发的线段的最后一个交点就是凸包上的离开点
+    rng = np.random.default_rng(4)
+    mesh = Delaunay(rng.uniform(0, 1, size=(200, 2)))
+    starts = rng.uniform(0.3, 0.7, size=(500, 2))
+    ends = starts + rng.normal(size=(500, 2))
+    outward = mesh.find_simplex(ends) < 0
+    starts, ends = starts[outward], ends[outward]
+    segment_ids, params, _ = find_edge_crossings(mesh, starts, ends)
+    last = np.full(len(starts), -np.inf)
+    np.maximum.at(last, segment_ids, params)
+    _, t_out = hull_intervals(mesh, starts, ends)
+    assert np.abs(last - t_out).max() < 1e-9
+    print(f"✅ {len(starts)} 条向外的线段都在凸包边界处离开")
+
+
+def test_geojson_polygon_hull_clip():
+    """测试多边形裁剪：范围外的部分沿凸包边界闭合，不从凸包的凹角处走捷径"""
+    print("\n🧱 测试多边形沿凸包边界裁剪...")
+    from geojson_mapping import map_feature_collection
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'sample.json')
+        write_sample_mapping(path, n_points=300)
+        model = compile_mapping_model(path)
+        hull = np.unique(model.triangulation.convex_hull)
+        min_lng, min_lat, max_lng, max_lat = model.bounds
+        mid_lng, mid_lat = (min_lng + max_lng) / 2, (min_lat + max_lat) / 2
+
+        def polygon(ring):
+            return {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+        # 覆盖右上部分并伸出范围的矩形，以及包围整个范围的矩形
+        box = [mid_lng, mid_lat, max_lng + 0.01, max_lat + 0.01]
+        corner = [[box[0], box[1]], [box[2], box[1]], [box[2], box[3]], [box[0], box[3]], [box[0], box[1]]]
+        around = [[min_lng - 0.01, min_lat - 0.01], [max_lng + 0.01, min_lat - 0.01],
+                  [max_lng + 0.01, max_lat + 0.01], [min_lng - 0.01, max_lat + 0.01], [min_lng - 0.01, min_lat - 0.01]]
+        result, _ = map_feature_collection(model, {'type': 'FeatureCollection',
+                                                   'features': [polygon(corner), polygon(around)]})
+        clipped, whole = (feature['geometry']['coordinates'][0] for feature in result['features'])
+
+        # 矩形内的凸包顶点都出现在裁剪结果中，矩形外的都不出现
+        lng, lat = model.coords[hull].T
+        covered = (lng > box[0]) & (lat > box[1])
+        vertices = {tuple(p) for p in clipped}
+        assert covered.any() and all(tuple(model.xy[i]) in vertices for i in hull[covered])
+        assert not any(tuple(model.xy[i]) in vertices for i in hull[~covered])
+        assert clipped[0] == clipped[-1] and whole[0] == whole[-1]
+        assert {tuple(p) for p in whole} == {tuple(model.xy[i]) for i in hull}
+        print(f"✅ 裁剪后的多边形经过 {np.count_nonzero(covered)} 个凸包顶点，包围范围的多边形为完整凸包")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_map_index_refresh():
+    """测试范围索引重建：不编译模型，只重新读取变化的文件，重建期间查询继续使用旧索引"""
+    print("\n🗂️  测试范围索引重建...")
+    import json
+    import threading
+    import time
+    import map_index as map_index_module
+    from map_index import MapIndex
+    from synthetic_data import make_sample_mapping
+    tmp_dir = tempfile.mkdtemp()
+    original_read = map_index_module.read_map_entry
+    try:
+        west, east = (113.930, 22.528, 113.940, 22.538), (113.950, 22.528, 113.960, 22.538)
+        for name, bounds in (('west.json', west), ('east.json', east)):
+            with open(os.path.join(tmp_dir, name), 'w', encoding='utf-8') as f:
+                json.dump(make_sample_mapping(150, seed=len(name), bounds=bounds), f)
+
+        compiled, reads = [], []
+        index = MapIndex(tmp_dir, lambda path: compiled.append(path))
+
+        def counting_read(path, model=None):
+            reads.append(os.path.basename(path))
+            return original_read(path, model)
+
+        map_index_module.read_map_entry = counting_read
+        points = np.concatenate([sample_points_in_bounds(20, seed=1, bounds=west, margin=0.3),
+                                 sample_points_in_bounds(20, seed=2, bounds=east, margin=0.3)])
+        filenames, assignment = index.route(points)
+        assert sorted(reads) == ['east.json', 'west.json'] and compiled == []
+        expected = compile_mapping_model(os.path.join(tmp_dir, 'west.json')).locate(points[:20]) >= 0
+        assert np.array_equal(assignment[:20] >= 0, expected)
+        assert {filenames[i] for i in assignment[:20] if i >= 0} == {'west.json'}
+
+        # 修改一个文件：只重新读取该文件；重建较慢时其他查询不等待，继续使用旧索引
+        data = make_sample_mapping(150, seed=3, bounds=west)
+        data['metadata']['priority'] = 5
+        with open(os.path.join(tmp_dir, 'west.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        reads.clear()
+
+        def slow_read(path, model=None):
+            time.sleep(0.5)
+            return counting_read(path, model)
+
+        map_index_module.read_map_entry = slow_read
+        builder = threading.Thread(target=index.refresh)
+        builder.start()
+        time.sleep(0.1)
+        start = time.perf_counter()
+        stale = index.entries()
+        waited = time.perf_counter() - start
+        assert waited < 0.3 and stale[0].priority == 0
+        builder.join()
+        assert reads == ['west.json'] and index.entries()[0].priority == 5 and compiled == []
+        print(f"✅ 索引重建只读取变化的文件，重建期间查询 {waited * 1000:.1f} ms 返回旧索引")
+    finally:
+        map_index_module.read_map_entry = original_read
+        shutil.rmtree(tmp_dir)
+
+
+def test_compile_failure():
+    """测试编译失败的文件：返回失败原因而不是一直返回"编译中"，文件修改后重新编译；自动选择地图时同样不阻塞"""
+    print("\n🧯 测试编译失败与自动选择地图的异步编译...")
+    import json
+    import time
+    from compile_jobs import CompileJobs
+    from map_index import MapIndex
+    tmp_dir = tempfile.mkdtemp()
+    original = (app_module.STORAGE_DIR, app_module.ASYNC_COMPILE, app_module.model_cache,
+                app_module.compile_jobs, app_module.map_index)
+    cache = ModelCache()
+    jobs = CompileJobs(cache, max_workers=1, max_queue=4)
+
+    def wait(job_id):
+        deadline = time.time() + 60
+        while jobs.get(job_id).status not in ('done', 'failed') and time.time() < deadline:
+            time.sleep(0.05)
+        return jobs.get(job_id)
+
+    try:
+        # 控制点共线，无法三角剖分
+        broken = {'mappings': [{'腾讯地图坐标': {'经度': 113.93 + i * 1e-3, '纬度': 22.53}, '手绘地图坐标': {'x': i, 'y': 0}}
+                               for i in range(4)]}
+        with open(os.path.join(tmp_dir, 'broken.json'), 'w', encoding='utf-8') as f:
+            json.dump(broken, f)
+        write_sample_mapping(os.path.join(tmp_dir, 'sample.json'), n_points=300)
+        app_module.STORAGE_DIR = tmp_dir
+        app_module.ASYNC_COMPILE = True
+        app_module.model_cache = cache
+        app_module.compile_jobs = jobs
+        app_module.map_index = MapIndex(tmp_dir, app_module.process_mapping_data, cache.peek)
+        client = app_module.app.test_client()
+        request = {'jsonFile': 'broken.json', 'coordinates': [113.931, 22.53]}
+
+        first = client.post('/api/coordinate', json=request)
+        assert first.status_code == 202
+        assert wait(first.get_json()['job']['jobId']).status == 'failed'
+        for _ in range(3):
+            response = client.post('/api/coordinate', json=request)
+            assert response.status_code == 500 and not response.get_json()['compiling']
+            assert response.get_json()['job']['jobId'] == first.get_json()['job']['jobId']
+        assert jobs.stats()['submitted'] == 1
+
+        # 文件修改后重新提交
+        write_sample_mapping(os.path.join(tmp_dir, 'broken.json'), n_points=300, seed=1)
+        retry = client.post('/api/coordinate', json=request)
+        assert retry.status_code == 202 and jobs.stats()['submitted'] == 2
+        wait(retry.get_json()['job']['jobId'])
+
+        # 自动选择地图的批量请求：模型未就绪时提交编译任务，不在请求中编译
+        points = sample_points_in_bounds(20, seed=4)
+        cache.invalidate(os.path.join(tmp_dir, 'broken.json'))
+        response = client.post('/api/coordinate/batch', json={'coordinates': points.tolist()})
+        assert response.status_code == 202 and cache.misses == 0
+        job = wait(response.get_json()['job']['jobId'])
+        assert job.status == 'done'
+        print(f"✅ 编译失败的文件返回失败原因，共提交 {jobs.stats()['submitted']} 个编译任务")
+    finally:
+        jobs.shutdown()
+        (app_module.STORAGE_DIR, app_module.ASYNC_COMPILE, app_module.model_cache,
+         app_module.compile_jobs, app_module.map_index) = original
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    """主函数"""
+    print("🧪 开始映射模型测试...")
+    print("=" * 50)
+    test_model_matches_original_pipeline()
+    test_cache_invalidation()
+    test_warmup_and_health()
+    test_smooth_warp_mode()
+    test_geojson_mapping()
+    test_image_warp()
+    test_tile_cache()
+    test_tracking_stream()
+    test_request_coalescer()
+    test_trajectory_lookup()
+    test_request_profiler()
+    test_memory_budget()
+    test_input_crs()
+    test_auto_map_selection()
+    test_control_point_decimation()
+    test_mapping_bundle()
+    test_async_compile_jobs()
+    test_content_dedup()
+    test_quality_report()
+    test_compact_precision()
+    test_async_serving()
+    test_viewport_query()
+    test_landmark_query()
+    test_geojson_3d_positions()
+    test_geojson_hull_crossing()
+    test_quality_high_degree_vertex()
+    test_geojson_hull_exit()
+    test_geojson_polygon_hull_clip()
+    test_map_index_refresh()
+    test_compile_failure()
+    print("\n" + "=" * 50)
+    print("🎉 所有测试通过！")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+冷启动测试脚本
+检查导入app时不加载matplotlib/scipy，且导入耗时在预算之内
+预算可通过环境变量 IMPORT_BUDGET_MS 调整
+"""
+
+import os
+
+from bench_startup import measure_import_time, measure_startup
+
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', '400'))
+
+
+def test_heavy_modules_are_lazy():
+    """测试导入app时不加载重量级可选依赖"""
+    print("📦 测试延迟导入...")
+    result = measure_import_time()
+    assert result['heavy_modules'] == [], f"导入app时加载了: {result['heavy_modules']}"
+    print("✅ 导入app未加载matplotlib/scipy")
+
+
+def test_import_time_budget():
+    """测试导入app的耗时在预算之内（取3次最小值以减少抖动）"""
+    print(f"\n⏱️  测试导入耗时预算 ({IMPORT_BUDGET_MS:.0f} ms)...")
+    elapsed = min(measure_import_time()['import_ms'] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET_MS, f"import app 耗时 {elapsed:.1f} ms，超出预算"
+    print(f"✅ import app: {elapsed:.1f} ms")
+
+
+def test_first_requests_served():
+    """测试全新进程能够响应首次健康检查和坐标映射"""
+    print("\n🚀 测试首次请求...")
+    result = measure_startup(n_points=200)
+    assert result['health_ms'] <= result['coordinate_ms']
+    print(f"✅ 首次 /api/health {result['health_ms']:.1f} ms, "
+          f"首次 /api/coordinate {result['coordinate_ms']:.1f} ms")
+
+
+def main():
+    """主函数"""
+    print("🧪 开始冷启动测试...")
+    print("=" * 50)
+    test_heavy_modules_are_lazy()
+    test_import_time_budget()
+    test_first_requests_served()
+    print("\n" + "=" * 50)
+    print("🎉 所有测试通过！")
+
+
+if __name__ == '__main__':
+    main()
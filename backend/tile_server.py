@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+手绘地图XYZ瓦片服务
+按需通过编译后的三角网渲染Web墨卡托瓦片，并缓存到磁盘：
+缓存目录按映射文件内容哈希和图像内容哈希组织，内容变化后自然使用新的缓存，
+映射文件被覆盖或删除时清理旧内容的瓦片
+
+预生成瓦片:
+    python tile_server.py <映射文件名> --zoom 15-18 [--workers 8]
+"""
+
+import os
+import sys
+import math
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from image_warp import encode_png, get_image, render_pixels, default_bounds
+
+# 瓦片边长（像素）
+TILE_PIXELS = 256
+
+# 允许的最大缩放级别
+MAX_ZOOM = 22
+
+_empty_tile = None
+
+
+def empty_tile_png():
+    """完全透明的瓦片（映射范围外的瓦片直接返回，无需渲染）"""
+    global _empty_tile
+    if _empty_tile is None:
+        _empty_tile = encode_png(np.zeros((TILE_PIXELS, TILE_PIXELS, 4), dtype=np.uint8))
+    return _empty_tile
+
+
+def tile_bounds(z, x, y):
+    """瓦片的经纬度范围 (min_lng, min_lat, max_lng, max_lat)"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tiles_in_bounds(bounds, z):
+    """与经纬度范围相交的所有瓦片 (x, y)"""
+    min_lng, min_lat, max_lng, max_lat = bounds
+    n = 2 ** z
+
+    def tile_x(lng):
+        return min(n - 1, max(0, int((lng + 180.0) / 360.0 * n)))
+
+    def tile_y(lat):
+        rad = math.radians(lat)
+        return min(n - 1, max(0, int((1 - math.asinh(math.tan(rad)) / math.pi) / 2 * n)))
+
+    for x in range(tile_x(min_lng), tile_x(max_lng) + 1):
+        for y in range(tile_y(max_lat), tile_y(min_lat) + 1):
+            yield x, y
+
+
+def render_tile(model, image, z, x, y):
+    """
+    渲染一个瓦片
+
+    Returns:
+        numpy.ndarray: RGBA像素 (256, 256, 4)
+    """
+    n = 2 ** z
+    offsets = (np.arange(TILE_PIXELS) + 0.5) / TILE_PIXELS
+    lng = (x + offsets) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    lng_grid, lat_grid = np.meshgrid(lng, lat)
+    return render_pixels(model, image, lng_grid, lat_grid)
+
+
+def _bounds_intersect(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class TileCache:
+    """
+    瓦片磁盘缓存
+    路径为 <root>/<映射内容哈希>/<图像内容哈希>/<z>/<x>/<y>.png
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._image_hashes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    def image_hash(self, image_path):
+        """图像内容哈希（按修改时间缓存）"""
+        key = (os.path.abspath(image_path), os.stat(image_path).st_mtime_ns)
+        with self._lock:
+            if key in self._image_hashes:
+                return self._image_hashes[key]
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        with self._lock:
+            self._image_hashes[key] = digest.hexdigest()
+        return self._image_hashes[key]
+
+    def tile_path(self, model, image_path, z, x, y):
+        return os.path.join(self.root, model.content_hash[:16], self.image_hash(image_path)[:16],
+                            str(z), str(x), f'{y}.png')
+
+    def get_tile(self, model, image_path, z, x, y):
+        """
+        获取瓦片，缓存中不存在时渲染并写入缓存
+
+        Returns:
+            tuple: (瓦片文件路径 或 None（完全在映射范围外的瓦片）, 是否命中缓存)
+        """
+        if not _bounds_intersect(tile_bounds(z, x, y), default_bounds(model)):
+            return None, True
+
+        path = self.tile_path(model, image_path, z, x, y)
+        if os.path.exists(path):
+            self.hits += 1
+            return path, True
+
+        png = encode_png(render_tile(model, get_image(image_path), z, x, y))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，避免并发请求读到不完整的瓦片
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+        self.renders += 1
+        return path, False
+
+    def invalidate(self, content_hash):
+        """删除某个映射文件内容对应的全部瓦片"""
+        path = os.path.join(self.root, content_hash[:16])
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        return False
+
+    def seed(self, model, image_path, zooms, max_workers=None, on_progress=None):
+        """
+        使用线程池预生成指定缩放级别范围内与映射范围相交的所有瓦片
+
+        Args:
+            zooms (iterable): 缩放级别
+            on_progress (callable): 每个瓦片完成时的回调 (done, total)
+
+        Returns:
+            dict: total / rendered / cached / seconds
+        """
+        bounds = default_bounds(model)
+        tiles = [(z, x, y) for z in zooms for x, y in tiles_in_bounds(bounds, z)]
+        counts = {'rendered': 0, 'cached': 0}
+        lock = threading.Lock()
+        start = time.perf_counter()
+
+        def work(tile):
+            _, hit = self.get_tile(model, image_path, *tile)
+            with lock:
+                counts['cached' if hit else 'rendered'] += 1
+                done = counts['cached'] + counts['rendered']
+            if on_progress is not None:
+                on_progress(done, len(tiles))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(work, tiles))
+
+        return dict(counts, total=len(tiles), seconds=time.perf_counter() - start)
+
+
+def parse_zoom_range(text):
+    """解析缩放级别范围，例如 '15-18' 或 '16'"""
+    low, _, high = text.partition('-')
+    low, high = int(low), int(high or low)
+    if not 0 <= low <= high <= MAX_ZOOM:
+        raise ValueError(f"缩放级别需在0-{MAX_ZOOM}之间")
+    return range(low, high + 1)
+
+
+def main():
+    """主函数：预生成瓦片"""
+    from app import STORAGE_DIR, IMAGE_DIR, tile_cache
+    from image_warp import find_mapping_image
+    from mapping_model import compile_mapping_model
+
+    parser = argparse.ArgumentParser(description='预生成手绘地图瓦片')
+    parser.add_argument('mapping', help='映射文件名（saved-data中）')
+    parser.add_argument('--zoom', default='15-18', help='缩放级别范围，例如 15-18')
+    parser.add_argument('--workers', type=int, default=None, help='线程数，默认为CPU核数+4')
+    args = parser.parse_args()
+
+    image_path = find_mapping_image(IMAGE_DIR, args.mapping)
+    if image_path is None:
+        print(f"❌ 未找到 {args.mapping} 对应的手绘地图图像，请先通过 /api/upload-image 上传")
+        sys.exit(1)
+
+    model = compile_mapping_model(os.path.join(STORAGE_DIR, args.mapping))
+    zooms = parse_zoom_range(args.zoom)
+    print(f"🧱 预生成瓦片: {args.mapping}, 缩放级别 {zooms.start}-{zooms.stop - 1}")
+
+    def progress(done, total):
+        if done == total or done % 100 == 0:
+            print(f"   {done}/{total}")
+
+    result = tile_cache.seed(model, image_path, zooms, args.workers, progress)
+    print(f"✅ 完成: 共 {result['total']} 个瓦片, 新渲染 {result['rendered']} 个, "
+          f"已缓存 {result['cached']} 个, 耗时 {result['seconds']:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
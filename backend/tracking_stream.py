@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+实时位置跟踪流
+客户端订阅一次映射文件后持续推送位置，服务器使用缓存的映射模型返回映射结果，
+每个流记住上一个位置所在的三角形，下一次查找先检查该三角形及其相邻三角形
+
+消息格式（JSON）:
+    订阅:   {"type": "subscribe", "jsonFile": "example.json", "mode": "affine", "inputCrs": "wgs84"}
+    位置:   {"type": "position", "coordinates": [lng, lat], "id": 1}
+    批量:   {"type": "positions", "coordinates": [[lng, lat], ...], "id": 2}
+    回复:   {"type": "mapped", "id": 1, "mapped_coordinates": [x, y], "triangle_index": 5, ...}
+    错误:   {"type": "error", "message": "..."}
+"""
+
+import json
+import logging
+
+import numpy as np
+
+from mapping_model import TRANSFORM_MODES
+from coord_transform import CRS_CHOICES, MAPPING_CRS, to_mapping_crs
+
+logger = logging.getLogger(__name__)
+
+
+class TrackingStream:
+    """
+    单个客户端的位置跟踪会话（与传输方式无关）
+
+    Args:
+        get_model (callable): 根据文件名返回编译后的映射模型，文件不存在时返回None
+    """
+
+    def __init__(self, get_model):
+        self.get_model = get_model
+        self.json_filename = None
+        self.mode = None
+        self.input_crs = MAPPING_CRS
+        self.last_triangle = -1
+        self.walked_points = 0
+        self.adjacent_points = 0
+        self.positions = 0
+
+    def handle(self, message):
+        """
+        处理一条客户端消息
+
+        Args:
+            message (dict): 已解析的消息
+
+        Returns:
+            dict: 回复消息
+        """
+        kind = message.get('type')
+        if kind == 'subscribe':
+            return self._subscribe(message)
+        if kind in ('position', 'positions'):
+            if self.json_filename is None:
+                return {'type': 'error', 'id': message.get('id'), 'message': '请先订阅映射文件'}
+            return self._map(message, batch=kind == 'positions')
+        return {'type': 'error', 'id': message.get('id'), 'message': f'未知的消息类型: {kind}'}
+
+    def handle_text(self, text):
+        """处理一条JSON文本消息，返回JSON文本回复"""
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError
+        except ValueError:
+            reply = {'type': 'error', 'message': '消息需要为JSON对象'}
+        else:
+            try:
+                reply = self.handle(message)
+            except Exception as e:
+                logger.error(f"处理跟踪消息失败: {str(e)}")
+                reply = {'type': 'error', 'id': message.get('id'), 'message': '服务器内部错误'}
+        return json.dumps(reply, ensure_ascii=False)
+
+    def _subscribe(self, message):
+        json_filename = message.get('jsonFile', '')
+        mode = message.get('mode')
+        if mode is not None and mode not in TRANSFORM_MODES:
+            return {'type': 'error', 'message': f"不支持的变换模式: {mode}"}
+        input_crs = message.get('inputCrs') or MAPPING_CRS
+        if input_crs not in CRS_CHOICES:
+            return {'type': 'error', 'message': f"不支持的坐标系: {input_crs}"}
+        model = self.get_model(json_filename) if json_filename else None
+        if model is None:
+            return {'type': 'error', 'message': '映射数据处理失败，请检查选择的JSON文件'}
+
+        self.json_filename = json_filename
+        self.mode = mode or model.default_mode
+        self.input_crs = input_crs
+        self.last_triangle = -1
+        return {
+            'type': 'subscribed',
+            'jsonFile': json_filename,
+            'mode': self.mode,
+            'inputCrs': self.input_crs,
+            'triangles_count': model.triangles_count
+        }
+
+    def _map(self, message, batch):
+        # 每条消息重新获取模型（缓存命中时只有一次stat），映射文件更新后自动使用新模型
+        model = self.get_model(self.json_filename)
+        if model is None:
+            return {'type': 'error', 'id': message.get('id'), 'message': '映射文件已不存在'}
+
+        try:
+            points = np.asarray(message.get('coordinates'), dtype=np.float64).reshape(-1, 2)
+        except (TypeError, ValueError):
+            points = None
+        if points is None or len(points) == 0 or (not batch and len(points) != 1):
+            return {'type': 'error', 'id': message.get('id'), 'message': '坐标格式错误'}
+        original = points
+        points = to_mapping_crs(points, self.input_crs)
+        if self.last_triangle >= model.triangles_count:
+            self.last_triangle = -1
+
+        # 按顺序处理，每个位置以上一个位置所在三角形及其相邻三角形为提示
+        triangles, walk_stats = model.locate_trajectory(points, self.last_triangle)
+        inside = np.flatnonzero(triangles >= 0)
+        if len(inside):
+            self.last_triangle = int(triangles[inside[-1]])
+        self.walked_points += walk_stats['walked_points']
+        self.adjacent_points += walk_stats['adjacent_points']
+        self.positions += len(points)
+
+        if self.mode == 'tps':
+            mapped = model.smooth_warp().evaluate(points)
+        else:
+            mapped = model.transform_located(points, triangles)
+
+        reply = {'type': 'mapped', 'id': message.get('id'), 'mode': self.mode}
+        if batch:
+            reply['mapped_coordinates'] = mapped.tolist()
+            reply['triangle_indices'] = triangles.tolist()
+        else:
+            reply['original_coordinates'] = original[0].tolist()
+            reply['mapped_coordinates'] = mapped[0].tolist()
+            reply['triangle_index'] = int(triangles[0])
+            reply['success'] = self.mode == 'tps' or bool(triangles[0] >= 0)
+        return reply
+
+    def stats(self):
+        """流统计信息：处理的位置数、逐点行走的位置数和落在前一个位置所在三角形或其相邻三角形内的位置数"""
+        return {
+            'jsonFile': self.json_filename,
+            'positions': self.positions,
+            'walked_points': self.walked_points,
+            'adjacent_points': self.adjacent_points
+        }
@@ -1,8 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.spatial import Delaunay
 import json
 
+# matplotlib和scipy导入较慢，在首次使用时再导入，
+# 使仅提供健康检查或文件管理的短时进程无需承担其导入开销
+
 
 def convert_coordinates(json_file_path):
     """
@@ -12,7 +13,7 @@ def convert_coordinates(json_file_path):
         json_file_path (str): JSON文件路径
         
     Returns:
-        dict: 包含coords和xy两个列表的字典
+        dict: 包含coords和xy两个列表以及metadata的字典
     """
     with open(json_file_path, 'r', encoding='utf-8') as file:
         data = json.load(file)
@@ -24,7 +25,7 @@ def convert_coordinates(json_file_path):
     xy = [[mapping['手绘地图坐标']['x'], mapping['手绘地图坐标']['y']] 
           for mapping in data['mappings']]
     
-    return {'coords': coords, 'xy': xy}
+    return {'coords': coords, 'xy': xy, 'metadata': data.get('metadata', {})}
 
 def get_coordinate_data(json_file_path):
     """
@@ -49,6 +50,8 @@ def triangulate_coords(coords):
     Returns:
         Delaunay: 三角剖分对象
     """
+    from scipy.spatial import Delaunay
+    
     points = np.array(coords)
     return Delaunay(points)
 
@@ -181,6 +184,8 @@ def plot_triangulation_with_test_points(coords, triangulation, test_points):
         triangulation (Delaunay): 三角剖分对象
         test_points (list): 测试点列表 [[lng, lat], ...]
     """
+    import matplotlib.pyplot as plt
+    
     # 设置中文字体
     plt.rcParams['font.sans-serif'] = ['SimHei']
     plt.rcParams['axes.unicode_minus'] = False
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视口查询索引
+编译时在腾讯地图坐标和手绘地图坐标两个空间中分别为三角形和控制点建立粗网格索引
+（与二进制映射包相同的 build_grid_index：每个单元列出外包矩形与之相交的三角形/其中的控制点），
+前端平移、缩放地图时按可见范围取出需要绘制的三角网和控制点：
+
+- 只检查与视口相交的网格单元中的候选，不遍历整个三角网
+- 细节层次：视口内的数量超过上限或指定了视口像素宽度时，按屏幕网格抽稀，
+  每个单元保留最大的三角形和编号最小的控制点
+- 抽稀后仍超过上限时截断，并在响应中标记 truncated
+"""
+
+import numpy as np
+
+from mapping_bundle import build_grid_index, grid_shape, cell_range
+
+# 坐标空间：腾讯地图经纬度、手绘地图坐标
+VIEWPORT_SPACES = ('tencent', 'xy')
+
+# 默认和最大返回的三角形/控制点数
+VIEWPORT_LIMIT = 5000
+VIEWPORT_MAX_LIMIT = 50000
+
+# 指定视口像素宽度时，抽稀网格单元的像素大小
+LOD_CELL_PIXELS = 8
+
+
+class SpaceIndex:
+    """
+    一个坐标空间中的三角形和控制点网格索引
+
+    Args:
+        vertices (numpy.ndarray): 控制点在该空间中的坐标 (n, 2)
+        simplices (numpy.ndarray): 三角形顶点编号 (m, 3)
+    """
+
+    def __init__(self, vertices, simplices):
+        self.vertices = vertices
+        self.simplices = simplices
+        low, high = vertices.min(axis=0), vertices.max(axis=0)
+        self.bounds = (float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+        self.cols, self.rows = grid_shape(self.bounds, len(simplices))
+        triangle_offsets, triangle_ids = build_grid_index(vertices[simplices], self.bounds, self.cols, self.rows)
+        point_offsets, point_ids = build_grid_index(vertices[:, None, :], self.bounds, self.cols, self.rows)
+        self.triangle_offsets = triangle_offsets.astype(np.int32)
+        self.triangle_ids = triangle_ids.astype(np.int32)
+        self.point_offsets = point_offsets.astype(np.int32)
+        self.point_ids = point_ids.astype(np.int32)
+
+    @property
+    def nbytes(self):
+        return int(self.triangle_offsets.nbytes + self.triangle_ids.nbytes
+                   + self.point_offsets.nbytes + self.point_ids.nbytes)
+
+    def _cells(self, bbox):
+        """与范围相交的网格单元编号"""
+        min_x, min_y, max_x, max_y = self.bounds
+        width, height = max(max_x - min_x, 1e-12), max(max_y - min_y, 1e-12)
+        col0, col1 = cell_range(np.array([bbox[0], bbox[2]]), min_x, width, self.cols)
+        row0, row1 = cell_range(np.array([bbox[1], bbox[3]]), min_y, height, self.rows)
+        rows, cols = np.meshgrid(np.arange(row0, row1 + 1), np.arange(col0, col1 + 1), indexing='ij')
+        return (rows * self.cols + cols).ravel()
+
+    @staticmethod
+    def _gather(offsets, ids, cells):
+        """网格单元中的全部编号（去重后升序）"""
+        start, end = offsets[cells], offsets[cells + 1]
+        counts = (end - start).astype(np.int64)
+        positions = np.repeat(start.astype(np.int64) - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return np.unique(ids[positions])
+
+    def query(self, bbox):
+        """
+        与范围相交的三角形（外包矩形相交）和范围内的控制点
+
+        Returns:
+            tuple: (三角形编号, 控制点编号)，均为升序
+        """
+        min_x, min_y, max_x, max_y = self.bounds
+        if bbox[0] > max_x or bbox[2] < min_x or bbox[1] > max_y or bbox[3] < min_y:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        cells = self._cells(bbox)
+
+        triangles = self._gather(self.triangle_offsets, self.triangle_ids, cells)
+        corners = self.vertices[self.simplices[triangles]]
+        low, high = corners.min(axis=1), corners.max(axis=1)
+        triangles = triangles[(low[:, 0] <= bbox[2]) & (high[:, 0] >= bbox[0])
+                              & (low[:, 1] <= bbox[3]) & (high[:, 1] >= bbox[1])]
+
+        points = self._gather(self.point_offsets, self.point_ids, cells)
+        p = self.vertices[points]
+        points = points[(p[:, 0] >= bbox[0]) & (p[:, 0] <= bbox[2]) & (p[:, 1] >= bbox[1]) & (p[:, 1] <= bbox[3])]
+        return triangles.astype(np.int64), points.astype(np.int64)
+
+
+class ViewportIndex:
+    """
+    两个坐标空间的视口查询索引
+
+    Args:
+        coords (numpy.ndarray): 腾讯地图坐标 (n, 2)
+        xy (numpy.ndarray): 手绘地图坐标 (n, 2)
+        simplices (numpy.ndarray): 三角形顶点编号 (m, 3)
+    """
+
+    def __init__(self, coords, xy, simplices):
+        self.spaces = {
+            'tencent': SpaceIndex(coords, simplices),
+            'xy': SpaceIndex(xy, simplices)
+        }
+
+    @property
+    def nbytes(self):
+        return sum(index.nbytes for index in self.spaces.values())
+
+
+def _thin(keys, cell_size, bbox, priority):
+    """
+    按屏幕网格抽稀：每个单元只保留优先级最高（priority最小）的一个
+
+    Args:
+        keys (numpy.ndarray): 每个候选的代表坐标 (k, 2)
+        priority (numpy.ndarray): 优先级，越小越优先 (k,)
+
+    Returns:
+        numpy.ndarray: 保留的候选位置（升序）
+    """
+    cell = np.floor((keys - np.array(bbox[:2])) / cell_size).astype(np.int64)
+    cell_id = cell[:, 0] * (1 << 31) + cell[:, 1]
+    order = np.lexsort((priority, cell_id))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cell_id[order][1:] != cell_id[order][:-1]
+    return np.sort(order[first])
+
+
+def viewport_query(model, bbox, space='tencent', limit=VIEWPORT_LIMIT, width=None):
+    """
+    查询视口内的三角形和控制点
+
+    Args:
+        model (MappingModel): 映射模型
+        bbox (sequence): 视口范围 (min_x, min_y, max_x, max_y)，坐标空间由space指定
+        space (str): 'tencent' 腾讯地图经纬度 或 'xy' 手绘地图坐标
+        limit (int): 三角形和控制点各自的最大返回数
+        width (int): 视口的像素宽度，指定时按 LOD_CELL_PIXELS 像素的屏幕网格抽稀
+
+    Returns:
+        dict: triangles（编号和顶点编号）、points（控制点编号）、vertices（涉及的控制点在两个空间中的坐标）、
+              lod（抽稀网格大小）和 truncated
+
+    Raises:
+        ValueError: 坐标空间、范围或数量参数无效
+    """
+    if space not in VIEWPORT_SPACES:
+        raise ValueError(f"不支持的坐标空间: {space}")
+    bbox = [float(value) for value in bbox]
+    if len(bbox) != 4 or not np.all(np.isfinite(bbox)) or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError("bbox格式错误，需要[min_x, min_y, max_x, max_y]格式")
+    limit = int(limit)
+    if not 0 < limit <= VIEWPORT_MAX_LIMIT:
+        raise ValueError(f"limit需要在1到{VIEWPORT_MAX_LIMIT}之间")
+    if width is not None and float(width) <= 0:
+        raise ValueError("width需要为正数")
+
+    index = model.viewport_index().spaces[space]
+    triangles, points = index.query(bbox)
+    total_triangles, total_points = len(triangles), len(points)
+
+    # 细节层次：按视口像素宽度，或在数量超过上限时按使单元数约等于上限的网格抽稀
+    area = max((bbox[2] - bbox[0]) * (bbox[3] - bbox[1]), 1e-300)
+    cell_size = (bbox[2] - bbox[0]) / float(width) * LOD_CELL_PIXELS if width else 0.0
+    if max(total_triangles, total_points) > limit:
+        cell_size = max(cell_size, float(np.sqrt(area / limit)))
+    if cell_size > 0:
+        corners = index.vertices[index.simplices[triangles]]
+        extent = np.linalg.norm(corners.max(axis=1) - corners.min(axis=1), axis=1)
+        triangles = triangles[_thin(corners.mean(axis=1), cell_size, bbox, -extent)]
+        points = points[_thin(index.vertices[points], cell_size, bbox, points)]
+
+    truncated = len(triangles) > limit or len(points) > limit
+    triangles, points = triangles[:limit], points[:limit]
+    simplices = index.simplices[triangles]
+    vertex_ids = np.union1d(simplices.ravel(), points)
+
+    return {
+        'space': space,
+        'bbox': bbox,
+        'triangles': {
+            'total': int(total_triangles),
+            'returned': int(len(triangles)),
+            'ids': triangles.tolist(),
+            'vertices': simplices.tolist()
+        },
+        'points': {
+            'total': int(total_points),
+            'returned': int(len(points)),
+            'ids': points.tolist()
+        },
+        'vertices': {
+            'ids': vertex_ids.tolist(),
+            'tencent': model.coords[vertex_ids].tolist(),
+            'xy': model.xy[vertex_ids].tolist()
+        },
+        'lod': {'cell_size': cell_size or None, 'thinned': cell_size > 0},
+        'truncated': bool(truncated)
+    }